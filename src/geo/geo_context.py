@@ -0,0 +1,118 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# This module holds the geo data indexers (NED terrain, NLCD land cover, ITU
+# climate zones and ITU surface refractivity) used by the propagation models.
+# Each indexer is loaded the first time it is needed and then shared, so a
+# batch of path calculations pays the data loading cost once per process.
+#
+# The context also holds a terrain profile cache, shared by the NED indexer
+# and the propagation models, so the profile of a path is computed once.
+#
+# A context may be shared between threads: the indexers are loaded under a
+# lock, and the tile caches of the indexers and the profile cache are
+# themselves thread-safe. Two threads missing the same tile may both load it.
+#
+# By default the data is read from the data/ directory of the repository. A
+# process-wide context is available from GetDefaultContext(); a context with
+# other data directories can be created and passed to the propagation models
+# or installed with SetDefaultContext().
+#
+# Example use:
+#   context = geo_context.GetDefaultContext()
+#   climate = context.Climate().TropoClim(39.2, -77.1)
+#   code = context.Nlcd().NlcdCode(39.2, -77.1)
+
+import os
+import threading
+
+import profile_cache
+import refractivity
+import tropoClim
+
+# The data/ directory of the repository.
+_DATA_DIR = os.path.join(
+  os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+  'data')
+
+# The profile cache holds up to profile_cache_bytes bytes of profiles in
+# memory, and if profile_cache_dir is given also stores them in that directory.
+class GeoContext:
+  def __init__(self, ned_dir=None, nlcd_dir=None, itu_dir=None,
+               profile_cache_bytes=256 << 20, profile_cache_dir=None):
+    self.ned_dir = ned_dir or os.path.join(_DATA_DIR, 'ned')
+    self.nlcd_dir = nlcd_dir or os.path.join(_DATA_DIR, 'nlcd')
+    self.itu_dir = itu_dir or os.path.join(_DATA_DIR, 'itu')
+
+    self.ned = None
+    self.nlcd = None
+    self.climate = None
+    self.refractivity = None
+    self.profile_cache = profile_cache.ProfileCache(profile_cache_bytes,
+                                                    profile_cache_dir)
+    # Guards the loading of the indexers, so that each is loaded only once
+    # when the context is shared between threads. The indexers and the
+    # profile cache guard their own caches.
+    self.lock = threading.Lock()
+
+  # Returns the NedIndexer, loading it if needed.
+  def Ned(self):
+    with self.lock:
+      if self.ned is None:
+        # Imported here so that GDAL is only needed when terrain is used.
+        import ned_indexer
+        self.ned = ned_indexer.NedIndexer(self.ned_dir,
+                                          profile_cache=self.profile_cache)
+      return self.ned
+
+  # Returns the NlcdIndexer, loading it if needed.
+  def Nlcd(self):
+    with self.lock:
+      if self.nlcd is None:
+        # Imported here so that GDAL is only needed when land cover is used.
+        import nlcd_indexer
+        self.nlcd = nlcd_indexer.NlcdIndexer(self.nlcd_dir)
+      return self.nlcd
+
+  # Returns the ClimateIndexer, loading it if needed.
+  def Climate(self):
+    with self.lock:
+      if self.climate is None:
+        self.climate = tropoClim.ClimateIndexer(self.itu_dir)
+      return self.climate
+
+  # Returns the RefractivityIndexer, loading it if needed.
+  def Refractivity(self):
+    with self.lock:
+      if self.refractivity is None:
+        self.refractivity = refractivity.RefractivityIndexer(self.itu_dir)
+      return self.refractivity
+
+_default_context = None
+_default_context_lock = threading.Lock()
+
+# Returns the process-wide GeoContext, creating it with the default data
+# directories if needed.
+def GetDefaultContext():
+  global _default_context
+  with _default_context_lock:
+    if _default_context is None:
+      _default_context = GeoContext()
+    return _default_context
+
+# Replaces the process-wide GeoContext, e.g. to use other data directories.
+def SetDefaultContext(context):
+  global _default_context
+  with _default_context_lock:
+    _default_context = context
@@ -0,0 +1,73 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import threading
+import unittest
+
+import geo_context
+
+
+class TestGeoContext(unittest.TestCase):
+
+  def test_indexers_loaded_once(self):
+    context = geo_context.GeoContext()
+    self.assertEquals(context.climate, None)
+    climate = context.Climate()
+    self.assertTrue(context.Climate() is climate)
+    self.assertEquals(climate.TropoClim(39.2, -77.1), 6)
+
+    refractivity = context.Refractivity()
+    self.assertTrue(context.Refractivity() is refractivity)
+    self.assertAlmostEqual(refractivity.Refractivity(39.2, -77.1), 323.797, 3)
+
+  def test_default_context(self):
+    context = geo_context.GetDefaultContext()
+    self.assertTrue(geo_context.GetDefaultContext() is context)
+
+    other = geo_context.GeoContext(itu_dir='/tmp')
+    geo_context.SetDefaultContext(other)
+    self.assertTrue(geo_context.GetDefaultContext() is other)
+    geo_context.SetDefaultContext(context)
+
+  def test_shared_between_threads(self):
+    # Each profile takes 40 bytes, so the profile cache keeps evicting.
+    context = geo_context.GeoContext(profile_cache_bytes=120)
+    climates = []
+    errors = []
+    def Run(seed):
+      try:
+        climates.append(context.Climate())
+        for i in range(200):
+          lat = 39.0 + (seed + i) % 7
+          p = context.profile_cache.Profile(
+              lat, -77.0, 39.1, -77.1, 'test',
+              lambda: [2, 30.0, lat, 101.5, 103.0])
+          if p[2] != lat:
+            errors.append(p.tolist())
+      except Exception as e:
+        errors.append(e)
+    threads = [threading.Thread(target=Run, args=(seed,)) for seed in range(8)]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    self.assertEquals(errors, [])
+    self.assertTrue(all(c is climates[0] for c in climates))
+    stats = context.profile_cache.Stats()
+    self.assertEquals(stats['hits'] + stats['misses'], 8 * 200)
+    self.assertEquals(stats['bytes'], 120)
+
+
+if __name__ == '__main__':
+  unittest.main()
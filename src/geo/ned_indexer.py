@@ -24,13 +24,72 @@ import numpy
 import os
 import re
 import sys
-import time
 
+import terrain_profile
+import tile_cache
 import waypoints
 import vincenty
 
+# The cost charged to the tile cache for a memory-mapped tile. Its pages are
+# only resident while in use and are reclaimed by the OS as needed, so it is
+# charged a nominal cost rather than its mapped size.
+MAPPED_TILE_BYTES = 1 << 20
+
+# Reads the ESRI GridFloat header (.hdr) file which accompanies a .flt data
+# file. Returns a dictionary of the lower-cased header keywords and their
+# string values.
+def ReadGridFloatHeader(filename):
+  header = {}
+  with open(filename) as f:
+    for line in f:
+      fields = line.split()
+      if len(fields) == 2:
+        header[fields[0].lower()] = fields[1]
+  return header
+
+# Memory-maps the GridFloat tile in the given .flt file, reading its dimensions,
+# byte order and georeferencing from the .hdr sidecar. The samples are mapped as
+# float32 values without being read, so tile pages are loaded on demand and are
+# shared through the OS page cache by all processes using the tile.
+# Returns the mapped array and the inverse geo transform which maps (lat, lng)
+# to array indices, in the form returned by gdal.InvGeoTransform.
+def MapGridFloatTile(filename):
+  header = ReadGridFloatHeader(os.path.splitext(filename)[0] + '.hdr')
+  ncols = int(header['ncols'])
+  nrows = int(header['nrows'])
+  cellsize = float(header['cellsize'])
+  if 'xllcenter' in header:
+    xll = float(header['xllcenter']) - 0.5 * cellsize
+    yll = float(header['yllcenter']) - 0.5 * cellsize
+  else:
+    xll = float(header['xllcorner'])
+    yll = float(header['yllcorner'])
+
+  byteorder = header.get('byteorder', 'LSBFIRST').upper()
+  if byteorder in ['LSBFIRST', 'I', 'INTEL']:
+    dtype = '<f4'
+  else:
+    dtype = '>f4'
+
+  tile = numpy.memmap(filename, dtype=dtype, mode='r', shape=(nrows, ncols))
+
+  # The forward geo transform is (xll, cellsize, 0, ytop, 0, -cellsize).
+  ytop = yll + nrows * cellsize
+  inv_txf = (-xll / cellsize, 1.0 / cellsize, 0.0,
+             ytop / cellsize, 0.0, -1.0 / cellsize)
+  return tile, inv_txf
+
 class NedIndexer:
-  def __init__(self, directory, lru_size=10):
+  # The loaded tiles are held in an LRU cache bounded to cache_bytes bytes of
+  # tile data. If use_memmap is set, tiles which have a GridFloat .hdr sidecar
+  # are memory-mapped as float32 with MapGridFloatTile rather than being read
+  # in full through GDAL. Memory-mapped tiles are charged MAPPED_TILE_BYTES
+  # each, so the default budget holds up to 1024 mapped tiles, against about
+  # ten 1 arc-second tiles read through GDAL (about 100 MB each as float64).
+  # If a profile_cache.ProfileCache is given, the profiles returned by Profile
+  # are cached in it.
+  def __init__(self, directory, cache_bytes=1 << 30, use_memmap=True,
+               profile_cache=None):
     print 'Initializing NED index from %s' % directory
     self.directory = directory
     files = os.listdir(self.directory)
@@ -54,69 +113,54 @@ class NedIndexer:
           self.latlng_file[k] = os.path.join(directory, f)
     # latlng_file now has a list of the correct FLT sources for each degree tile.
 
-    # tile_cache will hold numpy arrays of the specific tiles as they are read in
-    # by the indexer.
-    self.tile_cache = {}
-    self.tile_lru = {}
-    self.tile_lru_size = lru_size
-
-    # txf will contain the inverse geo transform functions for specific tiles as
-    # they are created by reading the tiles
-    self.txf = {}
+    # tile_cache will hold the numpy arrays of the specific tiles as they are
+    # read in by the indexer, together with the inverse geo transforms which map
+    # (lat, lng) to array indices in each tile.
+    self.tile_cache = tile_cache.TileCache(cache_bytes)
+    self.use_memmap = use_memmap
+    self.profile_cache = profile_cache
 
-  # This method loads a specific geo tile which includes the lat/lng provided.
-  # It manages the LRU such that a new tile replaces the least-recently-used tile
-  # if needed to remain under the size constraint.
+  # This method loads a specific geo tile which includes the lat/lng provided,
+  # and returns the tile array and its inverse geo transform. The tile cache
+  # evicts least-recently-used tiles as needed to remain under its byte budget.
   def LoadTileForLatLng(self, lat, lng):
     latf = int(math.ceil(lat))
     lngf = int(math.floor(lng))
     k = '%s.%s' % (latf, lngf)
-    if k in self.tile_cache:
-      return
+    tile = self.tile_cache.Get(k)
+    if tile is not None:
+      return tile
 
     filename = self.latlng_file[k]
     print 'Loading tile %s from %s' % (k, filename)
-    dataset = gdal.Open(filename)
-    # Store the inverse geo transform which will map (lat, lng) to array indices
-    # in this tile.
-    tx = dataset.GetGeoTransform()
-    self.txf[k] = gdal.InvGeoTransform(tx)
-
-    self.tile_cache[k] = dataset.ReadAsArray().astype(numpy.float)
-    self.tile_lru[k] = time.clock()
-
-    # evict a tile if there are more than tile_lru_size elements in the cache
-    if len(self.tile_lru) > self.tile_lru_size:
-      mint = 0
-      mink = ''
-      for k in self.tile_lru.keys():
-        if self.tile_lru[k] > mint:
-          mint = self.tile_lru[k]
-          mink = k
-      print 'Evicting tile %s' % k
-      del self.tile_cache[k]
-      del self.tile_lru[k]
-
-    # close the file
-    dataset = None
+    if (self.use_memmap and
+        os.path.exists(os.path.splitext(filename)[0] + '.hdr')):
+      a, txf = MapGridFloatTile(filename)
+      nbytes = MAPPED_TILE_BYTES
+    else:
+      dataset = gdal.Open(filename)
+      # Store the inverse geo transform which will map (lat, lng) to array
+      # indices in this tile.
+      tx = dataset.GetGeoTransform()
+      txf = gdal.InvGeoTransform(tx)
+      a = dataset.ReadAsArray().astype(numpy.float)
+      nbytes = a.nbytes
+      # close the file
+      dataset = None
+
+    self.tile_cache.Put(k, (a, txf), nbytes)
+    return a, txf
 
   # Returns elevation in meters at the given lat,lng. The result uses
   # bilinear interpolation for values between the sample points of the
   # elevation raster data.
   def Elevation(self, lat, lng):
-    self.LoadTileForLatLng(lat, lng)
-
-    latf = int(math.ceil(lat))
-    lngf = int(math.floor(lng))
-    k = '%s.%s' % (latf, lngf)
+    a, tx = self.LoadTileForLatLng(lat, lng)
     #print 'lat, lng = %f, %f' % (lat, lng)
 
-    tx = self.txf[k]
     ipx = tx[0] + tx[1] * lng + tx[2] * lat
     iln = tx[3] + tx[4] * lng + tx[5] * lat
 
-    a = self.tile_cache[k]
-    self.tile_lru[k] = time.clock()
     #print 'Retrieving (%s, %s) from (%f, %f) from tile %s' % (lat, lng, ipx, iln, k)
 
     ilnf = int(math.floor(iln))
@@ -145,26 +189,69 @@ class NedIndexer:
 
     return elev
 
-  # Returns the elevation profile between the two points passed as arguments.
-  # The format is an array used by the ITM and eHata functions. The first
-  # element of the array is the number of elevation points minus one. The second
-  # is the distance in meters between the elevation points in the profile. This
-  # is followed by the profile elevations, first the elevations at (lat1, lng1),
+  # Returns the elevations in meters at the given arrays of lats and lngs, as a
+  # numpy array of the same shape. The points are grouped by degree tile and the
+  # bilinear interpolation of each group is done with array operations. The
+  # interpolation is the same as that of Elevation.
+  def Elevations(self, lats, lngs):
+    lats = numpy.asarray(lats, dtype=numpy.float64)
+    lngs = numpy.asarray(lngs, dtype=numpy.float64)
+    elevs = numpy.zeros(lats.shape)
+
+    latfs = numpy.ceil(lats).astype(numpy.int64)
+    lngfs = numpy.floor(lngs).astype(numpy.int64)
+    for latf, lngf in set(zip(latfs.flat, lngfs.flat)):
+      in_tile = (latfs == latf) & (lngfs == lngf)
+      lat = lats[in_tile]
+      lng = lngs[in_tile]
+      a, tx = self.LoadTileForLatLng(lat[0], lng[0])
+
+      ipx = tx[0] + tx[1] * lng + tx[2] * lat
+      iln = tx[3] + tx[4] * lng + tx[5] * lat
+
+      # The ceil index is always floor+1: on an exact grid line the area
+      # weighting of the ceil samples is zero, as in Elevation.
+      ilnf = numpy.floor(iln).astype(numpy.int64)
+      ipxf = numpy.floor(ipx).astype(numpy.int64)
+      eff = a[ilnf, ipxf]
+      efc = a[ilnf, ipxf + 1]
+      ecf = a[ilnf + 1, ipxf]
+      ecc = a[ilnf + 1, ipxf + 1]
+
+      wln = iln - ilnf
+      wpx = ipx - ipxf
+      elevs[in_tile] = (wln * wpx * ecc + wln * (1.0 - wpx) * efc +
+                        (1.0 - wln) * wpx * ecf + (1.0 - wln) * (1.0 - wpx) * eff)
+
+    return elevs
+
+  # Returns the elevation profile between the two points passed as arguments,
+  # as a TerrainProfile in the format used by the ITM and eHata functions. The
+  # first element is the number of elevation points minus one. The second is
+  # the distance in meters between the elevation points in the profile. This
+  # is followed by the profile elevations, first the elevation at (lat1, lng1),
   # followed by waypoint elevations from point 1 to point 2, ending with the
   # elevation at point 2. The elevations given are ground level relative to the
-  # NED dataset datum.
+  # NED dataset datum. If the indexer has a profile cache, the profile is
+  # computed only once for each path.
   def Profile(self, lat1, lng1, lat2, lng2):
+    if self.profile_cache is None:
+      return self.ComputeProfile(lat1, lng1, lat2, lng2)
+    return self.profile_cache.Profile(
+        lat1, lng1, lat2, lng2, 'ned_waypoints_bilinear',
+        lambda: self.ComputeProfile(lat1, lng1, lat2, lng2))
+
+  # Computes the terrain profile returned by Profile.
+  def ComputeProfile(self, lat1, lng1, lat2, lng2):
     sample_pts = waypoints.waypoints(lat1, lng1, lat2, lng2)
     distance, a1, a2 = vincenty.dist_bear_vincenty(sample_pts[0][0], sample_pts[0][1],
                                                    sample_pts[1][0], sample_pts[1][1])
     print "Using sample points ", len(sample_pts)
     print "distance=", distance
 
-    profile = [len(sample_pts)-1, distance*1000.0]
-    for pt in sample_pts:
-      profile.append(self.Elevation(pt[0], pt[1]))
-
-    return profile
+    pts = numpy.array(sample_pts)
+    return terrain_profile.TerrainProfile.FromElevations(
+        self.Elevations(pts[:, 0], pts[:, 1]), distance*1000.0)
     
 # If run directly, takes command line arguments for lat and lng and prints elevation.
 # If given four arguments, prints the profile between the given points.
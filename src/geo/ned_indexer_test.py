@@ -0,0 +1,113 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+try:
+  import ned_indexer
+except ImportError:
+  # ned_indexer needs GDAL, although the memory-mapped path does not use it.
+  ned_indexer = None
+
+# A 4x4 tile of 0.25 degree cells, with its lower left corner at (33, -83).
+_ELEVATIONS = 100.0 + 1.5 * numpy.arange(16.0).reshape(4, 4)
+_CELLSIZE = 0.25
+_XLL = -83.0
+_YLL = 33.0
+
+
+# Writes the tile as a GridFloat .flt/.hdr pair named after the degree cell
+# whose north-west corner is (34, -83), in the given byte order.
+def _WriteTile(directory, byteorder, center=False):
+  basename = os.path.join(directory, 'floatn34w083_1')
+  dtype = '<f4' if byteorder == 'LSBFIRST' else '>f4'
+  _ELEVATIONS.astype(dtype).tofile(basename + '.flt')
+  with open(basename + '.hdr', 'w') as f:
+    f.write('ncols         4\n')
+    f.write('nrows         4\n')
+    if center:
+      f.write('xllcenter     %r\n' % (_XLL + 0.5 * _CELLSIZE))
+      f.write('yllcenter     %r\n' % (_YLL + 0.5 * _CELLSIZE))
+    else:
+      f.write('xllcorner     %r\n' % _XLL)
+      f.write('yllcorner     %r\n' % _YLL)
+    f.write('cellsize      %r\n' % _CELLSIZE)
+    f.write('NODATA_value  -9999\n')
+    f.write('byteorder     %s\n' % byteorder)
+  return basename + '.flt'
+
+
+# Returns the (lat, lng) of the sample in the given row and column of the tile.
+def _SamplePoint(row, col):
+  return (_YLL + 4 * _CELLSIZE - row * _CELLSIZE, _XLL + col * _CELLSIZE)
+
+
+@unittest.skipIf(ned_indexer is None, 'GDAL is not installed')
+class TestGridFloatTile(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_read_header(self):
+    filename = _WriteTile(self.directory, 'MSBFIRST')
+    header = ned_indexer.ReadGridFloatHeader(
+        os.path.splitext(filename)[0] + '.hdr')
+    self.assertEquals(header['ncols'], '4')
+    self.assertEquals(header['nodata_value'], '-9999')
+    self.assertEquals(header['byteorder'], 'MSBFIRST')
+
+  def test_map_tile(self):
+    for byteorder in ('LSBFIRST', 'MSBFIRST'):
+      for center in (False, True):
+        filename = _WriteTile(self.directory, byteorder, center)
+        tile, inv_txf = ned_indexer.MapGridFloatTile(filename)
+        self.assertTrue(isinstance(tile, numpy.memmap))
+        self.assertEquals(tile.shape, (4, 4))
+        self.assertTrue(numpy.array_equal(tile, _ELEVATIONS))
+        for a, b in zip(inv_txf, (-_XLL / _CELLSIZE, 1.0 / _CELLSIZE, 0.0,
+                                  (_YLL + 4 * _CELLSIZE) / _CELLSIZE, 0.0,
+                                  -1.0 / _CELLSIZE)):
+          self.assertAlmostEqual(a, b)
+        del tile
+
+  def test_indexer_uses_mapped_tile(self):
+    for byteorder in ('LSBFIRST', 'MSBFIRST'):
+      _WriteTile(self.directory, byteorder)
+      indexer = ned_indexer.NedIndexer(self.directory)
+      lat, lng = _SamplePoint(1, 2)
+      self.assertAlmostEqual(indexer.Elevation(lat, lng), _ELEVATIONS[1, 2])
+
+      # Half way between the samples of rows 1-2 and columns 1-2.
+      lats = numpy.array([lat, _SamplePoint(1.5, 0)[0]])
+      lngs = numpy.array([lng, _SamplePoint(0, 1.5)[1]])
+      elevs = indexer.Elevations(lats, lngs)
+      self.assertAlmostEqual(elevs[0], _ELEVATIONS[1, 2])
+      self.assertAlmostEqual(elevs[1], numpy.mean(_ELEVATIONS[1:3, 1:3]))
+      tile, _ = indexer.LoadTileForLatLng(lat, lng)
+      self.assertTrue(isinstance(tile, numpy.memmap))
+      # Mapped tiles are charged a nominal cost, not their mapped size.
+      self.assertEquals(indexer.tile_cache.total_bytes,
+                        ned_indexer.MAPPED_TILE_BYTES)
+
+
+if __name__ == '__main__':
+  unittest.main()
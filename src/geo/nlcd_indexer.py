@@ -13,25 +13,98 @@
 #    limitations under the License.
 
 import gdal
+import json
 import math
 import numpy
 import osr
 import os
 import osgeo.gdal
 import sys
-import time
+import tempfile
 
 import land_use
+import tile_cache
+
+# The name of the sidecar file in the NLCD directory which holds the metadata
+# of all the tiles, so an indexer can start without opening each tile with GDAL.
+TILE_METADATA_FILENAME = 'nlcd_tile_metadata.json'
+
+# Returns the osr spatial references for WGS84 and for the given projection WKT.
+def _SpatialRefs(wkt):
+  wgs84_ref = osr.SpatialReference()
+  wgs84_ref.ImportFromEPSG(4326)
+  sref = osr.SpatialReference()
+  sref.ImportFromWkt(wkt)
+  return wgs84_ref, sref
+
+# Reads the metadata of the tile in filename with GDAL. Returns a dictionary with
+# the geotransform, projection WKT, raster size and lat/lng bounds of the tile,
+# as used to construct an NlcdTileInfo.
+def ReadTileMetadata(filename):
+  ds = gdal.Open(filename)
+  txf = ds.GetGeoTransform()
+  wkt = ds.GetProjection()
+  width = ds.RasterXSize
+  height = ds.RasterYSize
+  # Close file
+  ds = None
+
+  wgs84_ref, sref = _SpatialRefs(wkt)
+  inv_transform = osr.CoordinateTransformation(sref, wgs84_ref)
+
+  # Find the corners of the tile for examining lat/lng to find intersection with tile.
+  corners = []
+  for x in [0, width]:
+    for y in [0, height]:
+      corners.append([txf[0] + txf[1] * x + txf[2] * y,
+                      txf[3] + txf[4] * x + txf[5] * y])
+
+  # TODO: does this account for 180-crossing tiles?
+  max_lat = -100
+  min_lat = 100
+  max_lng = -500
+  min_lng = 500
+  for c in corners:
+    p = inv_transform.TransformPoint(c[0], c[1])
+    if p[0] > max_lng:
+      max_lng = p[0]
+    if p[0] < min_lng:
+      min_lng = p[0]
+    if p[1] > max_lat:
+      max_lat = p[1]
+    if p[1] < min_lat:
+      min_lat = p[1]
+
+  return {
+    'txf': list(txf),
+    'wkt': wkt,
+    'width': width,
+    'height': height,
+    'min_lat': min_lat,
+    'max_lat': max_lat,
+    'min_lng': min_lng,
+    'max_lng': max_lng
+  }
 
 # This class contains metadata about a particular tile and can be used to quickly
-# determine whether a lat/lng coordinate is within the tile.
+# determine whether a lat/lng coordinate is within the tile. If the metadata
+# dictionary (as returned by ReadTileMetadata) is not given, it is read from the
+# tile file. The coordinate transformations are only created when first needed.
 class NlcdTileInfo:
-  def __init__(self, filename):
+  def __init__(self, filename, metadata=None):
     self.filename = filename
+    if metadata is None:
+      metadata = ReadTileMetadata(filename)
+
+    self.txf = tuple(metadata['txf'])
+    self.wkt = str(metadata['wkt'])
+    self.width = metadata['width']
+    self.height = metadata['height']
+    self.min_lat = metadata['min_lat']
+    self.max_lat = metadata['max_lat']
+    self.min_lng = metadata['min_lng']
+    self.max_lng = metadata['max_lng']
 
-    ds = gdal.Open(filename)
-    self.txf = ds.GetGeoTransform()
-    
     # Handles difference in return from gdal.InvGeoTransform between gdal version 1 and 2
     gdal_version = osgeo.gdal.__version__
     if gdal_version[0] == '1':
@@ -39,49 +112,21 @@ class NlcdTileInfo:
     else:
       self.inv_txf = gdal.InvGeoTransform(self.txf)
 
-    wgs84_ref = osr.SpatialReference()
-    wgs84_ref.ImportFromEPSG(4326)
-    sref = osr.SpatialReference()
-    sref.ImportFromWkt(ds.GetProjection())
-    self.width = ds.RasterXSize
-    self.height = ds.RasterYSize
-
-    self.transform = osr.CoordinateTransformation(wgs84_ref, sref)
-    self.inv_transform = osr.CoordinateTransformation(sref, wgs84_ref)
-
     #print self.txf
     self.coord_bounds = [
       self.txf[0],     # upper left x
       self.txf[3],     # upper left y
-      self.txf[0] + self.txf[1] * ds.RasterXSize + self.txf[2] * ds.RasterYSize,  # lower right x
-      self.txf[3] + self.txf[4] * ds.RasterXSize + self.txf[5] * ds.RasterYSize   # lower right y
+      self.txf[0] + self.txf[1] * self.width + self.txf[2] * self.height,  # lower right x
+      self.txf[3] + self.txf[4] * self.width + self.txf[5] * self.height   # lower right y
     ]
 
-    # Find the corners of the tile for examining lat/lng to find intersection with tile.
-    corners = []
-    for x in [0, ds.RasterXSize]:
-      for y in [0, ds.RasterYSize]:
-        corners.append([self.txf[0] + self.txf[1] * x + self.txf[2] * y,
-                        self.txf[3] + self.txf[4] * x + self.txf[5] * y])
-
-    # TODO: does this account for 180-crossing tiles?
-    self.max_lat = -100
-    self.min_lat = 100
-    self.max_lng = -500
-    self.min_lng = 500
-    for c in corners:
-      p = self.inv_transform.TransformPoint(c[0], c[1])
-      if p[0] > self.max_lng:
-        self.max_lng = p[0]
-      if p[0] < self.min_lng:
-        self.min_lng = p[0]
-      if p[1] > self.max_lat:
-        self.max_lat = p[1]
-      if p[1] < self.min_lat:
-        self.min_lat = p[1]
-
-    # Close file
-    ds = None
+    self.transform = None
+
+  # Creates the lat/lng to tile coordinate transformation if not yet done.
+  def InitTransform(self):
+    if self.transform is None:
+      wgs84_ref, sref = _SpatialRefs(self.wkt)
+      self.transform = osr.CoordinateTransformation(wgs84_ref, sref)
 
   def WithinTile(self, lat, lng):
     #if abs(lng - self.max_lng) < 2 and abs(lat - self.max_lat) < 2:
@@ -89,22 +134,30 @@ class NlcdTileInfo:
     #  print self.filename
 
     # Fast latlng bounds check
-    if (lng > self.max_lng or
-        lng < self.min_lng or
-        lat > self.max_lat or
-        lat < self.min_lat):
+    if not self.WithinLatLngBounds(lat, lng):
       #print 'quick out'
       return False
 
     # Check with transform
-    coord = self.IndexCoords(lat, lng)
-    if (coord[0] >= 0 and coord[0] <= float(self.width) and
-        coord[1] >= 0 and coord[1] <= float(self.height)):
-      return True
-      
-    return False
+    return self.WithinIndexBounds(self.IndexCoords(lat, lng))
+
+  # Returns true if the lat/lng is within the lat/lng bounding box of the tile.
+  # The tile is not rectangular in lat/lng, so this is only a quick rejection
+  # test.
+  def WithinLatLngBounds(self, lat, lng):
+    return (lng <= self.max_lng and
+            lng >= self.min_lng and
+            lat <= self.max_lat and
+            lat >= self.min_lat)
+
+  # Returns true if the index coordinates, as returned by IndexCoords, are
+  # within the tile raster.
+  def WithinIndexBounds(self, coord):
+    return (coord[0] >= 0 and coord[0] <= float(self.width) and
+            coord[1] >= 0 and coord[1] <= float(self.height))
 
   def TileCoords(self, lat, lng):
+    self.InitTransform()
     return self.transform.TransformPoint(lng, lat)
 
   def IndexCoords(self, lat, lng):
@@ -121,82 +174,197 @@ class NlcdTileInfo:
       
     return [x, y]
 
+  # Returns the tile projection coordinates of the points given by the lats and
+  # lngs arrays, as two arrays of x and y, projecting all points in one call.
+  def TileCoordsBatch(self, lats, lngs):
+    self.InitTransform()
+    points = numpy.column_stack((lngs, lats)).tolist()
+    coords = numpy.array(self.transform.TransformPoints(points), dtype=float)
+    return coords[:, 0], coords[:, 1]
+
+  # Vectorized version of IndexCoords. Returns the index coordinates of the
+  # points given by the lats and lngs arrays as two arrays of x and y.
+  def IndexCoordsBatch(self, lats, lngs):
+    cx, cy = self.TileCoordsBatch(lats, lngs)
+    x = self.inv_txf[0] + self.inv_txf[1] * cx + self.inv_txf[2] * cy
+    y = self.inv_txf[3] + self.inv_txf[4] * cx + self.inv_txf[5] * cy
+    return x, y
+
 class NlcdIndexer:
-  def __init__(self, directory, lru_size=10):
+  # The loaded tiles are held in an LRU cache bounded to cache_bytes bytes of
+  # tile data.
+  def __init__(self, directory, cache_bytes=1 << 30):
     print 'init NLCD indexer for %s' % directory
     self.directory = directory
     files = os.listdir(self.directory)
     files.sort()
-    self.nlcd_file = {}
+    filenames = []
     for f in files:
       filename = os.path.join(directory, f)
       if f.endswith('.img'):
         # skip the AK file if present -- contents are split into a *_tiles directory
         if f.startswith('ak_nlcd_2011'):
           continue
-        self.nlcd_file[filename] = NlcdTileInfo(filename)
+        filenames.append(filename)
       if f.endswith('_tiles') and os.path.isdir(filename):
         tilepath = os.path.join(directory, f)
         tile_files = os.listdir(tilepath)
         for ft in tile_files:
           if ft.endswith('.img'):
-            filename = os.path.join(tilepath, ft)
-            self.nlcd_file[filename] = NlcdTileInfo(filename)
+            filenames.append(os.path.join(tilepath, ft))
 
-    # tile_cache holds maps of NlcdTileInfo to numpy arrays with data for that tile
-    self.tile_cache = {}
-    self.tile_lru = {}
-    self.tile_lru_size = lru_size
+    self.nlcd_file = self.LoadTileInfos(filenames)
 
-  def LoadTileForLatLng(self, lat, lng):
-    for t in self.tile_cache:
-      if t.WithinTile(lat, lng):
-        return
+    # tile_index maps (floor(lat), floor(lng)) degree cells to the sorted list
+    # of tile filenames whose lat/lng bounds overlap that cell, so a lookup only
+    # examines the few tiles which may contain the point.
+    self.tile_index = {}
+    for fn in sorted(self.nlcd_file):
+      t = self.nlcd_file[fn]
+      for ilat in range(int(math.floor(t.min_lat)), int(math.floor(t.max_lat)) + 1):
+        for ilng in range(int(math.floor(t.min_lng)), int(math.floor(t.max_lng)) + 1):
+          self.tile_index.setdefault((ilat, ilng), []).append(fn)
+
+    # tile_cache holds maps of tile filenames to numpy arrays with data for that
+    # tile
+    self.tile_cache = tile_cache.TileCache(cache_bytes)
+
+  # Returns a map of the filenames to NlcdTileInfo objects for the tiles. The
+  # tile metadata is taken from the sidecar file in the directory where it is
+  # present and the tile file has not been modified since; otherwise it is read
+  # from the tile file and the sidecar file is rewritten.
+  def LoadTileInfos(self, filenames):
+    metadata_file = os.path.join(self.directory, TILE_METADATA_FILENAME)
+    saved = {}
+    if os.path.exists(metadata_file):
+      try:
+        with open(metadata_file) as f:
+          saved = json.load(f)
+      except (IOError, ValueError) as e:
+        print 'Ignoring unreadable NLCD tile metadata %s: %s' % (metadata_file, e)
+
+    tile_infos = {}
+    metadata = {}
+    for filename in filenames:
+      # Sidecar entries are keyed by path relative to the directory.
+      key = os.path.relpath(filename, self.directory).replace(os.sep, '/')
+      mtime = os.path.getmtime(filename)
+      entry = saved.get(key)
+      if entry is None or entry['mtime'] != mtime:
+        entry = ReadTileMetadata(filename)
+        entry['mtime'] = mtime
+      metadata[key] = entry
+      tile_infos[filename] = NlcdTileInfo(filename, entry)
+
+    if metadata != saved:
+      # Written to a temporary file and renamed into place, so concurrent
+      # readers never see a partial file.
+      tmpfile = None
+      try:
+        fd, tmpfile = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+          json.dump(metadata, f, indent=1, sort_keys=True)
+        if os.path.exists(metadata_file):
+          os.remove(metadata_file)
+        os.rename(tmpfile, metadata_file)
+      except (IOError, OSError) as e:
+        print 'Could not write NLCD tile metadata %s: %s' % (metadata_file, e)
+        if tmpfile is not None and os.path.exists(tmpfile):
+          os.remove(tmpfile)
 
-    #print 'Searching tiles...'
-    for fn in self.nlcd_file:
+    return tile_infos
+
+  # Finds the tile which includes the lat/lng provided. Returns its
+  # NlcdTileInfo and the index coordinates of the point within the tile, so
+  # the point is projected only once per candidate tile. Tiles already in the
+  # cache are preferred where tiles overlap.
+  def FindTile(self, lat, lng):
+    candidates = self.tile_index.get((int(math.floor(lat)), int(math.floor(lng))), [])
+    # The sort is stable, so cached tiles come first in index order.
+    for fn in sorted(candidates, key=lambda fn: fn not in self.tile_cache):
       t = self.nlcd_file[fn]
-      if t.WithinTile(lat, lng):
-        #print 'Found within tile %s' % fn
-        dataset = gdal.Open(fn)
-        self.tile_cache[t] = dataset.ReadAsArray().astype(numpy.byte)
-        self.tile_lru[t] = time.clock()
-
-        if len(self.tile_lru) > self.tile_lru_size:
-          mint = 0
-          mink = ''
-          for k in self.tile_lru.keys():
-            if self.tile_lru[k] > mint:
-              mint = self.tile_lru[k]
-              mink = k
-          print 'Evicting tile %s' % k.filename
-          del self.tile_cache[k]
-          del self.tile_lru[k]
-
-        # close the file
-        dataset = None
-        return
+      if not t.WithinLatLngBounds(lat, lng):
+        continue
+      coord = t.IndexCoords(lat, lng)
+      if t.WithinIndexBounds(coord):
+        return t, coord
 
     raise Exception('No tile found for lat lng %f %f' % (lat, lng))
 
+  # Returns the data array for the tile, loading it into the cache if needed.
+  def LoadTile(self, tile_info):
+    a = self.tile_cache.Get(tile_info.filename)
+    if a is None:
+      dataset = gdal.Open(tile_info.filename)
+      a = dataset.ReadAsArray().astype(numpy.byte)
+      self.tile_cache.Put(tile_info.filename, a, a.nbytes)
+      # close the file
+      dataset = None
+    return a
+
+  # Finds the tile which includes the lat/lng provided and returns its
+  # NlcdTileInfo and data array, loading the tile into the cache if needed.
+  def LoadTileForLatLng(self, lat, lng):
+    t, coord = self.FindTile(lat, lng)
+    return t, self.LoadTile(t)
+
   def NlcdCode(self, lat, lng):
     #print 'Code for %f, %f' % (lat, lng)
-    self.LoadTileForLatLng(lat, lng)
-    for t in self.tile_cache:
-      if t.WithinTile(lat, lng):
-        # print 'Found in tile %s' % t.filename
-        index = t.IndexCoords(lat, lng)
-        a = self.tile_cache[t]
-        self.tile_lru[t] = time.clock()
-
-        iln = round(index[1])
-        ipx = round(index[0])
-        #print 'iln=', iln
-        #print 'ipx=', ipx
-
-        return a[iln][ipx]
-
-    raise Exception('No NLCD data for lat lng %f, %f' % (lat, lng))
+    t, index = self.FindTile(lat, lng)
+    # print 'Found in tile %s' % t.filename
+    a = self.LoadTile(t)
+
+    iln = int(round(index[1]))
+    ipx = int(round(index[0]))
+    #print 'iln=', iln
+    #print 'ipx=', ipx
+
+    return a[iln][ipx]
+
+  # Returns an array of the NLCD codes at the points given by the lats and lngs
+  # arrays. Points are grouped by degree cell, and the points of a cell are
+  # projected into each candidate tile in a single transform call, then the
+  # codes are gathered from the tile array with fancy indexing. Tiles are
+  # chosen as in NlcdCode.
+  def NlcdCodes(self, lats, lngs):
+    lats = numpy.asarray(lats, dtype=float).ravel()
+    lngs = numpy.asarray(lngs, dtype=float).ravel()
+    codes = numpy.zeros(len(lats), dtype=numpy.byte)
+
+    cell_lats = numpy.floor(lats).astype(int)
+    cell_lngs = numpy.floor(lngs).astype(int)
+    cells = numpy.unique(numpy.column_stack((cell_lats, cell_lngs)), axis=0)
+    for cell_lat, cell_lng in cells:
+      remaining = numpy.nonzero((cell_lats == cell_lat) & (cell_lngs == cell_lng))[0]
+      candidates = self.tile_index.get((cell_lat, cell_lng), [])
+      for fn in sorted(candidates, key=lambda fn: fn not in self.tile_cache):
+        t = self.nlcd_file[fn]
+        la = lats[remaining]
+        ln = lngs[remaining]
+        inside = ((ln <= t.max_lng) & (ln >= t.min_lng) &
+                  (la <= t.max_lat) & (la >= t.min_lat))
+        if not numpy.any(inside):
+          continue
+        idx = remaining[inside]
+        x, y = t.IndexCoordsBatch(lats[idx], lngs[idx])
+        within = (x >= 0) & (x <= float(t.width)) & (y >= 0) & (y <= float(t.height))
+        if not numpy.any(within):
+          continue
+        # Rounds half away from zero as round() does; the coordinates are
+        # non-negative.
+        iln = numpy.floor(y[within] + 0.5).astype(int)
+        ipx = numpy.floor(x[within] + 0.5).astype(int)
+        a = self.LoadTile(t)
+        codes[idx[within]] = a[iln, ipx]
+        remaining = numpy.setdiff1d(remaining, idx[within], assume_unique=True)
+        if len(remaining) == 0:
+          break
+
+      if len(remaining):
+        raise Exception('No tile found for lat lng %f %f' %
+                        (lats[remaining[0]], lngs[remaining[0]]))
+
+    return codes
 
 # If run directly, takes command line lat lng arguments and prints the NLCD code.
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+try:
+  import gdal
+  import osr
+  import nlcd_indexer
+except ImportError:
+  nlcd_indexer = None
+
+# The synthetic tiles sample one global grid of 0.01 degree WGS84 pixels whose
+# north-west corner is at (34, -83), so overlapping tiles hold the same codes.
+_PIXEL = 0.01
+_NORTH = 34.0
+_WEST = -83.0
+
+
+# Returns the code of the global pixel in the given row and column.
+def _Code(row, col):
+  return (7 * row + 3 * col) % 90 + 11
+
+
+# Writes a tile of the global grid with its north-west pixel at the given row
+# and column, and returns its filename.
+def _WriteTile(filename, row, col, height, width):
+  driver = gdal.GetDriverByName('HFA')
+  dataset = driver.Create(filename, width, height, 1, gdal.GDT_Byte)
+  dataset.SetGeoTransform((_WEST + col * _PIXEL, _PIXEL, 0.0,
+                           _NORTH - row * _PIXEL, 0.0, -_PIXEL))
+  wgs84_ref = osr.SpatialReference()
+  wgs84_ref.ImportFromEPSG(4326)
+  dataset.SetProjection(wgs84_ref.ExportToWkt())
+  rows, cols = numpy.mgrid[row:row + height, col:col + width]
+  dataset.GetRasterBand(1).WriteArray(_Code(rows, cols).astype(numpy.uint8))
+  # Closes the file.
+  dataset = None
+  return filename
+
+
+@unittest.skipIf(nlcd_indexer is None, 'GDAL is not installed')
+class TestNlcdCodes(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    # Two 50x52 pixel tiles, side by side, overlapping by 4 columns.
+    _WriteTile(os.path.join(self.directory, 'west.img'), 0, 0, 50, 52)
+    _WriteTile(os.path.join(self.directory, 'east.img'), 0, 48, 50, 52)
+    self.indexer = nlcd_indexer.NlcdIndexer(self.directory)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_matches_nlcd_code(self):
+    numpy.random.seed(1)
+    lats = numpy.random.uniform(_NORTH - 0.49, _NORTH, 200)
+    lngs = numpy.random.uniform(_WEST, _WEST + 0.99, 200)
+    # Points on the north and west edges and corners of the tiles, and on
+    # the overlap.
+    lats = numpy.concatenate((lats, [_NORTH, _NORTH, _NORTH, 33.8, 33.8, 33.8]))
+    lngs = numpy.concatenate((lngs, [_WEST, -82.52, -82.5, _WEST, -82.52, -82.5]))
+
+    codes = self.indexer.NlcdCodes(lats, lngs)
+    self.assertEquals(len(codes), len(lats))
+    for lat, lng, code in zip(lats, lngs, codes):
+      self.assertEquals(code, self.indexer.NlcdCode(lat, lng))
+    self.assertEquals(self.indexer.NlcdCode(_NORTH, _WEST), _Code(0, 0))
+    self.assertEquals(self.indexer.NlcdCode(33.8, -82.5), _Code(20, 50))
+
+  def test_no_tile(self):
+    # Outside all the degree cells of the tiles, and inside a degree cell of
+    # the tiles but south of them.
+    for lat, lng in ((40.0, -100.0), (33.2, -82.7)):
+      self.assertRaises(Exception, self.indexer.NlcdCode, lat, lng)
+      self.assertRaises(Exception, self.indexer.NlcdCodes,
+                        [33.8, lat], [-82.7, lng])
+
+
+@unittest.skipIf(nlcd_indexer is None, 'GDAL is not installed')
+class TestTileMetadataSidecar(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    os.mkdir(os.path.join(self.directory, 'conus_tiles'))
+    _WriteTile(os.path.join(self.directory, 'west.img'), 0, 0, 50, 52)
+    _WriteTile(os.path.join(self.directory, 'conus_tiles', 'east.img'),
+               0, 48, 50, 52)
+    self.sidecar = os.path.join(self.directory,
+                                nlcd_indexer.TILE_METADATA_FILENAME)
+    self.read_tile_metadata = nlcd_indexer.ReadTileMetadata
+
+  def tearDown(self):
+    nlcd_indexer.ReadTileMetadata = self.read_tile_metadata
+    shutil.rmtree(self.directory)
+
+  def _ReadSidecar(self):
+    with open(self.sidecar) as f:
+      return json.load(f)
+
+  # Makes reading the metadata of a tile from the tile file fail, so that an
+  # indexer can only be built from the sidecar.
+  def _DisableTileReads(self):
+    def ReadTileMetadata(filename):
+      raise AssertionError('Tile %s was read' % filename)
+    nlcd_indexer.ReadTileMetadata = ReadTileMetadata
+
+  def test_relative_path_keys(self):
+    nlcd_indexer.NlcdIndexer(self.directory)
+    self.assertEquals(sorted(self._ReadSidecar()),
+                      ['conus_tiles/east.img', 'west.img'])
+
+    # The sidecar still applies when the directory is moved.
+    moved = self.directory + '_moved'
+    os.rename(self.directory, moved)
+    try:
+      self._DisableTileReads()
+      indexer = nlcd_indexer.NlcdIndexer(moved)
+      self.assertEquals(indexer.NlcdCode(33.8, -82.5), _Code(20, 50))
+    finally:
+      os.rename(moved, self.directory)
+
+  def test_reuses_sidecar(self):
+    nlcd_indexer.NlcdIndexer(self.directory)
+    self._DisableTileReads()
+    indexer = nlcd_indexer.NlcdIndexer(self.directory)
+    self.assertEquals(indexer.NlcdCode(33.8, -82.9), _Code(20, 10))
+
+  def test_stale_mtime_rebuilds(self):
+    nlcd_indexer.NlcdIndexer(self.directory)
+    # Moves the west tile 10 rows south.
+    filename = os.path.join(self.directory, 'west.img')
+    _WriteTile(filename, 10, 0, 50, 52)
+    mtime = os.path.getmtime(filename) + 10
+    os.utime(filename, (mtime, mtime))
+    mtime = os.path.getmtime(filename)
+
+    indexer = nlcd_indexer.NlcdIndexer(self.directory)
+    self.assertAlmostEqual(indexer.nlcd_file[filename].max_lat, 33.9)
+    self.assertEquals(indexer.NlcdCode(33.8, -82.9), _Code(20, 10))
+    entry = self._ReadSidecar()['west.img']
+    self.assertEquals(entry['mtime'], mtime)
+    self.assertAlmostEqual(entry['max_lat'], 33.9)
+
+  def test_corrupt_sidecar(self):
+    with open(self.sidecar, 'w') as f:
+      f.write('{"west.img": ')
+    indexer = nlcd_indexer.NlcdIndexer(self.directory)
+    self.assertEquals(indexer.NlcdCode(33.8, -82.9), _Code(20, 10))
+    # The sidecar is replaced, with no temporary file left behind.
+    self.assertEquals(len(self._ReadSidecar()), 2)
+    self.assertEquals(sorted(os.listdir(self.directory)),
+                      ['conus_tiles', nlcd_indexer.TILE_METADATA_FILENAME,
+                       'west.img'])
+
+  def test_unwritable_sidecar(self):
+    # A directory in place of the sidecar can be neither read nor written.
+    os.mkdir(self.sidecar)
+    indexer = nlcd_indexer.NlcdIndexer(self.directory)
+    self.assertEquals(indexer.NlcdCode(33.8, -82.9), _Code(20, 10))
+    self.assertTrue(os.path.isdir(self.sidecar))
+    self.assertEquals(sorted(os.listdir(self.directory)),
+                      ['conus_tiles', nlcd_indexer.TILE_METADATA_FILENAME,
+                       'west.img'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,138 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# This module contains a cache of terrain profiles, so that the profile for a
+# path is computed once even when the path is evaluated many times, e.g. for
+# several reliabilities, frequencies or antenna heights.
+#
+# Profiles are keyed on the path endpoints, quantized to a given number of
+# degrees, and on a sampling policy string which identifies how the profile
+# was computed (e.g. the terrain source, spacing and interpolation), so that
+# profiles computed in different ways are never mixed. Profiles are held in
+# an LRU cache bounded in bytes and, if a directory is given, also stored on
+# disk so they can be shared between processes and runs. Profiles are returned
+# as TerrainProfile arrays. A cache may be shared between threads.
+#
+# Example use:
+#   cache = ProfileCache()
+#   profile = cache.Profile(lat1, lng1, lat2, lng2, 'ned_waypoints',
+#                           lambda: ComputeProfile(lat1, lng1, lat2, lng2))
+
+import hashlib
+import numpy
+import os
+import tempfile
+import threading
+
+import terrain_profile
+import tile_cache
+
+class ProfileCache:
+  def __init__(self, max_bytes=256 << 20, directory=None, quantum=1.0e-6):
+    self.directory = directory
+    self.quantum = quantum
+    self.memory = tile_cache.TileCache(max_bytes, verbose=False)
+
+    # Usage counters. Disk hits are counted as misses of the memory cache.
+    self.hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+
+    # Guards the memory cache and the counters. Profiles are read, written and
+    # computed without holding it.
+    self.lock = threading.Lock()
+
+  # Returns the cache key of a profile: the quantized endpoints and the
+  # sampling policy.
+  def Key(self, lat1, lng1, lat2, lng2, policy):
+    return tuple(int(round(x / self.quantum))
+                 for x in (lat1, lng1, lat2, lng2)) + (policy,)
+
+  # Returns the profile of the path, computing it by calling compute() with no
+  # arguments if it is not in the cache. A copy is returned so that callers
+  # cannot change the cached profile.
+  def Profile(self, lat1, lng1, lat2, lng2, policy, compute):
+    key = self.Key(lat1, lng1, lat2, lng2, policy)
+    profile = self.Get(key)
+    if profile is None:
+      profile = compute()
+      self.Put(key, profile)
+    return terrain_profile.TerrainProfile(profile).copy()
+
+  # Returns the cached profile stored under key, or None.
+  def Get(self, key):
+    with self.lock:
+      profile = self.memory.Get(key)
+      if profile is not None:
+        self.hits += 1
+        return profile
+
+    if self.directory is not None:
+      filename = self.Filename(key)
+      if os.path.exists(filename):
+        try:
+          a = numpy.load(filename)
+        except (IOError, ValueError) as e:
+          print 'Ignoring unreadable profile %s: %s' % (filename, e)
+        else:
+          profile = terrain_profile.TerrainProfile(a)
+          with self.lock:
+            self.disk_hits += 1
+            self.memory.Put(key, profile, profile.nbytes)
+          return profile
+
+    with self.lock:
+      self.misses += 1
+    return None
+
+  # Stores the profile under key, in memory and on disk if enabled.
+  def Put(self, key, profile):
+    a = terrain_profile.TerrainProfile(profile).copy()
+    with self.lock:
+      self.memory.Put(key, a, a.nbytes)
+
+    if self.directory is not None:
+      filename = self.Filename(key)
+      # Each writer, in any process or thread, gets its own temporary file.
+      tmpfile = None
+      try:
+        fd, tmpfile = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+          numpy.save(f, a.view(numpy.ndarray))
+        if os.path.exists(filename):
+          os.remove(filename)
+        os.rename(tmpfile, filename)
+      except (IOError, OSError) as e:
+        print 'Could not write profile %s: %s' % (filename, e)
+        if tmpfile is not None and os.path.exists(tmpfile):
+          os.remove(tmpfile)
+
+  # Returns the name of the file holding the profile stored under key.
+  def Filename(self, key):
+    return os.path.join(self.directory,
+                        hashlib.sha1(repr(key)).hexdigest() + '.npy')
+
+  # Returns a dictionary of the cache usage counters and occupancy.
+  def Stats(self):
+    with self.lock:
+      memory_stats = self.memory.Stats()
+      return {
+        'hits': self.hits,
+        'disk_hits': self.disk_hits,
+        'misses': self.misses,
+        'evictions': memory_stats['evictions'],
+        'profiles': memory_stats['tiles'],
+        'bytes': memory_stats['bytes'],
+        'max_bytes': memory_stats['max_bytes']
+      }
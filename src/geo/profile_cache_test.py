@@ -0,0 +1,126 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import profile_cache
+
+
+class TestProfileCache(unittest.TestCase):
+
+  def setUp(self):
+    self.computed = 0
+
+  def Compute(self):
+    self.computed += 1
+    return [2, 30.0, 100.0, 101.5, 103.0]
+
+  def test_profile_cached(self):
+    cache = profile_cache.ProfileCache()
+    p = cache.Profile(39.0, -77.0, 39.1, -77.1, 'test', self.Compute)
+    self.assertEquals(p.tolist(), [2, 30.0, 100.0, 101.5, 103.0])
+    p[2] = 0.0
+    p = cache.Profile(39.0, -77.0, 39.1, -77.1, 'test', self.Compute)
+    self.assertEquals(p.tolist(), [2, 30.0, 100.0, 101.5, 103.0])
+    self.assertEquals(self.computed, 1)
+    self.assertEquals(cache.Stats()['hits'], 1)
+    self.assertEquals(cache.Stats()['misses'], 1)
+
+  def test_key(self):
+    cache = profile_cache.ProfileCache()
+    cache.Profile(39.0, -77.0, 39.1, -77.1, 'test', self.Compute)
+    # Endpoints are quantized to 1e-6 degrees.
+    cache.Profile(39.0000001, -77.0, 39.1, -77.1, 'test', self.Compute)
+    self.assertEquals(self.computed, 1)
+    cache.Profile(39.00001, -77.0, 39.1, -77.1, 'test', self.Compute)
+    self.assertEquals(self.computed, 2)
+    # Reversed paths and other sampling policies are different profiles.
+    cache.Profile(39.1, -77.1, 39.0, -77.0, 'test', self.Compute)
+    cache.Profile(39.0, -77.0, 39.1, -77.1, 'other', self.Compute)
+    self.assertEquals(self.computed, 4)
+
+  def test_size_bound(self):
+    # Each profile takes 40 bytes.
+    cache = profile_cache.ProfileCache(max_bytes=100)
+    for i in range(3):
+      cache.Profile(39.0 + i, -77.0, 39.1, -77.1, 'test', self.Compute)
+    stats = cache.Stats()
+    self.assertEquals(stats['profiles'], 2)
+    self.assertEquals(stats['evictions'], 1)
+    self.assertEquals(stats['bytes'], 80)
+
+  def test_disk_store(self):
+    directory = tempfile.mkdtemp()
+    try:
+      cache = profile_cache.ProfileCache(directory=directory)
+      cache.Profile(39.0, -77.0, 39.1, -77.1, 'test', self.Compute)
+      self.assertEquals(len(os.listdir(directory)), 1)
+
+      cache = profile_cache.ProfileCache(directory=directory)
+      p = cache.Profile(39.0, -77.0, 39.1, -77.1, 'test', self.Compute)
+      self.assertEquals(p.tolist(), [2, 30.0, 100.0, 101.5, 103.0])
+      self.assertEquals(p.n, 2)
+      self.assertEquals(self.computed, 1)
+      self.assertEquals(cache.Stats()['disk_hits'], 1)
+    finally:
+      shutil.rmtree(directory)
+
+  def test_threads(self):
+    # Each profile takes 40 bytes, so the memory cache keeps evicting.
+    directory = tempfile.mkdtemp()
+    check_interval = sys.getcheckinterval()
+    sys.setcheckinterval(1)
+    try:
+      cache = profile_cache.ProfileCache(max_bytes=200, directory=directory)
+      errors = []
+      def Run(seed):
+        try:
+          for i in range(300):
+            lat = 39.0 + (seed * 7 + i) % 12
+            p = cache.Profile(lat, -77.0, 39.1, -77.1, 'test',
+                              lambda: [2, 30.0, lat, 101.5, 103.0])
+            if p.tolist() != [2, 30.0, lat, 101.5, 103.0]:
+              errors.append(p.tolist())
+        except Exception as e:
+          errors.append(e)
+      threads = [threading.Thread(target=Run, args=(seed,))
+                 for seed in range(8)]
+      for t in threads:
+        t.start()
+      for t in threads:
+        t.join()
+    finally:
+      sys.setcheckinterval(check_interval)
+
+    try:
+      self.assertEquals(errors, [])
+      stats = cache.Stats()
+      self.assertEquals(stats['hits'] + stats['disk_hits'] + stats['misses'],
+                        8 * 300)
+      self.assertEquals(stats['profiles'], 5)
+      self.assertEquals(stats['bytes'], 200)
+      # Every profile was written once, with no temporary file left behind.
+      self.assertEquals(len(os.listdir(directory)), 12)
+      self.assertTrue(all(fn.endswith('.npy') for fn in os.listdir(directory)))
+    finally:
+      shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+  unittest.main()
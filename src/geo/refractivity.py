@@ -28,6 +28,8 @@ import numpy
 import os
 import sys
 
+import text_grid
+
 class RefractivityIndexer:
   def __init__(self, directory):
     datafile = os.path.join(directory, 'n050.txt')
@@ -36,7 +38,7 @@ class RefractivityIndexer:
     self.LATSTART = 90.0 # Latitude corresponding to first row of file (deg)
     self.LONSTART = 0.0 # Longitude corresponding to first column of file (deg)
     self.DLAT = self.DLON = 1.5 # Spacing between lat/lon rows/columns (deg)
-    self.DATA = numpy.loadtxt(datafile)
+    self.DATA = text_grid.LoadTextGrid(datafile)
     print 'Loaded refractivity data from %s' % datafile
 
   def Refractivity(self, lat, lon):
@@ -73,6 +75,37 @@ class RefractivityIndexer:
 
     return refractivity 
 
+  def Refractivities(self, lats, lons):
+    """
+    Returns an array of the ITU refractivities for the specified arrays of
+    lats and lons, as Refractivity does for each point.
+    """
+
+    lats = numpy.asarray(lats, dtype=float)
+    lons = numpy.array(lons, dtype=float)
+    lons[lons < 0.0] += 360.0
+
+    irow = (self.LATSTART - lats)/self.DLAT
+    icol = (lons - self.LONSTART)/self.DLON
+
+    # bilinear interpolation on values
+    irowl = numpy.floor(irow).astype(int)
+    icoll = numpy.floor(icol).astype(int)
+    irowh = irowl + 1
+    icolh = icoll + 1
+
+    r1 = self.DATA[irowl, icoll]
+    r2 = self.DATA[irowh, icolh]
+    r3 = self.DATA[irowl, icolh]
+    r4 = self.DATA[irowh, icoll]
+
+    refractivity = (((irow - irowl) * (icol - icoll)) * r2 +
+                    ((irowh - irow) * (icolh - icol)) * r1 +
+                    ((irowh - irow) * (icol - icoll)) * r3 +
+                    ((irow - irowl) * (icolh - icol)) * r4)
+
+    return refractivity
+
 if __name__ == '__main__':
   dir = os.path.dirname(os.path.realpath(__file__))
   rootDir = os.path.dirname(os.path.dirname(dir))
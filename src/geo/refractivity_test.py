@@ -0,0 +1,43 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import numpy
+import os
+import unittest
+
+import refractivity
+
+ITU_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+  os.path.realpath(__file__)))), 'data', 'itu')
+
+
+class TestRefractivity(unittest.TestCase):
+
+  def setUp(self):
+    self.indx = refractivity.RefractivityIndexer(ITU_DIR)
+
+  def test_refractivity(self):
+    self.assertAlmostEqual(self.indx.Refractivity(39.2, -77.1), 323.797, 3)
+
+  def test_refractivities(self):
+    lats = numpy.linspace(-89.7, 89.7, 181)
+    lons = numpy.linspace(-179.7, 179.7, 181)
+    lats, lons = [x.ravel() for x in numpy.meshgrid(lats, lons)]
+    refr = self.indx.Refractivities(lats, lons)
+    expected = [self.indx.Refractivity(lat, lon) for lat, lon in zip(lats, lons)]
+    self.assertEquals(refr.tolist(), expected)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,81 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# This module contains the compact representation of a terrain profile used by
+# the propagation models.
+#
+# A profile has the ITM layout [n, dx, e0, ..., en]: the number of intervals,
+# the interval length in meters and the n+1 elevations in meters. Profiles
+# were passed around as Python lists of floats; a TerrainProfile holds the
+# same values in one contiguous float64 numpy array, so it takes 8 bytes per
+# point, can be handed to the C extensions through the buffer protocol without
+# copying, and can be used anywhere a profile list was used.
+#
+# Example use:
+#   profile = TerrainProfile.FromElevations(elevations, 30.0)
+#   profile.n, profile.dx, profile.elevations
+#   dbloss, errnum, strmode = itm.point_to_point(profile, ...)
+
+import numpy
+
+class TerrainProfile(numpy.ndarray):
+  # Returns a TerrainProfile with the values of the profile given as a list or
+  # array in the [n, dx, e0, ..., en] layout. No copy is made if the profile is
+  # already a contiguous float64 array.
+  def __new__(cls, profile):
+    a = numpy.ascontiguousarray(profile, dtype=numpy.float64)
+    if a.ndim != 1 or len(a) < 3:
+      raise ValueError('A terrain profile needs n, dx and elevations')
+    return a.view(cls)
+
+  # Returns a TerrainProfile of the elevations (m), spaced dx meters apart.
+  @classmethod
+  def FromElevations(cls, elevations, dx):
+    elevations = numpy.asarray(elevations, dtype=numpy.float64)
+    a = numpy.empty(len(elevations) + 2)
+    a[0] = len(elevations) - 1
+    a[1] = dx
+    a[2:] = elevations
+    return a.view(cls)
+
+  # The number of intervals of the profile.
+  @property
+  def n(self):
+    return int(self[0])
+
+  # The interval length in meters.
+  @property
+  def dx(self):
+    return float(self[1])
+
+  # A view of the elevations.
+  @property
+  def elevations(self):
+    return self[2:]
+
+  # Indexing and arithmetic give plain arrays, since a part of a profile is
+  # not a profile itself.
+  def __getitem__(self, index):
+    return self.view(numpy.ndarray)[index]
+
+  def __array_wrap__(self, array, context=None):
+    if array.ndim == 0:
+      return array[()]
+    return array.view(numpy.ndarray)
+
+# Returns the profile as a TerrainProfile, without copying if it already is one.
+def AsTerrainProfile(profile):
+  if isinstance(profile, TerrainProfile):
+    return profile
+  return TerrainProfile(profile)
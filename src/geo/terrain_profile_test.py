@@ -0,0 +1,59 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import numpy
+import unittest
+
+import terrain_profile
+
+
+class TestTerrainProfile(unittest.TestCase):
+
+  def test_from_list(self):
+    p = terrain_profile.TerrainProfile([2, 30.0, 100.0, 101.5, 103.0])
+    self.assertEquals(p.n, 2)
+    self.assertEquals(p.dx, 30.0)
+    self.assertEquals(p.elevations.tolist(), [100.0, 101.5, 103.0])
+    self.assertEquals(p.dtype, numpy.float64)
+    self.assertTrue(p.flags['C_CONTIGUOUS'])
+
+  def test_from_elevations(self):
+    p = terrain_profile.TerrainProfile.FromElevations([100.0, 101.5, 103.0], 30.0)
+    self.assertEquals(p.tolist(), [2, 30.0, 100.0, 101.5, 103.0])
+
+  def test_no_copy(self):
+    a = numpy.array([2, 30.0, 100.0, 101.5, 103.0])
+    p = terrain_profile.TerrainProfile(a)
+    a[2] = 0.0
+    self.assertEquals(p[2], 0.0)
+    self.assertTrue(terrain_profile.AsTerrainProfile(p) is p)
+
+  def test_list_compatible(self):
+    profile = [2, 30.0, 100.0, 101.5, 103.0]
+    p = terrain_profile.TerrainProfile(profile)
+    self.assertEquals(len(p), len(profile))
+    self.assertEquals(list(p), profile)
+    self.assertEquals(int(p[0]), 2)
+    self.assertEquals(sum(p[2:]), 304.5)
+    # Parts of a profile are plain arrays.
+    self.assertFalse(isinstance(p[2:], terrain_profile.TerrainProfile))
+    self.assertFalse(isinstance(p + 1, terrain_profile.TerrainProfile))
+
+  def test_invalid(self):
+    self.assertRaises(ValueError, terrain_profile.TerrainProfile, [1, 30.0])
+    self.assertRaises(ValueError, terrain_profile.TerrainProfile, [[1, 30.0, 5.0]])
+
+
+if __name__ == '__main__':
+  unittest.main()
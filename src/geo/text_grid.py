@@ -0,0 +1,60 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# Loads gridded data files in text form, such as the ITU climate and
+# refractivity grids, through a binary .npy copy kept next to the text file.
+# Parsing the text takes hundreds of milliseconds, while the binary copy is
+# memory mapped at almost no cost.
+#
+# The text file remains the source of truth: the .npy copy is regenerated
+# whenever it is missing or older than the text file. If the copy cannot be
+# written, the parsed text is used directly.
+#
+# Example use:
+#   data = LoadTextGrid('/data/itu/TropoClim.txt', dtype=numpy.int)
+
+import numpy
+import os
+
+# Returns the name of the binary copy of the text grid file.
+def BinaryGridFilename(datafile):
+  return os.path.splitext(datafile)[0] + '.npy'
+
+# Returns the contents of the text grid file as a read-only array of the given
+# dtype, memory mapped from the binary copy of the file.
+def LoadTextGrid(datafile, dtype=float):
+  npyfile = BinaryGridFilename(datafile)
+  if (os.path.exists(npyfile) and
+      os.path.getmtime(npyfile) >= os.path.getmtime(datafile)):
+    data = numpy.load(npyfile, mmap_mode='r')
+    if data.dtype == numpy.dtype(dtype):
+      return data
+
+  data = numpy.loadtxt(datafile, dtype=dtype)
+  # Written to a temporary file and renamed into place, so concurrent readers
+  # never see a partial file.
+  tmpfile = '%s.%d.tmp' % (npyfile, os.getpid())
+  try:
+    with open(tmpfile, 'wb') as f:
+      numpy.save(f, data)
+    if os.path.exists(npyfile):
+      os.remove(npyfile)
+    os.rename(tmpfile, npyfile)
+  except (IOError, OSError) as e:
+    print 'Could not write binary grid %s: %s' % (npyfile, e)
+    if os.path.exists(tmpfile):
+      os.remove(tmpfile)
+    return data
+
+  return numpy.load(npyfile, mmap_mode='r')
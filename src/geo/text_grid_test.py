@@ -0,0 +1,66 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+import text_grid
+
+
+class TestTextGrid(unittest.TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.datafile = os.path.join(self.dir, 'grid.txt')
+    self.npyfile = os.path.join(self.dir, 'grid.npy')
+    with open(self.datafile, 'w') as f:
+      f.write('1 2 3\n4 5 6\n')
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+
+  def test_creates_binary_copy(self):
+    data = text_grid.LoadTextGrid(self.datafile)
+    self.assertTrue(os.path.exists(self.npyfile))
+    self.assertTrue(isinstance(data, numpy.memmap))
+    self.assertEquals(data.tolist(), [[1, 2, 3], [4, 5, 6]])
+
+  def test_uses_binary_copy(self):
+    text_grid.LoadTextGrid(self.datafile)
+    # Changes the binary copy, keeping it newer than the text.
+    numpy.save(self.npyfile, numpy.zeros((2, 3)))
+    data = text_grid.LoadTextGrid(self.datafile)
+    self.assertEquals(data.tolist(), [[0, 0, 0], [0, 0, 0]])
+
+  def test_regenerates_when_text_changes(self):
+    text_grid.LoadTextGrid(self.datafile)
+    with open(self.datafile, 'w') as f:
+      f.write('7 8 9\n')
+    mtime = os.path.getmtime(self.npyfile)
+    os.utime(self.datafile, (mtime + 10, mtime + 10))
+    data = text_grid.LoadTextGrid(self.datafile)
+    self.assertEquals(data.tolist(), [7, 8, 9])
+
+  def test_dtype(self):
+    data = text_grid.LoadTextGrid(self.datafile, dtype=numpy.int)
+    self.assertEquals(data.dtype, numpy.dtype(numpy.int))
+    data = text_grid.LoadTextGrid(self.datafile)
+    self.assertEquals(data.dtype, numpy.dtype(float))
+
+
+if __name__ == '__main__':
+  unittest.main()
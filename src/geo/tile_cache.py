@@ -0,0 +1,111 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+# This module contains a least-recently-used cache for geo data tiles, shared
+# by the NED and NLCD indexers, and also used for terrain profiles. The cache
+# is bounded by the total number of bytes of the tiles it holds rather than by
+# a tile count, so it can be sized to the memory available for a workload.
+# Entries are kept in an ordered map in order of use, so lookups, insertions
+# and evictions are all O(1). The cache may be shared between threads.
+#
+# Example use:
+#   cache = TileCache(1 << 30)
+#   tile = cache.Get(key)
+#   if tile is None:
+#     tile = LoadTile(key)
+#     cache.Put(key, tile, tile.nbytes)
+
+import collections
+import threading
+
+# If verbose is set, each eviction is logged.
+class TileCache:
+  def __init__(self, max_bytes, verbose=True):
+    self.max_bytes = max_bytes
+    self.verbose = verbose
+    self.tiles = collections.OrderedDict()
+    self.tile_bytes = {}
+    self.total_bytes = 0
+
+    # Usage counters, for sizing the cache to a workload.
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+    # Guards the tiles and the counters. Put and Remove take it in turn.
+    self.lock = threading.RLock()
+
+  def __len__(self):
+    with self.lock:
+      return len(self.tiles)
+
+  # Membership tests do not count as a use of the tile.
+  def __contains__(self, key):
+    with self.lock:
+      return key in self.tiles
+
+  # Iterates over the keys of the cached tiles, least recently used first,
+  # without affecting their use order.
+  def __iter__(self):
+    with self.lock:
+      return iter(list(self.tiles.keys()))
+
+  # Returns the tile stored under key and marks it as the most recently used,
+  # or returns None if the tile is not in the cache.
+  def Get(self, key):
+    with self.lock:
+      if key not in self.tiles:
+        self.misses += 1
+        return None
+      self.hits += 1
+      tile = self.tiles.pop(key)
+      self.tiles[key] = tile
+      return tile
+
+  # Adds the tile to the cache as the most recently used, charging nbytes to
+  # the byte budget. Least recently used tiles are evicted until the cache fits
+  # its budget again. The tile just added is never evicted, so a single tile
+  # larger than the budget is still cached until the next insertion.
+  def Put(self, key, tile, nbytes):
+    with self.lock:
+      if key in self.tiles:
+        self.Remove(key)
+      self.tiles[key] = tile
+      self.tile_bytes[key] = nbytes
+      self.total_bytes += nbytes
+
+      while self.total_bytes > self.max_bytes and len(self.tiles) > 1:
+        lru_key = next(iter(self.tiles))
+        if self.verbose:
+          print 'Evicting tile %s' % (lru_key,)
+        self.Remove(lru_key)
+        self.evictions += 1
+
+  # Removes the tile stored under key from the cache.
+  def Remove(self, key):
+    with self.lock:
+      del self.tiles[key]
+      self.total_bytes -= self.tile_bytes.pop(key)
+
+  # Returns a dictionary of the cache usage counters and occupancy.
+  def Stats(self):
+    with self.lock:
+      return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'evictions': self.evictions,
+        'tiles': len(self.tiles),
+        'bytes': self.total_bytes,
+        'max_bytes': self.max_bytes
+      }
@@ -0,0 +1,112 @@
+#    Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+import sys
+import threading
+import unittest
+
+import tile_cache
+
+
+class TestTileCache(unittest.TestCase):
+
+  def test_get_put(self):
+    cache = tile_cache.TileCache(100)
+    self.assertEquals(cache.Get('a'), None)
+    cache.Put('a', 'tile_a', 10)
+    self.assertEquals(cache.Get('a'), 'tile_a')
+    self.assertTrue('a' in cache)
+    self.assertEquals(len(cache), 1)
+    self.assertEquals(cache.total_bytes, 10)
+    self.assertEquals(cache.hits, 1)
+    self.assertEquals(cache.misses, 1)
+
+  def test_evicts_least_recently_used(self):
+    cache = tile_cache.TileCache(30)
+    cache.Put('a', 'tile_a', 10)
+    cache.Put('b', 'tile_b', 10)
+    cache.Put('c', 'tile_c', 10)
+    # Using 'a' makes 'b' the least recently used tile.
+    cache.Get('a')
+    cache.Put('d', 'tile_d', 10)
+    self.assertEquals(list(cache), ['c', 'a', 'd'])
+    self.assertEquals(cache.total_bytes, 30)
+    self.assertEquals(cache.evictions, 1)
+
+  def test_evicts_until_within_budget(self):
+    cache = tile_cache.TileCache(30)
+    cache.Put('a', 'tile_a', 10)
+    cache.Put('b', 'tile_b', 10)
+    cache.Put('c', 'tile_c', 25)
+    self.assertEquals(list(cache), ['c'])
+    self.assertEquals(cache.total_bytes, 25)
+    self.assertEquals(cache.evictions, 2)
+
+  def test_keeps_oversized_tile(self):
+    cache = tile_cache.TileCache(10)
+    cache.Put('a', 'tile_a', 50)
+    self.assertEquals(cache.Get('a'), 'tile_a')
+    cache.Put('b', 'tile_b', 5)
+    self.assertEquals(list(cache), ['b'])
+
+  def test_replace_tile(self):
+    cache = tile_cache.TileCache(100)
+    cache.Put('a', 'tile_a', 10)
+    cache.Put('a', 'tile_a2', 20)
+    self.assertEquals(cache.Get('a'), 'tile_a2')
+    self.assertEquals(len(cache), 1)
+    self.assertEquals(cache.total_bytes, 20)
+
+  def test_stats(self):
+    cache = tile_cache.TileCache(100)
+    cache.Get('a')
+    cache.Put('a', 'tile_a', 10)
+    cache.Get('a')
+    stats = cache.Stats()
+    self.assertEquals(stats['hits'], 1)
+    self.assertEquals(stats['misses'], 1)
+    self.assertEquals(stats['evictions'], 0)
+    self.assertEquals(stats['tiles'], 1)
+    self.assertEquals(stats['bytes'], 10)
+
+  def test_threads(self):
+    cache = tile_cache.TileCache(50, verbose=False)
+    errors = []
+    def Run(seed):
+      try:
+        for i in range(2000):
+          key = (seed * 3 + i) % 11
+          if cache.Get(key) is None:
+            cache.Put(key, 'tile_%d' % key, 10)
+      except Exception as e:
+        errors.append(e)
+    check_interval = sys.getcheckinterval()
+    sys.setcheckinterval(1)
+    try:
+      threads = [threading.Thread(target=Run, args=(seed,))
+                 for seed in range(8)]
+      for t in threads:
+        t.start()
+      for t in threads:
+        t.join()
+    finally:
+      sys.setcheckinterval(check_interval)
+    self.assertEquals(errors, [])
+    self.assertEquals(len(cache), 5)
+    self.assertEquals(cache.total_bytes, 50)
+    self.assertEquals(cache.hits + cache.misses, 8 * 2000)
+
+
+if __name__ == '__main__':
+  unittest.main()
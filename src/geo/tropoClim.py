@@ -26,6 +26,8 @@ import numpy
 import os
 import sys
 
+import text_grid
+
 class ClimateIndexer:
   def __init__(self, directory):
     datafile = os.path.join(directory, 'TropoClim.txt')
@@ -34,7 +36,7 @@ class ClimateIndexer:
     self.LATSTART = 89.75 # Latitude corresponding to first row of file (deg)
     self.LONSTART = -179.75 # Longitude corresponding to first column of file (deg)
     self.DLAT = self.DLON = 0.5 # Spacing between lat/lon rows/columns (deg)
-    self.CLIMATEDATA = numpy.loadtxt(datafile, dtype=numpy.int)
+    self.CLIMATEDATA = text_grid.LoadTextGrid(datafile, dtype=numpy.int)
     print 'Loaded climate data from %s' % datafile
 
   def TropoClim(self, lat, lon):
@@ -54,6 +56,23 @@ class ClimateIndexer:
 
     return climate
 
+  def TropoClims(self, lats, lons):
+    """
+    Returns an array of the ITU climate zones for the specified arrays of
+    lats and lons, as TropoClim does for each point.
+    """
+
+    lats = numpy.asarray(lats, dtype=float)
+    lons = numpy.asarray(lons, dtype=float)
+
+    irow = ((self.LATSTART - lats)/self.DLAT + 0.5).astype(int)
+    icol = ((lons - self.LONSTART)/self.DLON + 0.5).astype(int)
+
+    climate = numpy.array(self.CLIMATEDATA[irow, icol])
+    climate[climate == 0] = 7
+
+    return climate
+
   def ClimateZoneName(self, zone):
     if zone == 1:
       return 'Equatorial'
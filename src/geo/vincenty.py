@@ -19,6 +19,8 @@
 
 from math import *
 
+import numpy as np
+
 def dist_bear_vincenty(lat1, lon1, lat2, lon2, accuracy=1.0E-12):
     """
     Calculates distance and bearings between two points using Vincenty
@@ -179,3 +181,246 @@ def to_dist_bear_vincenty(lat, lon, dist, bear, accuracy=1.0E-12):
 
     return degrees(phi2), degrees(L2), degrees(alpha2)
 
+
+def dist_bear_vincenty_batch(lat1, lon1, lat2, lon2, accuracy=1.0E-12):
+    """
+    Vectorized version of dist_bear_vincenty. The input lat/lons (deg)
+    may be numpy arrays, or scalars, of any shapes that broadcast
+    together. All the elements are iterated together, each until its
+    own lambda has converged, so the results match dist_bear_vincenty
+    for each element.
+
+    Returns arrays of distance (km), initial bearing (deg), and back
+    azimuth (deg).
+    """
+
+    a = 6378.1370        # semi-major axis (km), WGS84
+    f = 1./298.257223563 # flattening of the ellipsoid, WGS84
+    b = (1-f)*a          # semi-minor axis
+
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *[np.asarray(x, dtype=float) for x in (lat1, lon1, lat2, lon2)])
+    shape = lat1.shape
+
+    phi1 = np.radians(lat1.ravel())
+    L1   = np.radians(lon1.ravel())
+    phi2 = np.radians(lat2.ravel())
+    L2   = np.radians(lon2.ravel())
+
+    U1 = np.arctan((1-f)*np.tan(phi1))
+    U2 = np.arctan((1-f)*np.tan(phi2))
+    L = L2 - L1
+
+    lmbda = L.copy()
+    sin_sigma = np.zeros(L.shape)
+    cos_sigma = np.zeros(L.shape)
+    sigma = np.zeros(L.shape)
+    sin_alpha = np.zeros(L.shape)
+    cossq_alpha = np.zeros(L.shape)
+    cos2sigma_m = np.zeros(L.shape)
+
+    # Indices of the elements which have not yet converged.
+    active = np.arange(L.size)
+    while active.size:
+        lastlmbda = lmbda[active]
+        u1 = U1[active]
+        u2 = U2[active]
+
+        sin_sig = ((np.cos(u2)*np.sin(lastlmbda))**2.0 +
+                   (np.cos(u1)*np.sin(u2) -
+                    np.sin(u1)*np.cos(u2)*np.cos(lastlmbda))**2.0)**0.5
+        cos_sig = np.sin(u1)*np.sin(u2) + np.cos(u1)*np.cos(u2)*np.cos(lastlmbda)
+        sig = np.arctan2(sin_sig, cos_sig)
+
+        sin_alp = (np.cos(u1)*np.cos(u2)*np.sin(lastlmbda))/np.sin(sig)
+        cossq_alp = 1 - sin_alp**2.0
+
+        cos2sig_m = np.cos(sig) - (2.*np.sin(u1)*np.sin(u2)/cossq_alp)
+
+        C = (f/16.)*cossq_alp*(4. + f*(4. - 3.*cossq_alp))
+
+        newlmbda = L[active] + (1. - C)*f*sin_alp \
+                   *(sig + C*sin_sig \
+                     * (cos2sig_m + C*cos_sig \
+                        * (-1. + 2.*cos2sig_m**2.0)))
+
+        sin_sigma[active] = sin_sig
+        cos_sigma[active] = cos_sig
+        sigma[active] = sig
+        sin_alpha[active] = sin_alp
+        cossq_alpha[active] = cossq_alp
+        cos2sigma_m[active] = cos2sig_m
+        lmbda[active] = newlmbda
+
+        active = active[np.abs(newlmbda - lastlmbda) > accuracy]
+
+    usq = cossq_alpha*(a**2.0 - b**2.0)/b**2.0
+    A = 1 + (usq/16384.)*(4096. + usq*(-768. + usq*(320. - 175.*usq)))
+    B = (usq/1024.)*(256. + usq*(-128. + usq*(74. - 47.*usq)))
+    dsigma = B*np.sin(sigma) \
+             * (cos2sigma_m + 0.25*B \
+               * (np.cos(sigma)*(-1. + 2.*cos2sigma_m**2.0) \
+                  - (1./6.)*B*cos2sigma_m*(-3. + 4.*np.sin(sigma)**2.0)
+                   * (-3. + 4.*cos2sigma_m**2.0)))
+
+    s = b*A*(sigma-dsigma)
+
+    alpha1 = np.arctan2(np.cos(U2)*np.sin(lmbda),
+                        (np.cos(U1)*np.sin(U2) -
+                         np.sin(U1)*np.cos(U2)*np.cos(lmbda)))
+    alpha2 = np.arctan2(np.cos(U1)*np.sin(lmbda),
+                        (-np.sin(U1)*np.cos(U2) +
+                         np.cos(U1)*np.sin(U2)*np.cos(lmbda)))
+
+    alpha2 = np.where(alpha2 < pi, alpha2 + pi, alpha2 - pi)
+
+    alpha1 = (alpha1 + 2.*pi) % (2.*pi)
+    alpha2 = (alpha2 + 2.*pi) % (2.*pi)
+
+    alpha1 = np.degrees(alpha1)
+    alpha2 = np.degrees(alpha2)
+
+    return s.reshape(shape), alpha1.reshape(shape), alpha2.reshape(shape)
+
+def to_dist_bear_vincenty_batch(lat, lon, dist, bear, accuracy=1.0E-12):
+    """
+    Vectorized version of to_dist_bear_vincenty. The inputs may be numpy
+    arrays, or scalars, of any shapes that broadcast together; e.g. a
+    single lat/lon and bearing with an array of distances gives the
+    points along one path. All the elements are iterated together, each
+    until its own sigma has converged, so the results match
+    to_dist_bear_vincenty for each element.
+
+    Input lat/lon in deg, dist in km, bear in deg.
+
+    Returns arrays of final lat/lon in deg, and final bearing in deg.
+    """
+
+    return GeodesicLine(lat, lon, bear, accuracy).Points(dist)
+
+class GeodesicLine:
+    """
+    The geodesic leaving a given lat/lon (deg) along a given bearing
+    (deg). The parts of Vincenty's direct formula which depend only on
+    the start point and bearing (U1, sigma1, alpha, A, B, C) are
+    computed once, so that many points along the path can be found
+    without repeating them, e.g. all the waypoints of a terrain profile.
+
+    The lat/lon and bearing may also be arrays of any shapes that
+    broadcast together, giving a set of geodesics which are evaluated
+    together; to_dist_bear_vincenty_batch is built this way.
+
+    Point gives the same results as to_dist_bear_vincenty with this
+    start point and bearing; Points is its vectorized version.
+    """
+
+    a = 6378.1370        # semi-major axis (km), WGS84
+    f = 1./298.257223563 # flattening of the ellipsoid, WGS84
+    b = (1-f)*a          # semi-minor axis
+
+    def __init__(self, lat, lon, bear, accuracy=1.0E-12):
+        a, f, b = self.a, self.f, self.b
+        self.accuracy = accuracy
+
+        lat, lon, bear = np.broadcast_arrays(
+            *[np.asarray(x, dtype=float) for x in (lat, lon, bear)])
+
+        self.L1 = np.radians(lon)
+        alpha1 = np.radians(bear)
+        self.sin_alpha1 = np.sin(alpha1)
+        self.cos_alpha1 = np.cos(alpha1)
+
+        U1 = np.arctan((1-f)*np.tan(np.radians(lat)))
+        self.sin_U1 = np.sin(U1)
+        self.cos_U1 = np.cos(U1)
+
+        self.sigma1 = np.arctan2(np.tan(U1), self.cos_alpha1)
+
+        self.sinalpha = self.cos_U1*self.sin_alpha1
+        cossq_alpha = (1. - self.sinalpha**2.0)
+        usq = cossq_alpha*(a**2.0-b**2.0)/b**2.0
+
+        self.A = 1 + usq/16384. * (4096. + usq*(-768 + usq*(320.-175.*usq)))
+        self.B = usq/1024.*(256. + usq*(-128. + usq*(74.-47.*usq)))
+        self.C = (f/16.)*cossq_alpha*(4. + f*(4. - 3.*cossq_alpha))
+
+    def Point(self, dist):
+        """
+        Returns the lat/lon (deg) of the point at dist (km) along the
+        path, and the bearing (deg) of the path at that point.
+        """
+
+        lat, lon, bear = self.Points(dist)
+        return float(lat), float(lon), float(bear)
+
+    def Points(self, dists):
+        """
+        Returns arrays of the lats/lons (deg) of the points at the array
+        of distances dists (km) along the path, and of the bearings (deg)
+        of the path at those points. Each distance is iterated until its
+        own sigma has converged, as in to_dist_bear_vincenty. For a set
+        of geodesics, dists broadcasts with their shape.
+        """
+
+        b = self.b
+        dists = np.asarray(dists, dtype=float)
+        shape = np.broadcast(dists, self.sigma1).shape
+        s, sigma1, A, B = [np.broadcast_to(x, shape).ravel()
+                           for x in (dists, self.sigma1, self.A, self.B)]
+
+        sigma = s/(b*A)
+        twosigmam = np.zeros(sigma.shape)
+
+        # Indices of the elements which have not yet converged.
+        active = np.arange(sigma.size)
+        while active.size:
+            lastsigma = sigma[active]
+            Ba = B[active]
+
+            twosigm = 2.*sigma1[active] + lastsigma
+            dsigma = Ba*np.sin(lastsigma) \
+                     *(np.cos(twosigm) + 0.25*Ba \
+                       *(np.cos(lastsigma) \
+                         *(-1. + 2.*np.cos(twosigm)**2.0) \
+                         - (1./6.)*Ba*np.cos(twosigm) \
+                         * (-3. + 4. *np.sin(lastsigma)**2.0) \
+                         * (-3. + 4.*np.cos(twosigm)**2.0)))
+            newsigma = s[active]/(b*A[active]) + dsigma
+
+            twosigmam[active] = twosigm
+            sigma[active] = newsigma
+
+            active = active[np.abs(newsigma - lastsigma) > self.accuracy]
+
+        return self._LatLonBearing(sigma.reshape(shape),
+                                   twosigmam.reshape(shape))
+
+    def _LatLonBearing(self, sigma, twosigmam):
+        # Returns the arrays of lat/lon and bearing (deg) at the angular
+        # distances sigma.
+        f, C = self.f, self.C
+        sin_U1, cos_U1 = self.sin_U1, self.cos_U1
+        sin_alpha1, cos_alpha1 = self.sin_alpha1, self.cos_alpha1
+        sinalpha = self.sinalpha
+
+        num = sin_U1*np.cos(sigma) + cos_U1*np.sin(sigma)*cos_alpha1
+        den = (1.-f)*(sinalpha**2.0 + (sin_U1*np.sin(sigma) - cos_U1*np.cos(sigma)*cos_alpha1)**2.0)**0.5
+
+        phi2 = np.arctan2(num, den)
+
+        num = np.sin(sigma)*sin_alpha1
+        den = cos_U1*np.cos(sigma) - sin_U1*np.sin(sigma)*cos_alpha1
+        lmbda = np.arctan2(num, den)
+
+        L = lmbda - (1. - C)*f*sinalpha \
+            * (sigma + C*np.sin(sigma) \
+               *(np.cos(twosigmam) + C*np.cos(sigma) \
+                 * (-1. + 2.*np.cos(twosigmam)**2.0)))
+        L2 = L + self.L1
+
+        num = sinalpha
+        den = -sin_U1*np.sin(sigma) + cos_U1*np.cos(sigma)*cos_alpha1
+        alpha2 = np.arctan2(num, den)
+        alpha2 = (alpha2 + 2.*pi) % (2.*pi)
+
+        return np.degrees(phi2), np.degrees(L2), np.degrees(alpha2)
@@ -13,6 +13,7 @@
 #    limitations under the License.
 
 import math
+import numpy
 import vincenty
 import pygc
 import random
@@ -54,4 +55,54 @@ for i in range(1000):
   assert math.fabs(lngd - p['longitude']) < 1e-7
   assert math.fabs(az - p['reverse_azimuth']) < 1e-7, "%f and %f" % (az, p['reverse_azimuth'])
 
+print 'batch'
+
+# The vectorized versions must match the scalar ones to within 1e-9 deg.
+points = []
+for i in range(1000):
+  points.append([random.uniform(-80, 80), random.uniform(-180, 180),
+                 random.uniform(-80, 80), random.uniform(-80, 80)])
+lat1, lng1, lat2, lng2 = numpy.array(points).T
+d, a_initial, a_final = vincenty.dist_bear_vincenty_batch(lat1, lng1, lat2, lng2)
+for i in range(len(points)):
+  e = vincenty.dist_bear_vincenty(*points[i])
+  assert math.fabs(d[i] - e[0]) < 1e-9
+  assert math.fabs(a_initial[i] - e[1]) < 1e-9
+  assert math.fabs(a_final[i] - e[2]) < 1e-9
+
+lat = random.uniform(-80, 80)
+lng = random.uniform(-180, 180)
+bearing = random.uniform(-180, 180)
+dists = numpy.linspace(0, 1000, 1501)
+latd, lngd, az = vincenty.to_dist_bear_vincenty_batch(lat, lng, dists, bearing)
+for i in range(len(dists)):
+  e = vincenty.to_dist_bear_vincenty(lat, lng, dists[i], bearing)
+  assert math.fabs(latd[i] - e[0]) < 1e-9
+  assert math.fabs(lngd[i] - e[1]) < 1e-9
+  assert math.fabs(az[i] - e[2]) < 1e-9
+
+path = vincenty.GeodesicLine(lat, lng, bearing)
+latd, lngd, az = path.Points(dists)
+for i in range(len(dists)):
+  e = vincenty.to_dist_bear_vincenty(lat, lng, dists[i], bearing)
+  assert math.fabs(latd[i] - e[0]) < 1e-9
+  assert math.fabs(lngd[i] - e[1]) < 1e-9
+  assert math.fabs(az[i] - e[2]) < 1e-9
+  p = path.Point(dists[i])
+  assert math.fabs(p[0] - e[0]) < 1e-9
+  assert math.fabs(p[1] - e[1]) < 1e-9
+  assert math.fabs(p[2] - e[2]) < 1e-9
+
+# Many start points and bearings at once.
+lats = numpy.random.uniform(-80, 80, 200)
+lngs = numpy.random.uniform(-180, 180, 200)
+bearings = numpy.random.uniform(-180, 180, 200)
+dists = numpy.random.uniform(0, 1000, 200)
+latd, lngd, az = vincenty.to_dist_bear_vincenty_batch(lats, lngs, dists, bearings)
+for i in range(len(dists)):
+  e = vincenty.to_dist_bear_vincenty(lats[i], lngs[i], dists[i], bearings[i])
+  assert math.fabs(latd[i] - e[0]) < 1e-9
+  assert math.fabs(lngd[i] - e[1]) < 1e-9
+  assert math.fabs(az[i] - e[2]) < 1e-9
+
 print 'PASS'
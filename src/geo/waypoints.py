@@ -44,17 +44,18 @@ def waypoint_distances(total_distance):
 
 # This function returns the waypoint latitudes and longitudes
 # to be used for the path between the given latlng coordinates.
-# Uses vincenty waypointing.
+# Uses vincenty waypointing. The geodesic setup is computed once for
+# the path, and all the waypoints are evaluated from it in one
+# vectorized call.
 def waypoints(lat1, lng1, lat2, lng2):
   d, az, raz = vincenty.dist_bear_vincenty(lat1, lng1, lat2, lng2)
-  dist = waypoint_distances(d*1000.0)
+  dist = numpy.array(waypoint_distances(d*1000.0))
+
+  path = vincenty.GeodesicLine(lat1, lng1, az)
+  lt, ln, az_nn = path.Points(dist[1:]/1000.0)
 
   way = [ [lat1, lng1] ]
-  for i in range(1, len(dist)):
-    d = dist[i]/1000.0
-    b = az
-    lt, ln, az_nn = vincenty.to_dist_bear_vincenty(lat1, lng1, d, b)
-    way.append([lt, ln])
+  way.extend(numpy.column_stack((lt, ln)).tolist())
 
   return way
 
@@ -0,0 +1,128 @@
+// Copyright 2017 SAS Project Authors. All Rights Reserved.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+// The parameters of the point_to_point_batch calls of the ITM and eHata
+// extensions. Both setup.py files add this directory to the include path.
+
+#ifndef PROP_BATCH_PARAM_H
+#define PROP_BATCH_PARAM_H
+
+#include <Python.h>
+
+#include <cstring>
+
+// A parameter of the batch call: either one number used for all the paths,
+// or a one-dimensional buffer of numbers holding one value per path.
+struct Param {
+  Py_buffer view;
+  bool has_view;
+  char format;
+  double value;
+};
+
+// Returns the value of the parameter for path i.
+static inline double ParamValue(const Param& param, Py_ssize_t i) {
+  if (!param.has_view) {
+    return param.value;
+  }
+  const char* buf = (const char*)param.view.buf + i * param.view.itemsize;
+  switch (param.format) {
+    case 'd': return *(const double*)buf;
+    case 'f': return *(const float*)buf;
+    case 'i': return *(const int*)buf;
+    case 'l': return *(const long*)buf;
+    case 'q': return *(const PY_LONG_LONG*)buf;
+  }
+  return 0.0;
+}
+
+// Returns the struct format code of a buffer of one of the numeric types
+// handled by ParamValue, or 0.
+static inline char NumericFormat(const Py_buffer& view) {
+  if (view.format == NULL) {
+    return 0;
+  }
+  const char* format = view.format;
+  if (*format == '@' || *format == '=') {
+    format++;
+  }
+  if (strlen(format) != 1) {
+    return 0;
+  }
+  switch (format[0]) {
+    case 'd': return view.itemsize == sizeof(double) ? 'd' : 0;
+    case 'f': return view.itemsize == sizeof(float) ? 'f' : 0;
+    case 'i': return view.itemsize == sizeof(int) ? 'i' : 0;
+    case 'l': return view.itemsize == sizeof(long) ? 'l' : 0;
+    case 'q': return view.itemsize == sizeof(PY_LONG_LONG) ? 'q' : 0;
+  }
+  return 0;
+}
+
+// Fills the parameter from the object, checking that a buffer holds
+// num_paths values. Returns false with a Python exception set on failure;
+// the messages start with the name of the calling function.
+static inline bool GetParam(PyObject* obj, const char* function, const char* name,
+                            Py_ssize_t num_paths, Param* param) {
+  param->has_view = false;
+  param->format = 0;
+  param->value = 0.0;
+
+  if (PyObject_CheckBuffer(obj) &&
+      PyObject_GetBuffer(obj, &param->view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+    param->format = NumericFormat(param->view);
+    if (param->format == 0 || param->view.ndim > 1) {
+      PyBuffer_Release(&param->view);
+      PyErr_Format(PyExc_TypeError,
+                   "%s: %s must be a number or a 1-D numeric array", function, name);
+      return false;
+    }
+    param->has_view = true;
+    if (param->view.ndim == 0) {
+      param->value = ParamValue(*param, 0);
+      PyBuffer_Release(&param->view);
+      param->has_view = false;
+      return true;
+    }
+    // The view is not valid once released.
+    Py_ssize_t num_values = param->view.shape[0];
+    if (num_values != num_paths) {
+      PyBuffer_Release(&param->view);
+      param->has_view = false;
+      PyErr_Format(PyExc_ValueError, "%s: %s has %zd values for %zd paths",
+                   function, name, num_values, num_paths);
+      return false;
+    }
+    return true;
+  }
+  PyErr_Clear();
+
+  param->value = PyFloat_AsDouble(obj);
+  if (PyErr_Occurred()) {
+    PyErr_Clear();
+    PyErr_Format(PyExc_TypeError,
+                 "%s: %s must be a number or a 1-D numeric array", function, name);
+    return false;
+  }
+  return true;
+}
+
+static inline void ReleaseParam(Param* param) {
+  if (param->has_view) {
+    PyBuffer_Release(&param->view);
+    param->has_view = false;
+  }
+}
+
+#endif  // PROP_BATCH_PARAM_H
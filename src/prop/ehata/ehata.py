@@ -189,6 +189,59 @@ def ExtendedHata_MedianBasicPropLoss(f, d, hb, hm, region):
   return MedianLossEH, MedianAbmEH
 
 
+# Array version of ExtendedHata_MedianBasicPropLoss. The frequencies f (MHz),
+# distances d (km) and base and mobile heights hb and hm (m) may be numbers or
+# arrays that broadcast together, e.g. to find the losses over all the
+# distances and heights around a base station in one call. Returns the arrays
+# of the median basic losses and the median attenuations relative to free
+# space (dB).
+def ExtendedHata_MedianBasicPropLosses(f, d, hb, hm, region):
+  f = numpy.asarray(f, dtype=float)
+  d = numpy.asarray(d, dtype=float)
+  hb = numpy.asarray(hb, dtype=float)
+  hm = numpy.asarray(hm, dtype=float)
+  log_f = numpy.log10(f)
+  log_hb = numpy.log10(hb)
+
+  # Power law exponents below and above the break point (Page 30 of [1])
+  nl = 0.1*(24.9 - 6.55*log_hb)
+  nh = 2*(-1.75 + 3.27*log_hb - 0.67*log_hb**2)
+
+  # Basic median attenuation relative to free space at 1 km (Eqn. (A-6) of
+  # [1]) and at 100 km
+  Abmf1 = 30.52 - 16.81*log_f + 4.45*log_f**2
+  abmf1 = 10**(Abmf1/10.)
+  Abmf100 = 120.78 - 52.71*log_f + 10.92*log_f**2
+  abmf100 = 10**(Abmf100/10.)
+
+  # "Break-point" distance (in km) (Eqn. (A-9b) of [1])
+  dbp = (10**(2.*nh) * abmf1 / abmf100)**(1./(nh-nl))
+
+  # Free space loss over the direct LOS distance (Eqn. (A-12) of [1])
+  R = ((d*1e3)**2 + (hb-hm)**2)**0.5
+  Lfs = 20.*log_f + 20.*numpy.log10(R) - 27.56
+
+  # Power law exponent (Eqn (A-13) of [1])
+  n = numpy.where(d <= dbp, nl, nh)
+
+  # Basic median attenuation relative to free space at the break point
+  # (Eqn. (A-11) of [1])
+  Abmfdbp = Abmf1 + (24.9 - 6.55*log_hb) * numpy.log10(dbp)
+
+  # Correction factors for hm (Eqn. (A-2a) of [1])
+  ahm = 3.2*(numpy.log10(11.75*hm))**2 - 4.97
+  a3 = 3.2*(math.log10(11.75*3.))**2 - 4.97
+
+  # Median basic transmission loss (Eqn. (A-10) of [1])
+  MedianLossEH = Abmfdbp + 10.*n*numpy.log10(d/dbp) + 13.82*numpy.log10(200/hb) + a3 - ahm + Lfs
+
+  # Suburban correction factor (Eqn. (A-14) of [1])
+  if region.upper().strip() == 'SUBURBAN':
+    MedianLossEH = MedianLossEH - (54.19 - 33.30*log_f + 6.25*log_f**2)
+
+  return MedianLossEH[()], (MedianLossEH - Lfs)[()]
+
+
 
 # Interpolate the rolling hill values of the CDF of terrain in order to
 # determine the percentile values.
@@ -236,7 +289,7 @@ def piecelin(x, y, u):
 # See discussion at the top of p.33
 # Returns the total correction, the median, and the fine corrections.
 def RollingHillyCorrection(elev):
-  numPoints = elev[0]+1
+  numPoints = int(elev[0])+1
   distance = elev[0] * elev[1]
   resolution = float(elev[1]/1000.0);
   profile = elev[2:numPoints+2]
@@ -309,7 +362,7 @@ def EffectiveHeights(source_height_m, dest_height_m, profile):
 
   numPoints = profile[0]+1
   resolution = float(profile[1]/1000.0);
-  elevations = profile[2:]
+  elevations = numpy.asarray(profile[2:], dtype=float)
   distance = float(profile[0] * resolution)
 
   if distance < dMinKm:
@@ -363,7 +416,7 @@ def EffectiveHeights(source_height_m, dest_height_m, profile):
 def MixedPathCorrection(profile, sea_path):
   numPoints = profile[0]+1
   resolution = float(profile[1]/1000.0);
-  elevations = profile[2:]
+  elevations = numpy.asarray(profile[2:], dtype=float)
   distance = float(profile[0] * resolution)
   
   sea_path = sea_path[2:]
@@ -490,12 +543,71 @@ def FindPeaks(elevations, min_peak_value):
 
   return peaks
 
+# Marks the same peaks as FindPeaks, from the signs of the slopes between
+# points: the points rising from the previous point and falling to the next,
+# the first point if it falls to the next, and the middle points of level runs
+# that fall on both sides (or start the profile). As in FindPeaks, the last
+# point and level runs reaching the last two points are never peaks, and
+# points lower than min_peak_value are not marked. Returns a numpy array.
+def FindPeaks_numpy(elevations, min_peak_value):
+  elevations = numpy.asarray(elevations, dtype=float)
+  n = len(elevations)
+  peaks = numpy.zeros(n, dtype=int)
+  if n < 2:
+    return peaks
+  slopes = numpy.sign(numpy.diff(elevations))
+
+  rising = numpy.concatenate(([1.0], slopes[:-1]))
+  peaks[:-1] = (rising > 0) & (slopes < 0)
+
+  # The level run elevations[first..last] has zero slopes[first..last-1].
+  level = numpy.concatenate(([0], slopes == 0, [0])).astype(int)
+  changes = numpy.diff(level)
+  firsts = numpy.flatnonzero(changes == 1)
+  lasts = numpy.flatnonzero(changes == -1)
+  closed = lasts <= n-3
+  firsts = firsts[closed]
+  lasts = lasts[closed]
+  left = numpy.where(firsts > 0, slopes[firsts-1], 1.0)
+  is_peak = (left > 0) & (slopes[lasts] < 0)
+  peaks[((firsts + lasts) // 2)[is_peak]] = 1
+
+  peaks[elevations < min_peak_value] = 0
+  return peaks
+
+# Narrows the peaks array in place as NarrowPeaks does over the whole
+# profile, keeping the ranges still to be narrowed on a stack rather than
+# recursing. In each range the highest peak strictly inside the range is
+# kept, and the other peaks within min_distance (km) of it are cleared.
+def NarrowPeaks_numpy(elevations, peaks, resolution, min_distance):
+  elevations = numpy.asarray(elevations, dtype=float)
+  n = len(elevations)
+  window = int(math.floor(min_distance/resolution))
+  ranges = [(0, n-1)]
+  while ranges:
+    start, end = ranges.pop()
+    candidates = numpy.flatnonzero(peaks[start+1:end]) + start+1
+    if len(candidates) == 0:
+      peaks[start:end] = 0
+      continue
+
+    mxi = candidates[numpy.argmax(elevations[candidates])]
+    minzi = max(start, mxi - window)
+    maxzi = min(end, mxi + window)
+    peaks[minzi:maxzi+1] = 0
+    peaks[mxi] = 1
+
+    if minzi > 0:
+      ranges.append((start, minzi-1))
+    if maxzi < n-1:
+      ranges.append((maxzi+1, end))
+
 
 # Develops a correction factor for a single isolated ridge in a propagation path.
 def IsolatedRidgeCorrection(profile):
   numPoints = profile[0]+1
   resolution = float(profile[1]/1000.0);
-  elevations = profile[2:]
+  elevations = numpy.asarray(profile[2:], dtype=float)
   distance = float(profile[0] * resolution)
 
   meanElev = math.fsum(elevations) / len(elevations)
@@ -504,17 +616,17 @@ def IsolatedRidgeCorrection(profile):
   minPeakSeparation_km = 6.0
 
   # 'peaks' is an array marking with 1 values where the peaks are.
-  peaks = FindPeaks(elevations, meanElev + minPeakHeight_m)
+  peaks = FindPeaks_numpy(elevations, meanElev + minPeakHeight_m)
 
   # Find the tallest peak. Then use minPeakDistance=6km and find the next
   # peak outside of that range. Repeat to get a vector of the found peaks.
-  NarrowPeaks(elevations, peaks, 0, len(elevations)-1, resolution, minPeakSeparation_km)
+  NarrowPeaks_numpy(elevations, peaks, resolution, minPeakSeparation_km)
 
-  if sum(peaks) == 0 or sum(peaks) > 1:
+  if numpy.sum(peaks) != 1:
     return 0
 
-  peak = max(elevations)
-  mxi = elevations.index(peak)
+  mxi = int(numpy.argmax(elevations))
+  peak = float(elevations[mxi])
   peak_distance = resolution * mxi
 
   Kir_A =  [20.0,  6.0, -4.0,  -6.5,  -7.0,  -6.5,  -6.0,  -5.0,  -4.5,  -4.0,  -3.5,  -3.0,  -2.5,  -2.0, -1.5, -1.0, -0.5]
@@ -566,7 +678,7 @@ def GeneralSlopeCorrection(elev):
   dMaxKm = 10
 
   # Extract data from elevation profile 
-  numPoints = elev[0] + 1                # number of points between Tx & Rx
+  numPoints = int(elev[0]) + 1           # number of points between Tx & Rx
   resolution = float(elev[1]/1000.0);
   elevations = elev[2:numPoints+2]
   distance = float(elev[0] * resolution)
@@ -23,6 +23,17 @@ with open('elevations.csv') as profiles_file:
     profile = profile[0:int(profile[0])+3]
     Kir = ehata.IsolatedRidgeCorrection(profile)
 
+    elevations = profile[2:]
+    resolution = profile[1]/1000.0
+    min_peak = math.fsum(elevations)/len(elevations) + 100.0
+    peaks = ehata.FindPeaks(elevations, min_peak)
+    ehata.NarrowPeaks(elevations, peaks, 0, len(elevations)-1, resolution, 6.0)
+    peaks_numpy = ehata.FindPeaks_numpy(elevations, min_peak)
+    ehata.NarrowPeaks_numpy(elevations, peaks_numpy, resolution, 6.0)
+    if peaks != list(peaks_numpy):
+      print('fail peaks on profile %d' % target)
+      exit()
+
     if math.fabs(float(deltas[0][target]) - Kir) > .1:
       print('fail Kir on profile %d: %f vs %f' % (target, float(deltas[0][target]), Kir))
       exit()
@@ -41,5 +41,16 @@ for reg in region:
         print('fail above-median loss on profile %d: %f vs %f' % (target, float(abmloss[hmi][disti]), above_median_loss))
         exit()
 
+    # The array version gives the losses for all the distances at once.
+    median_losses, above_median_losses = ehata.ExtendedHata_MedianBasicPropLosses(
+        3500, distance, hb, hm, reg)
+    for disti in range(len(distance)):
+      if math.fabs(float(loss[hmi][disti]) - median_losses[disti]) > .05:
+        print('fail array median loss at %d km: %f vs %f' % (distance[disti], float(loss[hmi][disti]), median_losses[disti]))
+        exit()
+      if math.fabs(float(abmloss[hmi][disti]) - above_median_losses[disti]) > .05:
+        print('fail array above-median loss at %d km: %f vs %f' % (distance[disti], float(abmloss[hmi][disti]), above_median_losses[disti]))
+        exit()
+
 print 'PASS'
 
@@ -46,11 +46,27 @@ struct prop_type
   int mdp;
 };
 
+// The FORTRAN code keeps some local variables of adiff, ascat, alos, lrprop
+// and avar between calls, as a run sets them up in a first call and uses
+// them in later ones. They are held in the per-run propa_type and propv_type
+// below rather than in static variables, so that runs in different threads
+// do not share them.
+
+struct avar_state_type
+{ int kdv;
+  double dexa, de, vmd, vs0, sgl, sgtm, sgtp, sgtd, tgtd,
+         gm, gp, cv1, cv2, yv1, yv2, yv3, csm1, csm2, ysm1, ysm2,
+         ysm3, csp1, csp2, ysp1, ysp2, ysp3, csd1, zd, cfm1, cfm2,
+         cfm3, cfp1, cfp2, cfp3;
+  bool ws, w1;
+};
+
 struct propv_type
 { double sgc;
   int lvar;
   int mdvar;
   int klim;
+  avar_state_type avar;
 };
 
 struct propa_type
@@ -66,6 +82,15 @@ struct propa_type
   double dls[2];
   double dla;
   double tha;
+  // adiff
+  double wd1, xd1, afo, qk, aht, xht;
+  // ascat
+  double ad, rr, etq, h0s;
+  // alos
+  double wls;
+  // lrprop
+  bool wlos, wscat;
+  double dmin, xae;
 };
 
 int mymin(const int &i, const int &j)
@@ -176,7 +201,8 @@ double ahd(double td)
 
 double  adiff( double d, prop_type &prop, propa_type &propa)
 { complex<double> prop_zgnd(prop.zgndreal,prop.zgndimag);
-  static double wd1, xd1, afo, qk, aht, xht;
+  double &wd1=propa.wd1, &xd1=propa.xd1, &afo=propa.afo, &qk=propa.qk,
+         &aht=propa.aht, &xht=propa.xht;
   double a, q, pk, ds, th, wa, ar, wd, adiffv;
   if(d==0)
     { q=prop.hg[0]*prop.hg[1];
@@ -221,7 +247,7 @@ double  adiff( double d, prop_type &prop, propa_type &propa)
 
 double  ascat( double d, prop_type &prop, propa_type &propa)
 { complex<double> prop_zgnd(prop.zgndreal,prop.zgndimag);
-  static double ad, rr, etq, h0s;
+  double &ad=propa.ad, &rr=propa.rr, &etq=propa.etq, &h0s=propa.h0s;
   double h0, r1, r2, z0, ss, et, ett, th, q;
   double ascatv;
   if(d==0.0)
@@ -308,7 +334,7 @@ double abq_alos (complex<double> r)
 
 double  alos( double d, prop_type &prop, propa_type &propa)
 { complex<double> prop_zgnd(prop.zgndreal,prop.zgndimag);
-  static double wls;
+  double &wls=propa.wls;
   complex<double> r;
   double s, sps, q;
   double alosv;
@@ -369,8 +395,8 @@ void qlra( int kst[], int klimx, int mdvarx,
 
 void lrprop (double d,
           prop_type &prop, propa_type &propa)  // PaulM_lrprop
-{ static bool wlos, wscat;
-  static double dmin, xae;
+{ bool &wlos=propa.wlos, &wscat=propa.wscat;
+  double &dmin=propa.dmin, &xae=propa.xae;
   complex<double> prop_zgnd(prop.zgndreal,prop.zgndimag);
   double a0, a1, a2, a3, a4, a5, a6;
   double d0, d1, d2, d3, d4, d5, d6;
@@ -529,11 +555,16 @@ double curve (double const &c1, double const &c2, double const &x1,
 
 double avar(double zzt, double zzl, double zzc,
          prop_type &prop, propv_type &propv)
-{ static int kdv;
-  static double dexa, de, vmd, vs0, sgl, sgtm, sgtp, sgtd, tgtd,
-                gm, gp, cv1, cv2, yv1, yv2, yv3, csm1, csm2, ysm1, ysm2,
-				ysm3, csp1, csp2, ysp1, ysp2, ysp3, csd1, zd, cfm1, cfm2,
-				cfm3, cfp1, cfp2, cfp3;
+{ avar_state_type &st=propv.avar;
+  int &kdv=st.kdv;
+  double &dexa=st.dexa, &de=st.de, &vmd=st.vmd, &vs0=st.vs0, &sgl=st.sgl,
+         &sgtm=st.sgtm, &sgtp=st.sgtp, &sgtd=st.sgtd, &tgtd=st.tgtd,
+         &gm=st.gm, &gp=st.gp, &cv1=st.cv1, &cv2=st.cv2, &yv1=st.yv1,
+         &yv2=st.yv2, &yv3=st.yv3, &csm1=st.csm1, &csm2=st.csm2,
+         &ysm1=st.ysm1, &ysm2=st.ysm2, &ysm3=st.ysm3, &csp1=st.csp1,
+         &csp2=st.csp2, &ysp1=st.ysp1, &ysp2=st.ysp2, &ysp3=st.ysp3,
+         &csd1=st.csd1, &zd=st.zd, &cfm1=st.cfm1, &cfm2=st.cfm2,
+         &cfm3=st.cfm3, &cfp1=st.cfp1, &cfp2=st.cfp2, &cfp3=st.cfp3;
   double bv1[7]={-9.67,-0.62,1.26,-9.21,-0.62,-0.39,3.15};
   double bv2[7]={12.7,9.19,15.5,9.05,9.19,2.86,857.9};
   double xv1[7]={144.9e3,228.9e3,262.6e3,84.1e3,228.9e3,141.7e3,2222.e3};
@@ -557,7 +588,7 @@ double avar(double zzt, double zzl, double zzc,
   double bfp1[7]={1.0,0.93,1.0,0.93,0.93,1.0,1.0};
   double bfp2[7]={0.0,0.31,0.0,0.19,0.31,0.0,0.0};
   double bfp3[7]={0.0,2.00,0.0,1.79,2.00,0.0,0.0};
-  static bool ws, w1;
+  bool &ws=st.ws, &w1=st.w1;
   double rt=7.8, rl=24.0, avarv, q, vs, zt, zl, zc;
   double sgt, yr;
   int temp_klim = propv.klim-1;
@@ -938,35 +969,17 @@ double deg2rad(double d)
 //* Point-To-Point Mode Calculations                     *
 //********************************************************
 
-void point_to_point(double elev[], double tht_m, double rht_m,
+// Prepares prop, propv and propa for the point-to-point path given by elev,
+// running qlrps and qlrpfl once. Quantiles for the path are then found with
+// avar. Returns the free space loss and sets strmode.
+static double prepare_point_to_point(double elev[], double tht_m, double rht_m,
           double eps_dielect, double sgm_conductivity, double eno_ns_surfref,
-		  double frq_mhz, int radio_climate, int pol, double conf, double rel,
-		  double &dbloss, char *strmode, int &errnum)
-	// pol: 0-Horizontal, 1-Vertical
-	// radio_climate: 1-Equatorial, 2-Continental Subtropical, 3-Maritime Tropical,
-	//                4-Desert, 5-Continental Temperate, 6-Maritime Temperate, Over Land,
-	//                7-Maritime Temperate, Over Sea
-	// conf, rel: .01 to .99
-	// elev[]: [num points - 1], [delta dist(meters)], [height(meters) point 1], ..., [height(meters) point n]
-	// errnum: 0- No Error.
-	//         1- Warning: Some parameters are nearly out of range.
-	//                     Results should be used with caution.
-	//         2- Note: Default parameters have been substituted for impossible ones.
-	//         3- Warning: A combination of parameters is out of range.
-	//                     Results are probably invalid.
-	//         Other-  Warning: Some parameters are out of range.
-	//                          Results are probably invalid.
+		  double frq_mhz, int radio_climate, int pol,
+		  prop_type &prop, propv_type &propv, propa_type &propa, char *strmode)
 {
-
-  prop_type   prop;
-  propv_type  propv;
-  propa_type  propa;
   double zsys=0;
-  double zc, zr;
   double eno, enso, q;
   long ja, jb, i, np;
-  //double dkm;
-  //double xkm;
   double fs;
 
   prop.hg[0] = tht_m;   prop.hg[1] = rht_m;
@@ -974,11 +987,7 @@ void point_to_point(double elev[], double tht_m, double rht_m,
   prop.kwx = 0;
   propv.lvar = 5;
   prop.mdp = -1;
-  zc = qerfi(conf);
-  zr = qerfi(rel);
   np = (long)elev[0];
-  //dkm = (elev[1] * elev[0]) / 1000.0;
-  //xkm = elev[1] / 1000.0;
   eno = eno_ns_surfref;
   enso = 0.0;
   q = enso;
@@ -1017,7 +1026,68 @@ void point_to_point(double elev[], double tht_m, double rht_m,
       else if(prop.dist>propa.dx)
         strcat(strmode, ", Troposcatter Dominant");
     }
-  dbloss = avar(zr,0.0,zc,prop,propv) + fs;
+  return fs;
+}
+
+
+void point_to_point(double elev[], double tht_m, double rht_m,
+          double eps_dielect, double sgm_conductivity, double eno_ns_surfref,
+		  double frq_mhz, int radio_climate, int pol, double conf, double rel,
+		  double &dbloss, char *strmode, int &errnum)
+	// pol: 0-Horizontal, 1-Vertical
+	// radio_climate: 1-Equatorial, 2-Continental Subtropical, 3-Maritime Tropical,
+	//                4-Desert, 5-Continental Temperate, 6-Maritime Temperate, Over Land,
+	//                7-Maritime Temperate, Over Sea
+	// conf, rel: .01 to .99
+	// elev[]: [num points - 1], [delta dist(meters)], [height(meters) point 1], ..., [height(meters) point n]
+	// errnum: 0- No Error.
+	//         1- Warning: Some parameters are nearly out of range.
+	//                     Results should be used with caution.
+	//         2- Note: Default parameters have been substituted for impossible ones.
+	//         3- Warning: A combination of parameters is out of range.
+	//                     Results are probably invalid.
+	//         Other-  Warning: Some parameters are out of range.
+	//                          Results are probably invalid.
+{
+
+  prop_type   prop;
+  propv_type  propv = propv_type();
+  propa_type  propa = propa_type();
+  double fs;
+
+  fs = prepare_point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                              eno_ns_surfref, frq_mhz, radio_climate, pol,
+                              prop, propv, propa, strmode);
+  dbloss = avar(qerfi(rel),0.0,qerfi(conf),prop,propv) + fs;
+  errnum = prop.kwx;
+}
+
+
+void point_to_point_quantiles(double elev[], double tht_m, double rht_m,
+          double eps_dielect, double sgm_conductivity, double eno_ns_surfref,
+		  double frq_mhz, int radio_climate, int pol,
+		  const double rels[], int num_rels, const double confs[], int num_confs,
+		  double dbloss[], char *strmode, int &errnum)
+	// As point_to_point, for each of the reliabilities rels and confidences
+	// confs. The path is prepared once; the first avar call sets up its
+	// parameters and sets propv.lvar to 0, so the other calls reuse them.
+	// dbloss[i*num_confs+j]: the loss for rels[i] and confs[j]
+{
+
+  prop_type   prop;
+  propv_type  propv = propv_type();
+  propa_type  propa = propa_type();
+  double fs, zr;
+  int i, j;
+
+  fs = prepare_point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                              eno_ns_surfref, frq_mhz, radio_climate, pol,
+                              prop, propv, propa, strmode);
+  for(i=0;i<num_rels;++i)
+    { zr = qerfi(rels[i]);
+      for(j=0;j<num_confs;++j)
+        dbloss[i*num_confs+j] = avar(zr,0.0,qerfi(confs[j]),prop,propv) + fs;
+    }
   errnum = prop.kwx;
 }
 
@@ -1050,8 +1120,8 @@ void point_to_pointMDH (double elev[], double tht_m, double rht_m,
 {
 
   prop_type   prop;
-  propv_type  propv;
-  propa_type  propa;
+  propv_type  propv = propv_type();
+  propa_type  propa = propa_type();
   double zsys=0;
   double ztime, zloc, zconf;
   double eno, enso, q;
@@ -1129,8 +1199,8 @@ void point_to_pointDH (double elev[], double tht_m, double rht_m,
 
   char strmode[100];
   prop_type   prop;
-  propv_type  propv;
-  propa_type  propa;
+  propv_type  propv = propv_type();
+  propa_type  propa = propa_type();
   double zsys=0;
   double zc, zr;
   double eno, enso, q;
@@ -1215,8 +1285,8 @@ void area(long ModVar, double deltaH, double tht_m, double rht_m,
 	//                          Results are probably invalid.
 	// NOTE: strmode is not used at this time.
   prop_type prop;
-  propv_type propv;
-  propa_type propa;
+  propv_type propv = propv_type();
+  propa_type propa = propa_type();
   double zt, zl, zc, xlb;
   double fs;
   long ivar;
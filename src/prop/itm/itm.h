@@ -107,6 +107,18 @@ void point_to_point(double elev[], double tht_m, double rht_m,
                     double conf, double rel,
                     double &dbloss, char *strmode, int &errnum);
 
+// Finds the loss for each of the num_rels reliabilities in rels and the
+// num_confs confidences in confs, preparing the path only once.
+// dbloss : num_rels * num_confs values; dbloss[i * num_confs + j] is the loss
+//          for rels[i] and confs[j]
+// errnum : the error indicator covering all the quantiles
+void point_to_point_quantiles(double elev[], double tht_m, double rht_m,
+                              double eps_dielect, double sgm_conductivity, double eno_ns_surfref,
+                              double frq_mhz, int radio_climate, int pol,
+                              const double rels[], int num_rels,
+                              const double confs[], int num_confs,
+                              double dbloss[], char *strmode, int &errnum);
+
 void point_to_pointMDH(double elev[], double tht_m, double rht_m,
                        double eps_dielect, double sgm_conductivity, double eno_ns_surfref,
                        double frq_mhz, int radio_climate, int pol,
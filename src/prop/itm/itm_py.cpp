@@ -13,10 +13,101 @@
 // limitations under the License.
 
 #include "itm.h"
+#include "batch_param.h"
 #include <Python.h>
+#include <numpy/arrayobject.h>
 
+#include <cstring>
 #include <iostream>
 
+// Returns true if the buffer holds a one-dimensional array of native doubles.
+static bool IsDoubleArray(const Py_buffer& view) {
+  if (view.ndim != 1 || view.itemsize != sizeof(double) || view.format == NULL) {
+    return false;
+  }
+  const char* format = view.format;
+  if (*format == '@' || *format == '=') {
+    format++;
+  }
+  return strcmp(format, "d") == 0;
+}
+
+// Terrain profile in the ITM layout [n, dx, e0, ..., en] passed to the model.
+// A contiguous float64 array whose n matches its length, such as a
+// TerrainProfile, is used in place through the buffer protocol. Any other
+// sequence of numbers is copied, and n is set from its length.
+struct Profile {
+  Py_buffer view;
+  bool has_view;
+  double* copy;
+  double* elev;
+  Py_ssize_t size;
+};
+
+// Fills the profile from the object. Returns false with a Python exception
+// set on failure.
+static bool GetProfile(PyObject* elev_obj, Profile* profile) {
+  profile->has_view = false;
+  profile->copy = NULL;
+  profile->elev = NULL;
+  profile->size = 0;
+
+  if (PyObject_CheckBuffer(elev_obj)) {
+    if (PyObject_GetBuffer(elev_obj, &profile->view,
+                           PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+      double* elev = (double*)profile->view.buf;
+      Py_ssize_t size = profile->view.len / sizeof(double);
+      if (IsDoubleArray(profile->view) && size >= 3 && elev[0] == size-3) {
+        profile->has_view = true;
+        profile->elev = elev;
+        profile->size = size;
+        return true;
+      }
+      PyBuffer_Release(&profile->view);
+    } else {
+      PyErr_Clear();
+    }
+  }
+
+  PyObject* seq = PySequence_Fast(elev_obj, "point_to_point: profile must be a sequence");
+  if (seq == NULL) {
+    return false;
+  }
+  Py_ssize_t size = PySequence_Fast_GET_SIZE(seq);
+  if (size < 3) {
+    Py_DECREF(seq);
+    PyErr_SetString(PyExc_ValueError, "point_to_point: profile is too short");
+    return false;
+  }
+  double* elev = new double[size];
+  for (Py_ssize_t i = 0; i < size; i++) {
+    PyObject* i_obj = PySequence_Fast_GET_ITEM(seq, i);
+    double elev_val = PyFloat_AsDouble(i_obj);
+    if (PyErr_Occurred()) {
+      delete[] elev;
+      Py_DECREF(seq);
+      return false;
+    }
+    elev[i] = elev_val;
+  }
+  Py_DECREF(seq);
+
+  elev[0] = size-3;
+  profile->copy = elev;
+  profile->elev = elev;
+  profile->size = size;
+  return true;
+}
+
+static void ReleaseProfile(Profile* profile) {
+  if (profile->has_view) {
+    PyBuffer_Release(&profile->view);
+    profile->has_view = false;
+  }
+  delete[] profile->copy;
+  profile->copy = NULL;
+}
+
 static PyObject* itm_point_to_point(PyObject* self, PyObject* args) {
   PyObject* elev_obj = NULL;
   double tht_m, rht_m;
@@ -30,40 +121,301 @@ static PyObject* itm_point_to_point(PyObject* self, PyObject* args) {
     return NULL;
   }
 
-  if (!PyList_Check(elev_obj)) {
+  Profile profile;
+  if (!GetProfile(elev_obj, &profile)) {
     return NULL;
   }
 
-  Py_ssize_t size = PyList_Size(elev_obj);
-  double* elev = new double[size];
-  for (Py_ssize_t i = 0; i < size; i++) {
-    PyObject* i_obj = PyList_GetItem(elev_obj, i);
-    double elev_val = PyFloat_AsDouble(i_obj);
+  double dbloss;
+  char strmode[100];
+  int errnum;
+  // The model keeps all its state in the call, so it runs without the GIL
+  // and calls from several threads run in parallel. The profile is held by
+  // the Profile until it is released below.
+  Py_BEGIN_ALLOW_THREADS
+  point_to_point(profile.elev, tht_m, rht_m, eps_dielect, sgm_conductivity, eno_ns_surfref,
+                 frq_mhz, radio_climate, pol, conf, rel,
+                 dbloss, strmode, errnum);
+  Py_END_ALLOW_THREADS
+  ReleaseProfile(&profile);
+
+  return Py_BuildValue("dis", dbloss, errnum, strmode);
+}
+
+// Returns a new array of the numbers in the sequence, setting size to its
+// length, or NULL with a Python exception set on failure.
+static double* GetDoubles(PyObject* obj, const char* message, Py_ssize_t* size) {
+  PyObject* seq = PySequence_Fast(obj, message);
+  if (seq == NULL) {
+    return NULL;
+  }
+  *size = PySequence_Fast_GET_SIZE(seq);
+  double* values = new double[*size > 0 ? *size : 1];
+  for (Py_ssize_t i = 0; i < *size; i++) {
+    values[i] = PyFloat_AsDouble(PySequence_Fast_GET_ITEM(seq, i));
     if (PyErr_Occurred()) {
-      delete[] elev;
+      delete[] values;
+      Py_DECREF(seq);
       return NULL;
     }
-    elev[i] = elev_val;
+  }
+  Py_DECREF(seq);
+  return values;
+}
+
+static PyObject* itm_point_to_point_quantiles(PyObject* self, PyObject* args) {
+  PyObject* elev_obj = NULL;
+  double tht_m, rht_m;
+  double eps_dielect, sgm_conductivity, eno_ns_surfref;
+  double frq_mhz;
+  int radio_climate, pol;
+  PyObject* rels_obj = NULL;
+  PyObject* confs_obj = NULL;
+  if (!PyArg_ParseTuple(args, "OddddddiiOO:point_to_point_quantiles",
+                        &elev_obj, &tht_m, &rht_m, &eps_dielect, &sgm_conductivity, &eno_ns_surfref,
+                        &frq_mhz, &radio_climate, &pol, &rels_obj, &confs_obj)) {
+    return NULL;
+  }
+
+  Py_ssize_t num_rels, num_confs;
+  double* rels = GetDoubles(rels_obj, "point_to_point_quantiles: rels must be a sequence",
+                            &num_rels);
+  if (rels == NULL) {
+    return NULL;
+  }
+  double* confs = GetDoubles(confs_obj, "point_to_point_quantiles: confs must be a sequence",
+                             &num_confs);
+  if (confs == NULL) {
+    delete[] rels;
+    return NULL;
+  }
+
+  Profile profile;
+  npy_intp dims[2] = { num_rels, num_confs };
+  PyObject* dbloss = NULL;
+  if (GetProfile(elev_obj, &profile)) {
+    dbloss = PyArray_SimpleNew(2, dims, NPY_FLOAT64);
+    if (dbloss == NULL) {
+      ReleaseProfile(&profile);
+    }
+  }
+  if (dbloss == NULL) {
+    delete[] rels;
+    delete[] confs;
+    return NULL;
   }
 
-  elev[0] = size-3;
-  double dbloss;
   char strmode[100];
   int errnum;
-  point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity, eno_ns_surfref,
-                 frq_mhz, radio_climate, pol, conf, rel,
-                 dbloss, strmode, errnum);
-  delete[] elev;
+  double* dbloss_data = (double*)PyArray_DATA((PyArrayObject*)dbloss);
+  Py_BEGIN_ALLOW_THREADS
+  point_to_point_quantiles(profile.elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                           eno_ns_surfref, frq_mhz, radio_climate, pol,
+                           rels, (int)num_rels, confs, (int)num_confs,
+                           dbloss_data, strmode, errnum);
+  Py_END_ALLOW_THREADS
+  ReleaseProfile(&profile);
+  delete[] rels;
+  delete[] confs;
 
-  return Py_BuildValue("dis", dbloss, errnum, strmode);
+  return Py_BuildValue("Nis", dbloss, errnum, strmode);
+}
+
+// Returns the PROPMODE_* code of the point_to_point mode string, or -1.
+static int PropMode(const char* strmode) {
+  if (strcmp(strmode, STRMODE_LINE_OF_SIGHT) == 0) {
+    return 0;
+  } else if (strcmp(strmode, STRMODE_SINGLE_HORIZON_DIFFRACTION) == 0) {
+    return PROPMODE_SINGLE_HORIZON_DIFFRACTION;
+  } else if (strcmp(strmode, STRMODE_SINGLE_HORIZON_TROPOSCATTER) == 0) {
+    return PROPMODE_SINGLE_HORIZON_TROPOSCATTER;
+  } else if (strcmp(strmode, STRMODE_DOUBLE_HORIZON_DIFFRACTION) == 0) {
+    return PROPMODE_DOUBLE_HORIZON_DIFFRACTION;
+  } else if (strcmp(strmode, STRMODE_DOUBLE_HORIZON_TROPOSCATTER) == 0) {
+    return PROPMODE_DOUBLE_HORIZON_TROPOSCATTER;
+  }
+  return -1;
+}
+
+static PyObject* itm_point_to_point_batch(PyObject* self, PyObject* args, PyObject* kwargs) {
+  static const int kNumParams = 10;
+  static const char* param_names[kNumParams] = {
+    "tht_m", "rht_m", "eps_dielect", "sgm_conductivity", "eno_ns_surfref",
+    "frq_mhz", "radio_climate", "pol", "conf", "rel"
+  };
+  static char* kwlist[] = {
+    (char*)"profiles", (char*)"tht_m", (char*)"rht_m", (char*)"eps_dielect",
+    (char*)"sgm_conductivity", (char*)"eno_ns_surfref", (char*)"frq_mhz",
+    (char*)"radio_climate", (char*)"pol", (char*)"conf", (char*)"rel",
+    (char*)"offsets", NULL
+  };
+  PyObject* profiles_obj = NULL;
+  PyObject* param_objs[kNumParams];
+  PyObject* offsets_obj = NULL;
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOOOOOOO|O:point_to_point_batch", kwlist,
+                                   &profiles_obj, &param_objs[0], &param_objs[1],
+                                   &param_objs[2], &param_objs[3], &param_objs[4],
+                                   &param_objs[5], &param_objs[6], &param_objs[7],
+                                   &param_objs[8], &param_objs[9], &offsets_obj)) {
+    return NULL;
+  }
+
+  // The profiles are either the rows of a 2-D array, each holding one
+  // profile [n, dx, e0, ..., en] followed by any padding, or a 1-D array
+  // holding the profiles one after another, starting at the given offsets.
+  Py_buffer profiles;
+  if (PyObject_GetBuffer(profiles_obj, &profiles, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) != 0) {
+    return NULL;
+  }
+  if (NumericFormat(profiles) != 'd' ||
+      (offsets_obj == NULL && profiles.ndim != 2) ||
+      (offsets_obj != NULL && profiles.ndim != 1)) {
+    PyBuffer_Release(&profiles);
+    PyErr_SetString(PyExc_TypeError,
+                    "point_to_point_batch: profiles must be a 2-D float64 array, "
+                    "or a 1-D float64 array with offsets");
+    return NULL;
+  }
+  const double* data = (const double*)profiles.buf;
+  Py_ssize_t data_size = profiles.len / sizeof(double);
+
+  Py_ssize_t num_paths;
+  Param offsets;
+  offsets.has_view = false;
+  if (offsets_obj == NULL) {
+    num_paths = profiles.shape[0];
+  } else {
+    num_paths = PySequence_Size(offsets_obj);
+    if (num_paths < 0 ||
+        !GetParam(offsets_obj, "point_to_point_batch", "offsets", num_paths, &offsets)) {
+      PyBuffer_Release(&profiles);
+      return NULL;
+    }
+  }
+
+  Param params[kNumParams];
+  for (int k = 0; k < kNumParams; k++) {
+    if (!GetParam(param_objs[k], "point_to_point_batch", param_names[k], num_paths,
+                  &params[k])) {
+      for (int j = 0; j < k; j++) {
+        ReleaseParam(&params[j]);
+      }
+      ReleaseParam(&offsets);
+      PyBuffer_Release(&profiles);
+      return NULL;
+    }
+  }
+
+  // Finds and checks the start of each profile before leaving the GIL.
+  const double** elevs = new const double*[num_paths > 0 ? num_paths : 1];
+  bool valid = true;
+  for (Py_ssize_t i = 0; i < num_paths && valid; i++) {
+    Py_ssize_t start, end;
+    if (offsets_obj == NULL) {
+      start = i * profiles.shape[1];
+      end = start + profiles.shape[1];
+    } else {
+      start = (Py_ssize_t)ParamValue(offsets, i);
+      end = data_size;
+    }
+    if (start < 0 || start + 3 > end) {
+      valid = false;
+      break;
+    }
+    double n = data[start];
+    if (n < 0 || n != (double)(long)n || start + (Py_ssize_t)n + 3 > end) {
+      valid = false;
+      break;
+    }
+    elevs[i] = data + start;
+  }
+
+  PyObject* loss = NULL;
+  PyObject* err = NULL;
+  PyObject* mode = NULL;
+  if (!valid) {
+    PyErr_SetString(PyExc_ValueError,
+                    "point_to_point_batch: a profile does not fit its array");
+  } else {
+    npy_intp dims[1] = { num_paths };
+    loss = PyArray_SimpleNew(1, dims, NPY_FLOAT64);
+    err = PyArray_SimpleNew(1, dims, NPY_INT32);
+    mode = PyArray_SimpleNew(1, dims, NPY_INT32);
+  }
+
+  if (loss != NULL && err != NULL && mode != NULL) {
+    double* loss_data = (double*)PyArray_DATA((PyArrayObject*)loss);
+    npy_int32* err_data = (npy_int32*)PyArray_DATA((PyArrayObject*)err);
+    npy_int32* mode_data = (npy_int32*)PyArray_DATA((PyArrayObject*)mode);
+
+    Py_BEGIN_ALLOW_THREADS
+    for (Py_ssize_t i = 0; i < num_paths; i++) {
+      double dbloss;
+      char strmode[100];
+      int errnum;
+      point_to_point((double*)elevs[i],
+                     ParamValue(params[0], i), ParamValue(params[1], i),
+                     ParamValue(params[2], i), ParamValue(params[3], i),
+                     ParamValue(params[4], i), ParamValue(params[5], i),
+                     (int)ParamValue(params[6], i), (int)ParamValue(params[7], i),
+                     ParamValue(params[8], i), ParamValue(params[9], i),
+                     dbloss, strmode, errnum);
+      loss_data[i] = dbloss;
+      err_data[i] = errnum;
+      mode_data[i] = PropMode(strmode);
+    }
+    Py_END_ALLOW_THREADS
+  }
+
+  delete[] elevs;
+  for (int k = 0; k < kNumParams; k++) {
+    ReleaseParam(&params[k]);
+  }
+  ReleaseParam(&offsets);
+  PyBuffer_Release(&profiles);
+
+  if (loss == NULL || err == NULL || mode == NULL) {
+    Py_XDECREF(loss);
+    Py_XDECREF(err);
+    Py_XDECREF(mode);
+    return NULL;
+  }
+  return Py_BuildValue("NNN", loss, err, mode);
 }
 
 static PyMethodDef ITMMethods[] = {
   {"point_to_point", itm_point_to_point, METH_VARARGS, "Point-to-point model"},
+  {"point_to_point_quantiles", itm_point_to_point_quantiles, METH_VARARGS,
+   "Point-to-point model for several quantiles of one path. Takes the\n"
+   "point_to_point arguments with sequences of reliabilities and confidences\n"
+   "in place of rel and conf, prepares the path once, and returns a 2-D array\n"
+   "of the losses for each reliability (rows) and confidence (columns), with\n"
+   "the error code and mode string."},
+  {"point_to_point_batch", (PyCFunction)itm_point_to_point_batch,
+   METH_VARARGS | METH_KEYWORDS,
+   "Point-to-point model for many paths. Takes the profiles as the rows of a\n"
+   "2-D float64 array, or as a 1-D float64 array with an offsets array\n"
+   "giving the start of each profile, and the other point_to_point arguments\n"
+   "as numbers or as arrays with one value per path. Runs with the GIL\n"
+   "released and returns arrays of the loss, error code and PROPMODE_* mode."},
   {NULL, NULL, 0, NULL}
 };
 
 PyMODINIT_FUNC inititm(void) {
-  Py_InitModule3("itm", ITMMethods, "Longley-Rice ITM Propagation Module");
+  PyObject* m = Py_InitModule3("itm", ITMMethods, "Longley-Rice ITM Propagation Module");
+  if (m == NULL) {
+    return;
+  }
+  import_array();
+  PyModule_AddIntConstant(m, "PROPMODE_UNDEFINED", -1);
+  PyModule_AddIntConstant(m, "PROPMODE_LINE_OF_SIGHT", 0);
+  PyModule_AddIntConstant(m, "PROPMODE_SINGLE_HORIZON_DIFFRACTION",
+                          PROPMODE_SINGLE_HORIZON_DIFFRACTION);
+  PyModule_AddIntConstant(m, "PROPMODE_SINGLE_HORIZON_TROPOSCATTER",
+                          PROPMODE_SINGLE_HORIZON_TROPOSCATTER);
+  PyModule_AddIntConstant(m, "PROPMODE_DOUBLE_HORIZON_DIFFRACTION",
+                          PROPMODE_DOUBLE_HORIZON_DIFFRACTION);
+  PyModule_AddIntConstant(m, "PROPMODE_DOUBLE_HORIZON_TROPOSCATTER",
+                          PROPMODE_DOUBLE_HORIZON_TROPOSCATTER);
 }
 
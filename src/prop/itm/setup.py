@@ -17,8 +17,11 @@
 # module. See distutils documentation for more info.
 
 from distutils.core import Extension, setup
+import numpy
 
-itm_module = Extension('itm', sources = ['itm.cpp', 'itm_py.cpp'])
+# '..' holds batch_param.h, shared with the eHata extension.
+itm_module = Extension('itm', sources = ['itm.cpp', 'itm_py.cpp'],
+                       include_dirs = ['..', numpy.get_include()])
 
 setup(name = 'itm',
       version = '1.0',
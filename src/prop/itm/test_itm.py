@@ -77,3 +77,103 @@ if abs(loss-135.8) > 0.2:
 else:
   print "SUCCESS: expected 135.8, got ", loss
 
+
+# The same profile as a contiguous float64 array, as used by
+# geo/terrain_profile.TerrainProfile, is passed without copying and must give
+# the same result.
+import numpy
+
+loss_array, err_array, mode_array = itm.point_to_point(
+    numpy.array(path, dtype=numpy.float64), 143.9, 8.5, 15, .005, 314, 41.5, 5, 0, .5, .5)
+
+if loss_array != loss or err_array != err or mode_array != mode:
+  print "FAIL: array profile gave ", loss_array
+else:
+  print "SUCCESS: array profile gave ", loss_array
+
+
+# The batch call over a 2-D array of padded profiles, with per-path receiver
+# heights and frequencies, must give the same results as per-path calls. The
+# second path uses a shortened profile.
+short_path = [ 80, 499 ] + path[2:2+81]
+profiles = numpy.zeros((2, len(path)))
+profiles[0, :] = path
+profiles[1, :len(short_path)] = short_path
+rht = numpy.array([8.5, 20.0])
+frq = numpy.array([41.5, 3625.0])
+
+losses, errs, modes = itm.point_to_point_batch(
+    profiles, 143.9, rht, 15, .005, 314, frq, 5, 0, .5, .5)
+
+for i, p in enumerate([path, short_path]):
+  loss_i, err_i, mode_i = itm.point_to_point(p, 143.9, rht[i], 15, .005, 314, frq[i], 5, 0, .5, .5)
+  if losses[i] != loss_i or errs[i] != err_i:
+    print "FAIL: batch path %d gave %f, expected %f" % (i, losses[i], loss_i)
+  else:
+    print "SUCCESS: batch path %d gave %f (%s)" % (i, losses[i], mode_i)
+
+# The same profiles packed in a flat array with offsets.
+flat = numpy.array(path + short_path, dtype=numpy.float64)
+offsets = numpy.array([0, len(path)])
+flat_losses, flat_errs, flat_modes = itm.point_to_point_batch(
+    flat, 143.9, rht, 15, .005, 314, frq, 5, 0, .5, .5, offsets=offsets)
+
+if (list(flat_losses) != list(losses) or list(flat_errs) != list(errs) or
+    list(flat_modes) != list(modes)):
+  print "FAIL: flat profiles gave ", flat_losses
+else:
+  print "SUCCESS: flat profiles gave ", flat_losses
+
+# A parameter array of the wrong length is reported with its length.
+try:
+  itm.point_to_point_batch(profiles, 143.9, numpy.array([8.5, 20.0, 1.5]), 15, .005,
+                           314, frq, 5, 0, .5, .5)
+  print "FAIL: rht_m of the wrong length was accepted"
+except ValueError as e:
+  if str(e) != 'point_to_point_batch: rht_m has 3 values for 2 paths':
+    print "FAIL: wrong length error was ", e
+  else:
+    print "SUCCESS: wrong length error was ", e
+
+
+# The model keeps no state between calls and runs without the GIL, so calls
+# from a thread pool must give the same results as serial calls. Runs many
+# paths with varied heights, frequencies and profile lengths from 8 threads.
+from multiprocessing.pool import ThreadPool
+
+def RunPath(k):
+  n = 20 + (k * 7) % (len(path) - 22)
+  p = [ n, 100 + k % 400 ] + path[2:n+3]
+  return itm.point_to_point(p, 10 + k % 150, 1 + k % 20, 15, .005, 314,
+                            50 + 37 * k % 3000, 1 + k % 7, k % 2, .5, .5)
+
+serial = [RunPath(k) for k in range(2000)]
+pool = ThreadPool(8)
+threaded = pool.map(RunPath, range(2000), chunksize=1)
+pool.close()
+pool.join()
+
+if threaded != serial:
+  print "FAIL: threaded results differ from serial results"
+else:
+  print "SUCCESS: %d threaded results equal serial results" % len(threaded)
+
+
+# Several quantiles of one path, prepared once, must give the same losses as
+# separate point_to_point calls.
+rels = [0.01, 0.1, 0.5, 0.9, 0.99]
+confs = [0.5, 0.9, 0.1]
+quantile_losses, quantile_err, quantile_mode = itm.point_to_point_quantiles(
+    path, 143.9, 8.5, 15, .005, 314, 41.5, 5, 0, rels, confs)
+
+failed = False
+for i, rel in enumerate(rels):
+  for j, conf in enumerate(confs):
+    loss_ij, err_ij, mode_ij = itm.point_to_point(path, 143.9, 8.5, 15, .005, 314, 41.5, 5, 0,
+                                                  conf, rel)
+    if quantile_losses[i, j] != loss_ij or quantile_mode != mode_ij:
+      print "FAIL: quantile (%f, %f) gave %f, expected %f" % (rel, conf, quantile_losses[i, j],
+                                                              loss_ij)
+      failed = True
+if not failed:
+  print "SUCCESS: %d quantiles equal point_to_point" % quantile_losses.size
@@ -132,9 +132,9 @@ void ComputeTerrainStatistics(float *pfl, InterValues *interValues)
     int i10 = 0.1 * npts - 1;
     int i50 = 0.5 * npts - 1;
     int i90 = 0.9 * npts - 1;
-    interValues->pfl10__meter = FindQuantile(npts, pfl_segment, i10);
-    interValues->pfl50__meter = FindQuantile(npts, pfl_segment, i50);
-    interValues->pfl90__meter = FindQuantile(npts, pfl_segment, i90);
+    interValues->pfl10__meter = FindQuantile(npts - 1, pfl_segment, i10);
+    interValues->pfl50__meter = FindQuantile(npts - 1, pfl_segment, i50);
+    interValues->pfl90__meter = FindQuantile(npts - 1, pfl_segment, i90);
     interValues->deltah__meter = interValues->pfl10__meter - interValues->pfl90__meter;
 
     // "If the path is less than 10 km in distance, then the asymptotic value
@@ -13,43 +13,143 @@
 // limitations under the License.
 
 #include "ehata.h"
+#include "batch_param.h"
 #include <Python.h>
+#include <numpy/arrayobject.h>
 
+#include <cstring>
 #include <iostream>
 
-static PyObject* ehata_point_to_point(PyObject* self, PyObject* args) {
-  PyObject* elev_obj = NULL;
-  double frq_mhz;
-  double hb_m;
-  double hm_m;
-  int environment;
-  if (!PyArg_ParseTuple(args, "Odddi:ehata_point_to_point",
-                        &elev_obj, &frq_mhz, &hb_m, &hm_m, &environment)) {
-    return NULL;
+// Returns true if the buffer holds a one-dimensional array of native values
+// of the given struct format code and size.
+static bool IsArrayOf(const Py_buffer& view, const char* code, Py_ssize_t itemsize) {
+  if (view.ndim != 1 || view.itemsize != itemsize || view.format == NULL) {
+    return false;
   }
+  const char* format = view.format;
+  if (*format == '@' || *format == '=') {
+    format++;
+  }
+  return strcmp(format, code) == 0;
+}
 
-  if (!PyList_Check(elev_obj)) {
-    return NULL;
+// Terrain profile in the ITM layout [n, dx, e0, ..., en] passed to the model.
+// The model works in single precision: a contiguous float32 array whose n
+// matches its length is used in place through the buffer protocol, and a
+// contiguous float64 array, such as a TerrainProfile, is converted without
+// going through Python objects. Any other sequence of numbers is copied
+// element by element. n is set from the length of copied profiles.
+struct Profile {
+  Py_buffer view;
+  bool has_view;
+  float* copy;
+  float* elev;
+  Py_ssize_t size;
+};
+
+// Fills the profile from the object. Returns false with a Python exception
+// set on failure.
+static bool GetProfile(PyObject* elev_obj, Profile* profile) {
+  profile->has_view = false;
+  profile->copy = NULL;
+  profile->elev = NULL;
+  profile->size = 0;
+
+  if (PyObject_CheckBuffer(elev_obj)) {
+    Py_buffer view;
+    if (PyObject_GetBuffer(elev_obj, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+      if (IsArrayOf(view, "f", sizeof(float))) {
+        float* elev = (float*)view.buf;
+        Py_ssize_t size = view.len / sizeof(float);
+        if (size >= 3 && elev[0] == size-3) {
+          profile->view = view;
+          profile->has_view = true;
+          profile->elev = elev;
+          profile->size = size;
+          return true;
+        }
+      } else if (IsArrayOf(view, "d", sizeof(double))) {
+        const double* values = (const double*)view.buf;
+        Py_ssize_t size = view.len / sizeof(double);
+        if (size >= 3) {
+          float* elev = new float[size];
+          for (Py_ssize_t i = 0; i < size; i++) {
+            elev[i] = (float)values[i];
+          }
+          PyBuffer_Release(&view);
+          elev[0] = size-3;
+          profile->copy = elev;
+          profile->elev = elev;
+          profile->size = size;
+          return true;
+        }
+      }
+      PyBuffer_Release(&view);
+    } else {
+      PyErr_Clear();
+    }
   }
 
-  Py_ssize_t size = PyList_Size(elev_obj);
+  PyObject* seq = PySequence_Fast(elev_obj, "ehata_point_to_point: profile must be a sequence");
+  if (seq == NULL) {
+    return false;
+  }
+  Py_ssize_t size = PySequence_Fast_GET_SIZE(seq);
+  if (size < 3) {
+    Py_DECREF(seq);
+    PyErr_SetString(PyExc_ValueError, "ehata_point_to_point: profile is too short");
+    return false;
+  }
   float* elev = new float[size];
   for (Py_ssize_t i = 0; i < size; i++) {
-    PyObject* i_obj = PyList_GetItem(elev_obj, i);
+    PyObject* i_obj = PySequence_Fast_GET_ITEM(seq, i);
     double elev_val = PyFloat_AsDouble(i_obj);
     if (PyErr_Occurred()) {
       delete[] elev;
-      return NULL;
+      Py_DECREF(seq);
+      return false;
     }
     elev[i] = (float)elev_val;
   }
+  Py_DECREF(seq);
 
   elev[0] = size-3;
+  profile->copy = elev;
+  profile->elev = elev;
+  profile->size = size;
+  return true;
+}
+
+static void ReleaseProfile(Profile* profile) {
+  if (profile->has_view) {
+    PyBuffer_Release(&profile->view);
+    profile->has_view = false;
+  }
+  delete[] profile->copy;
+  profile->copy = NULL;
+}
+
+static PyObject* ehata_point_to_point(PyObject* self, PyObject* args) {
+  PyObject* elev_obj = NULL;
+  double frq_mhz;
+  double hb_m;
+  double hm_m;
+  int environment;
+  if (!PyArg_ParseTuple(args, "Odddi:ehata_point_to_point",
+                        &elev_obj, &frq_mhz, &hb_m, &hm_m, &environment)) {
+    return NULL;
+  }
+
+  Profile profile;
+  if (!GetProfile(elev_obj, &profile)) {
+    return NULL;
+  }
+
   float dbloss;
-  InterValues dbg_vals;
-  ExtendedHata_DBG(elev, frq_mhz, hb_m, hm_m, environment,
+  InterValues dbg_vals = InterValues();
+  ExtendedHata_DBG(profile.elev, frq_mhz, hb_m, hm_m, environment,
                    &dbloss, &dbg_vals);
-  delete[] elev;
+  ReleaseProfile(&profile);
 
   return Py_BuildValue("dddddddddddddddddddbddi", dbloss,
 		       (double)dbg_vals.d_bp__km, (double)dbg_vals.att_1km, (double)dbg_vals.att_100km,
@@ -64,12 +164,273 @@ static PyObject* ehata_point_to_point(PyObject* self, PyObject* args) {
 		       (double)dbg_vals.slope_max, (double)dbg_vals.slope_min, dbg_vals.trace_code);
 }
 
+// Adds a new array of the given shape and type to the dict under key and
+// returns its data, or returns NULL with a Python exception set.
+static void* AddArray(PyObject* dict, const char* key, int ndim, npy_intp* dims,
+                      int type_num) {
+  PyObject* array = PyArray_SimpleNew(ndim, dims, type_num);
+  if (array == NULL) {
+    return NULL;
+  }
+  int status = PyDict_SetItemString(dict, key, array);
+  Py_DECREF(array);
+  if (status != 0) {
+    return NULL;
+  }
+  return PyArray_DATA((PyArrayObject*)array);
+}
+
+// Returns a dict of arrays of the intermediate values of all the paths, with
+// the keys of the dict returned by pyhata.point_to_point. The horizon and
+// avg arrays have two columns, for the two ends of the paths.
+static PyObject* DebugDict(const InterValues* dbg_vals, Py_ssize_t num_paths) {
+  PyObject* dict = PyDict_New();
+  if (dict == NULL) {
+    return NULL;
+  }
+  npy_intp dims[2] = { num_paths, 2 };
+  double* breakpoint = (double*)AddArray(dict, "breakpoint", 1, dims, NPY_FLOAT64);
+  double* att_1km = (double*)AddArray(dict, "att_1km", 1, dims, NPY_FLOAT64);
+  double* att_100km = (double*)AddArray(dict, "att_100km", 1, dims, NPY_FLOAT64);
+  double* h_b_eff = (double*)AddArray(dict, "h_b_eff", 1, dims, NPY_FLOAT64);
+  double* h_m_eff = (double*)AddArray(dict, "h_m_eff", 1, dims, NPY_FLOAT64);
+  double* pfl10 = (double*)AddArray(dict, "pfl10", 1, dims, NPY_FLOAT64);
+  double* pfl50 = (double*)AddArray(dict, "pfl50", 1, dims, NPY_FLOAT64);
+  double* pfl90 = (double*)AddArray(dict, "pfl90", 1, dims, NPY_FLOAT64);
+  double* delta_h = (double*)AddArray(dict, "delta_h", 1, dims, NPY_FLOAT64);
+  double* distance = (double*)AddArray(dict, "distance", 1, dims, NPY_FLOAT64);
+  double* horizon = (double*)AddArray(dict, "horizon", 2, dims, NPY_FLOAT64);
+  double* avg = (double*)AddArray(dict, "avg", 2, dims, NPY_FLOAT64);
+  double* theta_m = (double*)AddArray(dict, "theta_m", 1, dims, NPY_FLOAT64);
+  double* beta = (double*)AddArray(dict, "beta", 1, dims, NPY_FLOAT64);
+  npy_int32* iend_over_sea = (npy_int32*)AddArray(dict, "iend_over_sea", 1, dims, NPY_INT32);
+  double* hedge = (double*)AddArray(dict, "hedge", 1, dims, NPY_FLOAT64);
+  npy_bool* single_horizon = (npy_bool*)AddArray(dict, "single_horizon", 1, dims, NPY_BOOL);
+  double* slope_max = (double*)AddArray(dict, "slope_max", 1, dims, NPY_FLOAT64);
+  double* slope_min = (double*)AddArray(dict, "slope_min", 1, dims, NPY_FLOAT64);
+  npy_int32* trace_code = (npy_int32*)AddArray(dict, "trace_code", 1, dims, NPY_INT32);
+  if (!breakpoint || !att_1km || !att_100km || !h_b_eff || !h_m_eff ||
+      !pfl10 || !pfl50 || !pfl90 || !delta_h || !distance || !horizon || !avg ||
+      !theta_m || !beta || !iend_over_sea || !hedge || !single_horizon ||
+      !slope_max || !slope_min || !trace_code) {
+    Py_DECREF(dict);
+    return NULL;
+  }
+
+  for (Py_ssize_t i = 0; i < num_paths; i++) {
+    const InterValues& v = dbg_vals[i];
+    breakpoint[i] = v.d_bp__km;
+    att_1km[i] = v.att_1km;
+    att_100km[i] = v.att_100km;
+    h_b_eff[i] = v.h_b_eff__meter;
+    h_m_eff[i] = v.h_m_eff__meter;
+    pfl10[i] = v.pfl10__meter;
+    pfl50[i] = v.pfl50__meter;
+    pfl90[i] = v.pfl90__meter;
+    delta_h[i] = v.deltah__meter;
+    distance[i] = v.d__km;
+    horizon[2*i] = v.d_hzn__meter[0];
+    horizon[2*i + 1] = v.d_hzn__meter[1];
+    avg[2*i] = v.h_avg__meter[0];
+    avg[2*i + 1] = v.h_avg__meter[1];
+    theta_m[i] = v.theta_m__mrad;
+    beta[i] = v.beta;
+    iend_over_sea[i] = v.iend_ov_sea;
+    hedge[i] = v.hedge_tilda;
+    single_horizon[i] = v.single_horizon;
+    slope_max[i] = v.slope_max;
+    slope_min[i] = v.slope_min;
+    trace_code[i] = v.trace_code;
+  }
+  return dict;
+}
+
+static PyObject* ehata_point_to_point_batch(PyObject* self, PyObject* args, PyObject* kwargs) {
+  static const int kNumParams = 4;
+  static const char* param_names[kNumParams] = {
+    "frq_mhz", "hb_m", "hm_m", "environment"
+  };
+  static char* kwlist[] = {
+    (char*)"profiles", (char*)"frq_mhz", (char*)"hb_m", (char*)"hm_m",
+    (char*)"environment", (char*)"offsets", (char*)"debug", NULL
+  };
+  PyObject* profiles_obj = NULL;
+  PyObject* param_objs[kNumParams];
+  PyObject* offsets_obj = Py_None;
+  PyObject* debug_obj = Py_False;
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOO|OO:ehata_point_to_point_batch", kwlist,
+                                   &profiles_obj, &param_objs[0], &param_objs[1],
+                                   &param_objs[2], &param_objs[3], &offsets_obj,
+                                   &debug_obj)) {
+    return NULL;
+  }
+  int debug = PyObject_IsTrue(debug_obj);
+  if (debug < 0) {
+    return NULL;
+  }
+  bool has_offsets = offsets_obj != Py_None;
+
+  // The profiles are either the rows of a 2-D array, each holding one
+  // profile [n, dx, e0, ..., en] followed by any padding, or a 1-D array
+  // holding the profiles one after another, starting at the given offsets.
+  // float32 profiles are used in place; float64 profiles are converted to
+  // the single precision of the model one at a time.
+  // Other layouts, e.g. a column slice of a larger array, are copied.
+  PyObject* profiles_array = PyArray_FROM_OF(profiles_obj, NPY_ARRAY_C_CONTIGUOUS);
+  if (profiles_array == NULL) {
+    return NULL;
+  }
+  Py_buffer profiles;
+  int status = PyObject_GetBuffer(profiles_array, &profiles, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT);
+  Py_DECREF(profiles_array);
+  if (status != 0) {
+    return NULL;
+  }
+  char format = NumericFormat(profiles);
+  if ((format != 'd' && format != 'f') ||
+      (!has_offsets && profiles.ndim != 2) ||
+      (has_offsets && profiles.ndim != 1)) {
+    PyBuffer_Release(&profiles);
+    PyErr_SetString(PyExc_TypeError,
+                    "ehata_point_to_point_batch: profiles must be a 2-D float64 or float32 "
+                    "array, or a 1-D array with offsets");
+    return NULL;
+  }
+  Py_ssize_t data_size = profiles.len / profiles.itemsize;
+
+  Py_ssize_t num_paths;
+  Param offsets;
+  offsets.has_view = false;
+  if (!has_offsets) {
+    num_paths = profiles.shape[0];
+  } else {
+    num_paths = PySequence_Size(offsets_obj);
+    if (num_paths < 0 ||
+        !GetParam(offsets_obj, "ehata_point_to_point_batch", "offsets", num_paths, &offsets)) {
+      PyBuffer_Release(&profiles);
+      return NULL;
+    }
+  }
+
+  Param params[kNumParams];
+  for (int k = 0; k < kNumParams; k++) {
+    if (!GetParam(param_objs[k], "ehata_point_to_point_batch", param_names[k], num_paths,
+                  &params[k])) {
+      for (int j = 0; j < k; j++) {
+        ReleaseParam(&params[j]);
+      }
+      ReleaseParam(&offsets);
+      PyBuffer_Release(&profiles);
+      return NULL;
+    }
+  }
+
+  // Finds and checks the start and length of each profile before leaving
+  // the GIL.
+  Py_ssize_t* starts = new Py_ssize_t[num_paths > 0 ? num_paths : 1];
+  Py_ssize_t max_size = 0;
+  bool valid = true;
+  for (Py_ssize_t i = 0; i < num_paths && valid; i++) {
+    Py_ssize_t start, end;
+    if (!has_offsets) {
+      start = i * profiles.shape[1];
+      end = start + profiles.shape[1];
+    } else {
+      start = (Py_ssize_t)ParamValue(offsets, i);
+      end = data_size;
+    }
+    if (start < 0 || start + 3 > end) {
+      valid = false;
+      break;
+    }
+    double n = format == 'd' ? ((const double*)profiles.buf)[start]
+                             : ((const float*)profiles.buf)[start];
+    if (n < 0 || n != (double)(long)n || start + (Py_ssize_t)n + 3 > end) {
+      valid = false;
+      break;
+    }
+    starts[i] = start;
+    max_size = MAX(max_size, (Py_ssize_t)n + 3);
+  }
+
+  PyObject* loss = NULL;
+  if (!valid) {
+    PyErr_SetString(PyExc_ValueError,
+                    "ehata_point_to_point_batch: a profile does not fit its array");
+  } else {
+    npy_intp dims[1] = { num_paths };
+    loss = PyArray_SimpleNew(1, dims, NPY_FLOAT64);
+  }
+
+  InterValues* dbg_vals = NULL;
+  if (loss != NULL) {
+    double* loss_data = (double*)PyArray_DATA((PyArrayObject*)loss);
+    // The model only sets the bits of trace_code, so it starts cleared.
+    dbg_vals = new InterValues[debug ? num_paths : 1]();
+
+    Py_BEGIN_ALLOW_THREADS
+    float* converted = format == 'd' ? new float[max_size] : NULL;
+    for (Py_ssize_t i = 0; i < num_paths; i++) {
+      float* elev;
+      if (format == 'd') {
+        const double* values = (const double*)profiles.buf + starts[i];
+        Py_ssize_t size = (Py_ssize_t)values[0] + 3;
+        for (Py_ssize_t j = 0; j < size; j++) {
+          converted[j] = (float)values[j];
+        }
+        elev = converted;
+      } else {
+        elev = (float*)profiles.buf + starts[i];
+      }
+      float dbloss;
+      ExtendedHata_DBG(elev, ParamValue(params[0], i), ParamValue(params[1], i),
+                       ParamValue(params[2], i), (int)ParamValue(params[3], i),
+                       &dbloss, &dbg_vals[debug ? i : 0]);
+      loss_data[i] = dbloss;
+    }
+    delete[] converted;
+    Py_END_ALLOW_THREADS
+  }
+
+  delete[] starts;
+  for (int k = 0; k < kNumParams; k++) {
+    ReleaseParam(&params[k]);
+  }
+  ReleaseParam(&offsets);
+  PyBuffer_Release(&profiles);
+
+  if (loss == NULL) {
+    delete[] dbg_vals;
+    return NULL;
+  }
+  if (!debug) {
+    delete[] dbg_vals;
+    return loss;
+  }
+  PyObject* dbg = DebugDict(dbg_vals, num_paths);
+  delete[] dbg_vals;
+  if (dbg == NULL) {
+    Py_DECREF(loss);
+    return NULL;
+  }
+  return Py_BuildValue("NN", loss, dbg);
+}
+
 static PyMethodDef EHATAMethods[] = {
   {"point_to_point", ehata_point_to_point, METH_VARARGS, "eHata Point-to-point model"},
+  {"point_to_point_batch", (PyCFunction)ehata_point_to_point_batch,
+   METH_VARARGS | METH_KEYWORDS,
+   "eHata model for many paths. Takes the profiles as the rows of a 2-D\n"
+   "float64 or float32 array, or as a 1-D array with an offsets array giving\n"
+   "the start of each profile, and the frequencies, base and mobile heights\n"
+   "and environment codes as numbers or 1-D arrays with one value per path.\n"
+   "Runs without the GIL and returns a float64 array of the losses, or with\n"
+   "debug=True the losses and a dict of arrays of the intermediate values."},
   {NULL, NULL, 0, NULL}
 };
 
 PyMODINIT_FUNC initehata(void) {
   Py_InitModule3("ehata", EHATAMethods, "eHata Propagation Module");
+  import_array();
 }
 
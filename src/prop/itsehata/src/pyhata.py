@@ -61,3 +61,17 @@ def point_to_point(elevation, transmitter_height_meters, receiver_height_meters,
 
 
 
+
+# eHata point-to-point loss model for many paths.
+# profiles holds the elevation profiles, in the format of point_to_point, as
+# the rows of a 2-D float64 or float32 array (padded after each profile), or
+# one after another in a 1-D array with offsets giving the start of each.
+# The heights, frequency and land category are numbers or arrays with one
+# value per path. The paths are computed without holding the GIL.
+# Returns an array of the losses, or with debug=True the losses and a dict of
+# arrays with the keys of the point_to_point dict.
+def point_to_point_batch(profiles, transmitter_height_meters, receiver_height_meters,
+                         frequency_mhz, land_category, offsets=None, debug=False):
+  return ehata.point_to_point_batch(profiles, frequency_mhz,
+                                    transmitter_height_meters, receiver_height_meters,
+                                    land_category, offsets=offsets, debug=debug)
@@ -17,7 +17,9 @@
 # module. See distutils documentation for more info.
 
 from distutils.core import Extension, setup
+import numpy
 
+# '../..' holds batch_param.h, shared with the ITM extension.
 ehata_module = Extension('ehata', sources = ['ExtendedHata.cpp',
                                              'FindHorizons.cpp',
                                              'FindQuantile.cpp',
@@ -29,7 +31,8 @@ ehata_module = Extension('ehata', sources = ['ExtendedHata.cpp',
                                              'MedianRollingHillyTerrainCorrectionFactor.cpp',
                                              'MixedPathCorrectionFactor.cpp',
                                              'PreprocessTerrainPath.cpp',
-                                             'ehata_py.cpp'])
+                                             'ehata_py.cpp'],
+                         include_dirs = ['../..', numpy.get_include()])
 
 setup(name = 'ehata',
       version = '1.0',
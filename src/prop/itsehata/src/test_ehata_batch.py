@@ -0,0 +1,159 @@
+# Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file checks the batch entry point of the eHata extension built from
+# ehata_py.cpp (see setup.py) against per-path ExtendedHata_DBG calls made
+# through ehata.point_to_point, over the ITS test paths in ../test.
+#
+# Run it from this directory after 'python setup.py build_ext -i'.
+
+import csv
+import os
+
+import numpy
+
+import ehata
+
+test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test')
+
+# The keys of the debug dict, in the order of the point_to_point results that
+# follow the loss. The horizon and avg entries take two results each.
+debug_keys = ['breakpoint', 'att_1km', 'att_100km', 'h_b_eff', 'h_m_eff',
+              'pfl10', 'pfl50', 'pfl90', 'delta_h', 'distance', 'horizon', 'avg',
+              'theta_m', 'beta', 'iend_over_sea', 'hedge', 'single_horizon',
+              'slope_max', 'slope_min', 'trace_code']
+
+paths = []
+with open(os.path.join(test_dir, 'test-inputs.csv')) as f:
+  for row in csv.DictReader(f):
+    with open(os.path.join(test_dir, 'pfls', row['pfl file name'])) as pfl_file:
+      pfl = [float(v) for v in pfl_file.read().split(',') if v.strip()]
+    paths.append((pfl[:int(pfl[0]) + 3], float(row['f']), float(row['hb']),
+                  float(row['hm']), int(row['env'])))
+
+pfls = [p[0] for p in paths]
+frq = numpy.array([p[1] for p in paths])
+hb = numpy.array([p[2] for p in paths])
+hm = numpy.array([p[3] for p in paths])
+env = numpy.array([p[4] for p in paths])
+num_paths = len(paths)
+
+# The profiles as the padded rows of a 2-D array, and one after another in a
+# 1-D array.
+width = max(len(pfl) for pfl in pfls) + 5
+profiles = numpy.zeros((num_paths, width))
+for i, pfl in enumerate(pfls):
+  profiles[i, :len(pfl)] = pfl
+flat = numpy.array(sum(pfls, []))
+offsets = numpy.cumsum([0] + [len(pfl) for pfl in pfls[:-1]])
+
+
+def Expected(i, frq_i, hb_i, hm_i, env_i):
+  result = ehata.point_to_point(pfls[i], frq_i, hb_i, hm_i, env_i)
+  dbg = list(result[1:11]) + [result[11:13], result[13:15]] + list(result[15:])
+  return result[0], dict(zip(debug_keys, dbg))
+
+
+def Check(name, losses, expected, dbg=None):
+  failed = False
+  for i in range(num_paths):
+    loss_i, dbg_i = expected[i]
+    if losses[i] != loss_i:
+      print "FAIL: %s path %d gave %f, expected %f" % (name, i, losses[i], loss_i)
+      failed = True
+    if dbg is None:
+      continue
+    for key in debug_keys:
+      if list(numpy.atleast_1d(dbg[key][i])) != list(numpy.atleast_1d(dbg_i[key])):
+        print "FAIL: %s path %d %s gave %s, expected %s" % (name, i, key, dbg[key][i],
+                                                           dbg_i[key])
+        failed = True
+  if not failed:
+    print "SUCCESS: %s gave the per-path losses of %d paths" % (name, num_paths)
+
+
+def CheckError(name, error, message, *args, **kwargs):
+  try:
+    ehata.point_to_point_batch(*args, **kwargs)
+    print "FAIL: %s was accepted" % name
+  except error as e:
+    if message not in str(e):
+      print "FAIL: %s error was %s" % (name, e)
+    else:
+      print "SUCCESS: %s error was %s" % (name, e)
+
+
+# One value of each parameter per path.
+expected = [Expected(i, frq[i], hb[i], hm[i], env[i]) for i in range(num_paths)]
+Check('float64 rows', ehata.point_to_point_batch(profiles, frq, hb, hm, env), expected)
+losses, dbg = ehata.point_to_point_batch(profiles, frq, hb, hm, env, debug=True)
+Check('float64 rows with debug', losses, expected, dbg)
+Check('float32 rows', ehata.point_to_point_batch(profiles.astype(numpy.float32),
+                                                 frq, hb, hm, env), expected)
+Check('offsets', ehata.point_to_point_batch(flat, frq, hb, hm, env, offsets=offsets),
+      expected)
+losses, dbg = ehata.point_to_point_batch(flat.astype(numpy.float32), frq, hb, hm, env,
+                                         offsets=offsets.astype(numpy.int32), debug=True)
+Check('float32 offsets with debug', losses, expected, dbg)
+
+# Parameters of other numeric types.
+Check('typed parameters',
+      ehata.point_to_point_batch(profiles, frq.astype(numpy.float32), hb.astype(numpy.int64),
+                                 hm, env.astype(numpy.int32)),
+      [Expected(i, float(numpy.float32(frq[i])), int(hb[i]), hm[i], env[i])
+       for i in range(num_paths)])
+
+# One value of the parameters for all the paths, as numbers and as 0-D arrays.
+expected = [Expected(i, 3625., 50., 1.5, 22) for i in range(num_paths)]
+Check('scalar parameters', ehata.point_to_point_batch(profiles, 3625., 50., 1.5, 22),
+      expected)
+losses, dbg = ehata.point_to_point_batch(flat, numpy.float64(3625.), numpy.array(50.), 1.5,
+                                         numpy.array(22), offsets=offsets, debug=True)
+Check('0-D parameters with offsets and debug', losses, expected, dbg)
+
+# No paths.
+losses = ehata.point_to_point_batch(numpy.zeros((0, 10)), 3625., 50., 1.5, 22)
+if losses.shape != (0,):
+  print "FAIL: no paths gave ", losses
+else:
+  print "SUCCESS: no paths gave ", losses
+
+# Errors.
+CheckError('hm_m of the wrong length', ValueError,
+           'ehata_point_to_point_batch: hm_m has 3 values for %d paths' % num_paths,
+           profiles, frq, hb, numpy.array([1.5, 3., 10.]), env)
+CheckError('offsets of the wrong type', TypeError,
+           'ehata_point_to_point_batch: offsets must be a number or a 1-D numeric array',
+           flat, frq, hb, hm, env, offsets=[str(o) for o in offsets])
+CheckError('a 2-D parameter', TypeError,
+           'ehata_point_to_point_batch: frq_mhz must be a number or a 1-D numeric array',
+           profiles, frq.reshape(1, -1), hb, hm, env)
+CheckError('a string parameter', TypeError,
+           'ehata_point_to_point_batch: environment must be a number or a 1-D numeric array',
+           profiles, frq, hb, hm, 'urban')
+CheckError('1-D profiles without offsets', TypeError,
+           'ehata_point_to_point_batch: profiles must be',
+           flat, frq, hb, hm, env)
+CheckError('integer profiles', TypeError,
+           'ehata_point_to_point_batch: profiles must be',
+           profiles.astype(numpy.int64), frq, hb, hm, env)
+CheckError('a profile longer than its row', ValueError,
+           'ehata_point_to_point_batch: a profile does not fit its array',
+           profiles[:, :width - 10], frq, hb, hm, env)
+CheckError('an offset past the end', ValueError,
+           'ehata_point_to_point_batch: a profile does not fit its array',
+           flat, frq, hb, hm, env, offsets=offsets + 3)
+CheckError('a negative offset', ValueError,
+           'ehata_point_to_point_batch: a profile does not fit its array',
+           flat, frq, hb, hm, env, offsets=offsets - 1)
@@ -0,0 +1,46 @@
+# Copyright 2017 SAS Project Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This file checks the eHata extension built from ehata_py.cpp (see setup.py)
+# against the published path losses of the ITS test paths in ../test.
+#
+# Run it from this directory after 'python setup.py build_ext -i'.
+
+import csv
+import os
+
+import ehata
+
+test_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test')
+
+# The published losses are given to 4 decimals.
+tolerance_db = 1e-3
+
+num_paths = 0
+failed = False
+with open(os.path.join(test_dir, 'test-inputs.csv')) as f:
+  for row in csv.DictReader(f):
+    with open(os.path.join(test_dir, 'pfls', row['pfl file name'])) as pfl_file:
+      pfl = [float(v) for v in pfl_file.read().split(',') if v.strip()]
+    pfl = pfl[:int(pfl[0]) + 3]
+    loss = ehata.point_to_point(pfl, float(row['f']), float(row['hb']),
+                                float(row['hm']), int(row['env']))[0]
+    expected = float(row['Path Loss(dB)'])
+    if abs(loss - expected) > tolerance_db:
+      print "FAIL: path %s gave %f, expected %f" % (row['ID'], loss, expected)
+      failed = True
+    num_paths += 1
+
+if not failed:
+  print "SUCCESS: %d paths gave their published losses" % num_paths
@@ -13,6 +13,8 @@
 import numpy as npy
 import math
 
+import terrain_stats
+
 class InterValues:
 
     # Data structure containing intermediate calculated values
@@ -101,7 +103,7 @@ def FindHorizons(pfl, gme, d__meter, h_1__meter, h_2__meter, d_hzn__meter):
     
     theta = [0., 0.]
 
-    np = pfl[0]
+    np = int(pfl[0])
     xi = pfl[1]
     za = pfl[2] + h_1__meter
     zb = pfl[np + 2] + h_2__meter
@@ -135,6 +137,54 @@ def FindHorizons(pfl, gme, d__meter, h_1__meter, h_2__meter, d_hzn__meter):
                 d_hzn__meter[1] = sb
     
 
+def FindHorizons_numpy(pfl, gme, d__meter, h_1__meter, h_2__meter,
+                       d_hzn__meter):
+    """
+    NumPy version of FindHorizons. As in the ITM hzns_numpy, the horizon is
+    the first point of largest elevation angle, so the angles of all the
+    points are found at once and the largest is taken.
+    """
+
+    pfl = npy.asarray(pfl, dtype=float)
+    np = int(pfl[0])
+    xi = pfl[1]
+    za = pfl[2] + h_1__meter
+    zb = pfl[np + 2] + h_2__meter
+    qc = 0.5 * gme
+    q = qc * d__meter
+    theta1 = (zb - za) / d__meter
+    theta0 = theta1 - q
+    theta1 = -theta1 - q
+    d_hzn__meter[0] = d__meter
+    d_hzn__meter[1] = d__meter
+
+    if np < 2:
+        return
+
+    # The distances of the points 1...np-1 from each end, accumulated in the
+    # same order as in FindHorizons.
+    steps = npy.empty(np)
+    steps[0] = 0.0
+    steps[1:] = xi
+    sa = npy.add.accumulate(steps)[1:]
+    steps[0] = d__meter
+    sb = npy.subtract.accumulate(steps)[1:]
+    z = pfl[3:np + 2]
+
+    theta = (z - za) / sa - qc * sa
+    above = theta > theta0
+    if above.any():
+        d_hzn__meter[0] = sa[theta.argmax()]
+
+        # The second horizon is only searched from the first point above the
+        # line of sight from the first end on.
+        first = above.argmax()
+        theta = (z[first:] - zb) / sb[first:] - qc * sb[first:]
+        i = theta.argmax()
+        if theta[i] > theta1:
+            d_hzn__meter[1] = sb[first + i]
+
+
 def FindQuantile(npts, a, ir):
     """
     Re-write of ITS FindQuantile function. In this version, npts is not needed,
@@ -144,7 +194,7 @@ def FindQuantile(npts, a, ir):
     April 2017
     """
 
-    return npy.sort(npy.asarray(a))[::-1][ir]
+    return terrain_stats.RankedHeights(a, [int(ir)])[0]
     
 
 def FineRollingHillyTerrainCorectionFactor(interValues, h_m_gnd__meter):
@@ -327,12 +377,12 @@ def LeastSquares(pfl_segment, x1, x2, z0, zn):
     zn[0] = a + b * (xn - xb)
 
 
-def MedianBasicPropLoss(f__mhz, h_b__meter, h_m__meter, d__km, enviro_code,
-                        plb_med__db, interValues):
+def _MedianLossCoefficients():
     """
-    Port of ITS routine.
+    Returns the coefficients of MedianBasicPropLoss that do not depend on its
+    inputs. They are computed once, into _MEDIAN_LOSS_COEFFICIENTS.
     """
-    
+
     perm = 4.0e-7 * math.pi
     eps = 8.854e-12
     c = 1.0 / (eps*perm)**0.5
@@ -404,6 +454,24 @@ def MedianBasicPropLoss(f__mhz, h_b__meter, h_m__meter, d__km, enviro_code,
     sigma = 0.72 / math.log10(200.0 / 24.5) - tau * math.log10(200.0 * 24.5)
     rho = 2.5 - math.log10(24.5) * (sigma + tau * math.log10(24.5))
 
+    return (c, sr_1km, htg_hb_ref, htg_hm_ref, alpha_1, beta_1, gamma_1,
+            alpha_1_suburban, beta_1_suburban, gamma_1_suburban, alpha_100,
+            beta_100, gamma_100, tau, sigma, rho)
+
+_MEDIAN_LOSS_COEFFICIENTS = _MedianLossCoefficients()
+
+
+def MedianBasicPropLoss(f__mhz, h_b__meter, h_m__meter, d__km, enviro_code,
+                        plb_med__db, interValues):
+    """
+    Port of ITS routine.
+    """
+    
+    (c, sr_1km, htg_hb_ref, htg_hm_ref, alpha_1, beta_1, gamma_1,
+     alpha_1_suburban, beta_1_suburban, gamma_1_suburban, alpha_100,
+     beta_100, gamma_100, tau, sigma, rho) = \
+        _MEDIAN_LOSS_COEFFICIENTS
+
     suburban_factor = alpha_1_suburban + beta_1_suburban * \
                       math.log10(f__mhz) + gamma_1_suburban * \
                       pow(math.log10(f__mhz), 2)
@@ -458,6 +526,62 @@ def MedianBasicPropLoss(f__mhz, h_b__meter, h_m__meter, d__km, enviro_code,
         plb_med__db[0] = plb_urban - rural_factor
 
 
+def MedianBasicPropLosses(f__mhz, h_b__meter, h_m__meter, d__km, enviro_code):
+    """
+    Array version of MedianBasicPropLoss. The frequencies (MHz), base station
+    and mobile heights (m), distances (km) and environment codes may be
+    numbers or arrays that broadcast together, e.g. to find the losses over
+    all the distances and heights around a base station in one call. Returns
+    the median basic losses (dB).
+    """
+
+    (c, sr_1km, htg_hb_ref, htg_hm_ref, alpha_1, beta_1, gamma_1,
+     alpha_1_suburban, beta_1_suburban, gamma_1_suburban, alpha_100,
+     beta_100, gamma_100, tau, sigma, rho) = \
+        _MEDIAN_LOSS_COEFFICIENTS
+
+    f__mhz = npy.asarray(f__mhz, dtype=float)
+    h_b__meter = npy.asarray(h_b__meter, dtype=float)
+    h_m__meter = npy.asarray(h_m__meter, dtype=float)
+    d__km = npy.asarray(d__km, dtype=float)
+    enviro_code = npy.asarray(enviro_code)
+
+    log_f = npy.log10(f__mhz)
+    log_hb = npy.log10(h_b__meter)
+    log_d = npy.log10(d__km)
+
+    suburban_factor = alpha_1_suburban + beta_1_suburban * log_f + \
+                      gamma_1_suburban * log_f**2
+    rural_factor = 40.94 - 18.33 * log_f + 4.78 * log_f**2
+
+    wnmh = 2.0e+6*math.pi*f__mhz / c
+    term1 = log_f * (beta_1 + gamma_1 * log_f)
+    att_1km = alpha_1 + term1 - htg_hb_ref - htg_hm_ref - \
+              20.0*npy.log10(2.0*wnmh*sr_1km)
+    att_100km = alpha_100 + log_f*(beta_100 + gamma_100*log_f)
+    term2 = -13.82*log_hb
+
+    n_h = 2.0*(rho + log_hb*(sigma + tau*log_hb) - 1.0)
+    n_l = 0.1 * (44.9 - 6.55*log_hb) - 2.0
+    d_bp__km = 10.0**((2.0 * n_h + 0.1 * (att_1km - att_100km)) / (n_h - n_l))
+
+    terma = -3.2 * npy.log10(11.75 * h_m__meter)**2 + 4.97
+    sr_d = (1.0e+6 * d__km**2 + (h_b__meter - h_m__meter)**2)**0.5
+
+    plb_urban = npy.where(
+        d__km <= d_bp__km,
+        alpha_1 + term1 + term2 + terma + (44.9 - 6.55*log_hb)*log_d,
+        att_100km + htg_hb_ref + term2 + htg_hm_ref + terma - 20*n_h +
+        10.0*n_h*log_d + 20.0*npy.log10(2.0*wnmh*sr_d))
+
+    plb_med__db = npy.where((enviro_code == 23) | (enviro_code == 24),
+                            plb_urban,
+                            npy.where(enviro_code == 22,
+                                      plb_urban - suburban_factor,
+                                      plb_urban - rural_factor))
+    return plb_med__db[()]
+
+
 def MedianRollingHillyTerrainCorrectionFactor(deltah__meter):
     """
     Port of an ITS function.
@@ -571,16 +695,25 @@ def MixedPathCorrectionFactor(d__km, interValues):
         return qmp_corr_30 + dist_fact*(qmp_corr_60 - qmp_corr_30)
 
  
-def PreprocessTerrainPath(pfl, h_b__meter, h_m__meter, interValues):
+def PreprocessTerrainPath(pfl, h_b__meter, h_m__meter, interValues,
+                          preprocess_backend='numpy'):
     """
-    Port of a wrapper-type ITS routine. Calls routines below.
+    Port of a wrapper-type ITS routine. Calls routines below, or their
+    versions in preprocess_backend ('python' or 'numpy').
     """
     
-    FindAverageGroundHeight(pfl, interValues)
-    ComputeTerrainStatistics(pfl, interValues)
-    MobileTerrainSlope(pfl, interValues)
-    AnalyzeSeaPath(pfl, interValues)
-    SingleHorizonTest(pfl, h_m__meter, h_b__meter, interValues);
+    find_avg_ground_height, mobile_terrain_slope, analyze_sea_path = \
+        _PreprocessBackend(preprocess_backend)[:3]
+    terrain = pfl
+    if preprocess_backend == 'numpy':
+        # The NumPy routines share one conversion of the profile to an array.
+        terrain = npy.asarray(pfl, dtype=float)
+    find_avg_ground_height(terrain, interValues)
+    ComputeTerrainStatistics(terrain, interValues)
+    mobile_terrain_slope(terrain, interValues)
+    analyze_sea_path(terrain, interValues)
+    SingleHorizonTest(terrain, h_m__meter, h_b__meter, interValues,
+                      preprocess_backend);
 
 
 def FindAverageGroundHeight(pfl, interValues):
@@ -673,21 +806,13 @@ def ComputeTerrainStatistics(pfl, interValues):
         i_start = 2
         i_end = 2 + int(10.0 / xi)
 
-    #// create a copy of the 10 km path at the mobile, or the whole path (if less than 10 km)
-    #float pfl_segment[400];
-    pfl_segment = []
-    for i in range(i_start, i_end+1): #(int i = i_start; i <= i_end; i++)
-        pfl_segment.append(pfl[i]) ####
-
-    npts = i_end - i_start + 1
-    i10 = 0.1 * npts - 1
-    i50 = 0.5 * npts - 1
-    i90 = 0.9 * npts - 1
-    interValues.pfl10__meter = FindQuantile(npts, pfl_segment, i10)
-    interValues.pfl50__meter = FindQuantile(npts, pfl_segment, i50)
-    interValues.pfl90__meter = FindQuantile(npts, pfl_segment, i90)
-    interValues.deltah__meter = interValues.pfl10__meter - \
-                                interValues.pfl90__meter
+    #// the 10 km path at the mobile, or the whole path (if less than 10 km);
+    #// its 10%, 50% and 90% quantiles are found with one partition
+    quantiles = terrain_stats.FindTerrainQuantiles(pfl[i_start:i_end+1])
+    interValues.pfl10__meter = quantiles.h10
+    interValues.pfl50__meter = quantiles.h50
+    interValues.pfl90__meter = quantiles.h90
+    interValues.deltah__meter = quantiles.deltah
 
     #// "If the path is less than 10 km in distance, then the asymptotic value
     #//  for the terrain irrgularity is computed" [TR-15-517]
@@ -802,13 +927,139 @@ def AnalyzeSeaPath(pfl, interValues):
     else:
         interValues.iend_ov_sea = -1
 
+def FindAverageGroundHeight_numpy(pfl, interValues):
+    """
+    NumPy version of FindAverageGroundHeight, averaging the profile slices
+    with numpy.mean.
+    """
+
+    pfl = npy.asarray(pfl, dtype=float)
+    np = int(pfl[0])
+    xi = pfl[1] * 0.001      #// step size of the profile points, in km
+    d__km = np * xi          #// path distance, in km
+
+    if (d__km < 3.0):
+        interValues.h_avg__meter[0] = pfl[2]
+        interValues.h_avg__meter[1] = pfl[np + 2]
+    elif (3.0 <= d__km and d__km <= 15.0):
+        avg = npy.mean(pfl[2 + int(3.0 / xi):np + 3])
+        interValues.h_avg__meter[0] = pfl[2] - (pfl[2] - avg) * \
+                                      (d__km - 3.0) / 12.0
+        interValues.h_avg__meter[1] = npy.mean(pfl[2:np + 3 - int(3.0 / xi)])
+    else: #// d__km > 15.0
+        interValues.h_avg__meter[0] = \
+            npy.mean(pfl[2 + int(3.0 / xi):3 + int(15.0 / xi)])
+        interValues.h_avg__meter[1] = \
+            npy.mean(pfl[np + 2 - int(15.0 / xi):np + 3 - int(3.0 / xi)])
+
+
+def MobileTerrainSlope_numpy(pfl, interValues):
+    """
+    NumPy version of MobileTerrainSlope. The least squares fits over the
+    windows of 5 to 10 km at the mobile all start at the mobile, so their
+    sums are read from one pass of cumulative sums of the profile.
+    """
+
+    pfl = npy.asarray(pfl, dtype=float)
+    np = int(pfl[0])        #// number of points
+    xi = pfl[1]              #// step size of the profile points, in meter
+    d__meter = np * xi
+
+    if int(5000.0 / xi) < 1:
+        # LeastSquares falls back to a wider window for a window of less
+        # than one step.
+        MobileTerrainSlope(pfl, interValues)
+        return
+
+    interValues.slope_max = -1.0e+31
+    interValues.slope_min = 1.0e+31
+    slope_five = 0.0
+
+    # LeastSquares fits the points 0..n of a window of n steps with the end
+    # points weighted by one half, about the center of the window. The slope
+    # of the fit does not change if a constant is subtracted from the
+    # elevations, so they are taken relative to the mobile to keep the sums
+    # small.
+    z = pfl[2:] - pfl[2]
+    x = npy.arange(len(z))
+    sum_z = npy.cumsum(z)
+    sum_xz = npy.cumsum(x * z)
+
+    x2 = 5000.0
+    while (d__meter >= x2 and x2 <= 10000.0):
+        n = int(x2 / xi)
+        b = (sum_xz[n] - 0.5 * n * z[n]) - 0.5 * n * (sum_z[n] - 0.5 * z[n])
+        b = b * 12. / ((n * n + 2.) * n)
+
+        #// flip the sign to match the Okumura et al.convention
+        slope = -1000.0 * b * n / x2
+        interValues.slope_min = min(interValues.slope_min, slope)
+        interValues.slope_max = max(interValues.slope_max, slope)
+        if (x2 == 5000.0):
+            slope_five = slope
+        x2 = x2 + 1000.0
+
+    if (d__meter <= 5000.0 or
+        interValues.slope_max * interValues.slope_min < 0.0):
+        interValues.theta_m__mrad = slope_five
+    else:
+        if (interValues.slope_max >= 0.0):
+            interValues.theta_m__mrad = interValues.slope_max
+        else:
+            interValues.theta_m__mrad = interValues.slope_min
+
+
+def AnalyzeSeaPath_numpy(pfl, interValues):
+    """
+    NumPy version of AnalyzeSeaPath, counting the sea points with a mask.
+    """
+
+    pfl = npy.asarray(pfl, dtype=float)
+    np = int(pfl[0])
+    index_midpoint = int(np / 2)
+
+    sea = pfl[2:np + 3] == 0.0
+    sea_cnt = npy.count_nonzero(sea)
+    low_cnt = npy.count_nonzero(sea[:index_midpoint])
+    high_cnt = sea_cnt - low_cnt
+
+    interValues.beta = float(sea_cnt) / float(np + 1)
+
+    if (low_cnt > high_cnt):
+        interValues.iend_ov_sea = 1
+    elif (high_cnt > low_cnt):
+        interValues.iend_ov_sea = 0
+    else:
+        interValues.iend_ov_sea = -1
+
+
+# Terrain preprocessing backends for PreprocessTerrainPath: the functions used
+# for FindAverageGroundHeight, MobileTerrainSlope, AnalyzeSeaPath and, in
+# SingleHorizonTest, FindHorizons. The 'python' backend is the port of the ITS
+# loops; the 'numpy' backend works on whole profiles at once and matches it to
+# within rounding.
+_PREPROCESS_BACKENDS = {
+    'python': (FindAverageGroundHeight, MobileTerrainSlope, AnalyzeSeaPath,
+               FindHorizons),
+    'numpy': (FindAverageGroundHeight_numpy, MobileTerrainSlope_numpy,
+              AnalyzeSeaPath_numpy, FindHorizons_numpy),
+}
+
+
+def _PreprocessBackend(name):
+    if name not in _PREPROCESS_BACKENDS:
+        raise ValueError('Unknown preprocessing backend: %s' % name)
+    return _PREPROCESS_BACKENDS[name]
+
+
 def AverageTerrainHeight(pfl):
     """
     Rewrite of ITS routine.
     """
     return npy.mean(pfl[2:])
 
-def SingleHorizonTest(pfl, h_m__meter, h_b__meter, interValues):
+def SingleHorizonTest(pfl, h_m__meter, h_b__meter, interValues,
+                      preprocess_backend='numpy'):
     """
     Port of ITS routine.
     
@@ -820,6 +1071,7 @@ def SingleHorizonTest(pfl, h_m__meter, h_b__meter, interValues):
                  - pfl[i] = elevation above mean sea level, in meters
         h_m__meter : height of the mobile, in meters
         h_b__meter : height of the base station, in meters
+        preprocess_backend : 'python' or 'numpy', for FindHorizons
     Outputs:
         interValues->d_hzn__meter : horizon distances, in meters
                  - d_hzn__meter[0] = mobile horizon distance, in meters
@@ -831,6 +1083,7 @@ def SingleHorizonTest(pfl, h_m__meter, h_b__meter, interValues):
     xi = pfl[1]          #// step size of the profile points, in meter
     d__meter = np * xi
 
+    find_horizons = _PreprocessBackend(preprocess_backend)[3]
     h_gnd__meter = AverageTerrainHeight(pfl)
 
     en0 = 301.0
@@ -842,8 +1095,8 @@ def SingleHorizonTest(pfl, h_m__meter, h_b__meter, interValues):
     gma = 157e-9
     gme = gma * (1 - 0.04665 * math.exp(ens / 179.3))
 
-    FindHorizons(pfl, gme, d__meter, h_m__meter, h_b__meter,
-                 interValues.d_hzn__meter)
+    find_horizons(pfl, gme, d__meter, h_m__meter, h_b__meter,
+                  interValues.d_hzn__meter)
 
     a = interValues.d_hzn__meter[0]
     b = interValues.d_hzn__meter[1]
@@ -868,7 +1121,8 @@ def SingleHorizonTest(pfl, h_m__meter, h_b__meter, interValues):
         if (interValues.hedge_tilda < 0.0):
             interValues.hedge_tilda = 0.0
 
-def ExtendedHata(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code, plb):
+def ExtendedHata(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code, plb,
+                 preprocess_backend='numpy'):
     """
     Port of ITS routine.
 
@@ -882,16 +1136,17 @@ def ExtendedHata(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code, plb):
         h_b__meter : height of the base station, in meters
         h_m__meter : height of the mobile, in meters
         enviro_code : environmental code
+        preprocess_backend : terrain preprocessing backend, 'python' or 'numpy'
     Outputs:
         plb : path loss, in dB
     """
     
     interValues = InterValues() 
     ExtendedHata_DBG(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code,
-                     plb, interValues);
+                     plb, interValues, preprocess_backend);
 
 def ExtendedHata_DBG(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code,
-                     plb, interValues):
+                     plb, interValues, preprocess_backend='numpy'):
     """
     Port of ITS routine
     
@@ -905,13 +1160,15 @@ def ExtendedHata_DBG(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code,
         h_b__meter : height of the base station, in meters
         h_m__meter : height of the mobile, in meters
         enviro_code : environmental code
+        preprocess_backend : terrain preprocessing backend, 'python' or 'numpy'
     Outputs:
         plb : path loss, in dB
         interValues : data structure containing intermediate calculated values
     """
     
     np = int(pfl[0])
-    PreprocessTerrainPath(pfl, h_b__meter, h_m__meter, interValues);    
+    PreprocessTerrainPath(pfl, h_b__meter, h_m__meter, interValues,
+                          preprocess_backend);    
     h_m_gnd__meter = pfl[2];
     interValues.h_m_eff__meter = h_m__meter + pfl[2] - \
                                  interValues.h_avg__meter[0]
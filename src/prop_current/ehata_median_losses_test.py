@@ -0,0 +1,79 @@
+import unittest
+
+import numpy
+
+import ehata_its_wf
+
+# Frequencies (MHz) across the eHata range and the bands around 1500, 3000
+# and 3550-3700 MHz, base station and mobile heights (m), and environment
+# codes: rural (another code), suburban (22) and urban (23, 24).
+_FREQUENCIES = (150., 400., 1499., 1500., 1501., 2000., 2999., 3000., 3001.,
+                3550., 3625., 3700., 4000.)
+_BASE_HEIGHTS = (20., 30., 50., 100., 200.)
+_MOBILE_HEIGHTS = (1.5, 3., 10.)
+_ENVIRO_CODES = (21, 22, 23, 24)
+_DISTANCES = (1., 2., 5., 10., 20., 40., 60., 80., 100.)
+
+
+def _MedianBasicPropLoss(f__mhz, h_b__meter, h_m__meter, d__km, enviro_code):
+    """
+    Returns the loss and break-point distance of the scalar
+    MedianBasicPropLoss.
+    """
+
+    plb_med__db = [0.]
+    interValues = ehata_its_wf.InterValues()
+    ehata_its_wf.MedianBasicPropLoss(f__mhz, h_b__meter, h_m__meter, d__km,
+                                     enviro_code, plb_med__db, interValues)
+    return plb_med__db[0], interValues.d_bp__km
+
+
+class TestMedianBasicPropLosses(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        self.assertAlmostEqual(a, b, delta=1e-9 * max(1.0, abs(b)))
+
+    def test_grid(self):
+        # All the inputs in one call, broadcast over a 5 dimensional grid.
+        f, h_b, h_m, d, code = numpy.ix_(_FREQUENCIES, _BASE_HEIGHTS,
+                                         _MOBILE_HEIGHTS, _DISTANCES,
+                                         _ENVIRO_CODES)
+        losses = ehata_its_wf.MedianBasicPropLosses(f, h_b, h_m, d, code)
+        self.assertEquals(losses.shape, (len(_FREQUENCIES), len(_BASE_HEIGHTS),
+                                         len(_MOBILE_HEIGHTS), len(_DISTANCES),
+                                         len(_ENVIRO_CODES)))
+        for index in numpy.ndindex(losses.shape):
+            args = (_FREQUENCIES[index[0]], _BASE_HEIGHTS[index[1]],
+                    _MOBILE_HEIGHTS[index[2]], _DISTANCES[index[3]],
+                    _ENVIRO_CODES[index[4]])
+            self.assertClose(losses[index], _MedianBasicPropLoss(*args)[0])
+
+    def test_break_point(self):
+        # Distances just below and above the break point, where the loss
+        # switches to the long distance exponent.
+        count = 0
+        for f__mhz in _FREQUENCIES:
+            for h_b__meter in _BASE_HEIGHTS:
+                d_bp__km = _MedianBasicPropLoss(f__mhz, h_b__meter, 1.5, 1.,
+                                                22)[1]
+                distances = d_bp__km * numpy.array([0.5, 1. - 1e-6, 1. + 1e-6,
+                                                    2.])
+                losses = ehata_its_wf.MedianBasicPropLosses(
+                    f__mhz, h_b__meter, 1.5, distances, 22)
+                for d__km, loss in zip(distances, losses):
+                    self.assertClose(
+                        loss, _MedianBasicPropLoss(f__mhz, h_b__meter, 1.5,
+                                                   d__km, 22)[0])
+                if d_bp__km < 100.:
+                    count += 1
+        # The break point is within the eHata distances for some inputs.
+        self.assertTrue(count > 0)
+
+    def test_scalars(self):
+        loss = ehata_its_wf.MedianBasicPropLosses(3625., 50., 1.5, 35., 23)
+        self.assertTrue(isinstance(loss, float))
+        self.assertClose(loss, _MedianBasicPropLoss(3625., 50., 1.5, 35., 23)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
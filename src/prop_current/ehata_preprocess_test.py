@@ -0,0 +1,114 @@
+import csv
+import os
+import unittest
+
+import ehata_its_wf
+
+# The eHata test profiles, in the ITM profile format.
+_PROFILES_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                              '..', 'prop', 'ehata', 'test', 'elevations.csv')
+
+# The interValues fields set by the preprocessing routines.
+_FIELDS = ('h_avg__meter', 'slope_max', 'slope_min', 'theta_m__mrad', 'beta',
+           'iend_ov_sea', 'd_hzn__meter', 'single_horizon', 'hedge_tilda',
+           'pfl10__meter', 'pfl50__meter', 'pfl90__meter', 'deltah__meter')
+
+
+def _Profiles():
+    """
+    Returns the eHata test profiles, and each of them with runs of sea (zero
+    elevation) points from the mobile end and from the base station end.
+    """
+
+    profiles = []
+    with open(_PROFILES_FILE) as profiles_file:
+        for row in csv.reader(profiles_file):
+            profile = [float(r) for r in row]
+            profiles.append(profile[:int(profile[0]) + 3])
+
+    with_sea = []
+    for pfl in profiles:
+        n = len(pfl) - 2
+        for start, stop in ((0, n // 3), (n - n // 4, n), (0, n // 5),
+                            (n // 2, n)):
+            sea = list(pfl)
+            sea[2 + start:2 + stop] = [0.] * (stop - start)
+            with_sea.append(sea)
+    return profiles + with_sea
+
+
+class TestPreprocessBackends(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        self.assertAlmostEqual(a, b, delta=1e-9 * max(1.0, abs(b)))
+
+    def assertSameInterValues(self, inter, expected, fields):
+        for field in fields:
+            value = getattr(inter, field)
+            if isinstance(value, list):
+                for v, e in zip(value, getattr(expected, field)):
+                    self.assertClose(v, e)
+            elif isinstance(value, bool):
+                self.assertEquals(value, getattr(expected, field))
+            else:
+                self.assertClose(value, getattr(expected, field))
+
+    def _Compare(self, routine, routine_numpy, fields):
+        for pfl in _Profiles():
+            expected = ehata_its_wf.InterValues()
+            routine(pfl, expected)
+            inter = ehata_its_wf.InterValues()
+            routine_numpy(pfl, inter)
+            self.assertSameInterValues(inter, expected, fields)
+
+    def test_find_average_ground_height(self):
+        self._Compare(ehata_its_wf.FindAverageGroundHeight,
+                      ehata_its_wf.FindAverageGroundHeight_numpy,
+                      ('h_avg__meter',))
+
+    def test_mobile_terrain_slope(self):
+        self._Compare(ehata_its_wf.MobileTerrainSlope,
+                      ehata_its_wf.MobileTerrainSlope_numpy,
+                      ('slope_max', 'slope_min', 'theta_m__mrad'))
+
+    def test_analyze_sea_path(self):
+        self._Compare(ehata_its_wf.AnalyzeSeaPath,
+                      ehata_its_wf.AnalyzeSeaPath_numpy,
+                      ('beta', 'iend_ov_sea'))
+
+    def test_find_horizons(self):
+        for pfl in _Profiles():
+            d__meter = pfl[0] * pfl[1]
+            for h_1, h_2 in ((1.5, 20.), (10., 200.), (3., 1000.)):
+                expected = [0., 0.]
+                ehata_its_wf.FindHorizons(pfl, 157e-9, d__meter, h_1, h_2,
+                                          expected)
+                d_hzn = [0., 0.]
+                ehata_its_wf.FindHorizons_numpy(pfl, 157e-9, d__meter, h_1,
+                                                h_2, d_hzn)
+                self.assertClose(d_hzn[0], expected[0])
+                self.assertClose(d_hzn[1], expected[1])
+
+    def test_extended_hata(self):
+        for pfl in _Profiles():
+            for h_b, h_m in ((50., 1.5), (200., 3.)):
+                expected_plb = [0.]
+                expected = ehata_its_wf.InterValues()
+                ehata_its_wf.ExtendedHata_DBG(pfl, 3625., h_b, h_m, 22,
+                                              expected_plb, expected,
+                                              'python')
+                plb = [0.]
+                inter = ehata_its_wf.InterValues()
+                ehata_its_wf.ExtendedHata_DBG(pfl, 3625., h_b, h_m, 22,
+                                              plb, inter, 'numpy')
+                self.assertSameInterValues(inter, expected, _FIELDS)
+                self.assertClose(plb[0], expected_plb[0])
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, ehata_its_wf.ExtendedHata,
+                          _Profiles()[0], 3625., 50., 1.5, 22, [0.],
+                          'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
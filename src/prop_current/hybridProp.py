@@ -7,7 +7,8 @@ import sys
 from terrain import *
 from itm_wf import *
 from ehata_its_wf import *
-from nlcd_indexer import *
+import geo_context
+import propagation
 import os
 import numpy as np
 import geo
@@ -16,31 +17,25 @@ import terrain
 global interValues
 interValues = InterValues()
 
-def get_NLCD_region(lat, lon):
+def get_NLCD_region(lat, lon, context=None):
     """
     Returns the NLCD region type for the specified location. This implementation
     simply returns the region at lat/lon.
 
+    The NLCD data is taken from the given GeoContext, or from the process-wide
+    context if none is given, so the NLCD indexer is initialized only once.
+
     ***TODO: WinnForum implementation involves calculating the region based on
     the preponderance of region types in the service area.
 
-    ***TODO: This code takes a long time to execute because it initializes some
-    stuff. Probably need to integrate the NlcdIndexer class into this code and
-    do the initialization once upon startup otherwise it will take a very long
-    time to calculate many prop losses.
-
     Andrew Clegg
     February 2017
     """
 
-    nlcdDir = "E:\\Google Drive\\BigFiles\\Google\\Databases\\NLCD"
-
-#   The following line is needed because for some reason Windows GDAL environment
-#   variables won't stick:
-    os.putenv('GDAL_DATA', 'C:\Program Files (x86)\GDAL\gdal-data')
+    if context is None:
+        context = geo_context.GetDefaultContext()
 
-    indx = NlcdIndexer(nlcdDir)
-    code = indx.NlcdCode(lat, lon)
+    code = context.Nlcd().NlcdCode(lat, lon)
 
     if code == 22:
         return 'SUBURBAN'
@@ -52,7 +47,7 @@ def get_NLCD_region(lat, lon):
     
 def hybrid_prop(lat_cbsd, lon_cbsd, h_cbsd,
                 lat2, lon2, h2=1.5, f=3625.,
-                region='', mode='FSS', rel=0.5, conf=0.5):
+                region='', mode='FSS', rel=0.5, conf=0.5, context=None):
     """
     Implements the hybrid ITM/eHata prop model as specified by WinnForum
     (https://goo.gl/IDkEAJ), particularly R2-SGN-03, R2-SGN-04 through
@@ -68,6 +63,9 @@ def hybrid_prop(lat_cbsd, lon_cbsd, h_cbsd,
     The reliability parameter (rel) can be changed if the code is being used to
     manually implement the statistical aggregate interference method described
     in R2-SGN-12.
+
+    The geo data is taken from the given GeoContext, or from the process-wide
+    context if none is given.
     
     Andrew Clegg
     February 2017
@@ -75,6 +73,9 @@ def hybrid_prop(lat_cbsd, lon_cbsd, h_cbsd,
 
     global interValues
 
+    if context is None:
+        context = geo_context.GetDefaultContext()
+
     h_cbsd_eff = -999
     
     region = region.strip().upper()
@@ -82,7 +83,8 @@ def hybrid_prop(lat_cbsd, lon_cbsd, h_cbsd,
     
 #   Calculate the predicted ITM loss
     dbloss_itm, errnum, strmode_itm, dist, bearing, d, elev = \
-           itm_wf(lat_cbsd, lon_cbsd, h_cbsd, lat2, lon2, h2, f, rel, conf)     
+           itm_wf(lat_cbsd, lon_cbsd, h_cbsd, lat2, lon2, h2, f, rel, conf,
+                  context)     
 
 #   Per R2-SGN-03, if mode = FSS or ESC, only ITM is used
     if mode == 'FSS' or mode == 'ESC': 
@@ -99,7 +101,7 @@ def hybrid_prop(lat_cbsd, lon_cbsd, h_cbsd,
 #   TODO: Implement code to determine preponderance of NLCD value within
 #   coverage area.
     if region not in ['URBAN', 'SUBURBAN', 'RURAL']:
-        region = get_NLCD_region(lat_cbsd, lon_cbsd)
+        region = get_NLCD_region(lat_cbsd, lon_cbsd, context)
 
 #   If rural, use ITM
     if region == 'RURAL':
@@ -129,14 +131,14 @@ def hybrid_prop(lat_cbsd, lon_cbsd, h_cbsd,
         return dbloss, dbloss_itm, 0, '', 'Distance between 100 m - 1 km. Interpolating.', h_cbsd_eff
 
     elif dist >= 1. and dist <= 80.:
-        plb = [0.]
-        ExtendedHata(elev, f, max(h_cbsd,20.), h2, enviro_code, plb)
-        ehata_loss = plb[0] 
+        ehata_loss = propagation.ExtendedHata(elev, f, max(h_cbsd,20.), h2,
+                                              enviro_code)
         if abs(rel-0.5) < 0.001 and abs(conf-0.5) < 0.001:
             dbloss_itm_med = dbloss_itm
         else:
             dbloss_itm_med, errnum_med, strmode_itm_med, dist_med, bearing_med, d_med, elev_med = \
-              itm_wf(lat_cbsd, lon_cbsd, h_cbsd, lat2, lon2, h2, f, 0.5, 0.5)
+              itm_wf(lat_cbsd, lon_cbsd, h_cbsd, lat2, lon2, h2, f, 0.5, 0.5,
+                     context)
         if dbloss_itm_med >= ehata_loss:
             return dbloss_itm, dbloss_itm, errnum, strmode_itm, 'TR 15-517 mode. Using ITM because ITM_MED is >= eHata', h_cbsd_eff
         else:
@@ -149,14 +151,17 @@ def hybrid_prop(lat_cbsd, lon_cbsd, h_cbsd,
         # Find the 80 km points
         lat80, lon80, alpha2 = geo.to_dist_bear_vincenty(lat_cbsd, lon_cbsd,
                                                  80., bearing)
-        elev80 = terrain.terrainProfile_vincenty(lat_cbsd, lon_cbsd, lat80, lon80)
+        elev80 = context.profile_cache.Profile(
+            lat_cbsd, lon_cbsd, lat80, lon80, 'terrain_vincenty_default',
+            lambda: terrain.terrainProfile_vincenty(lat_cbsd, lon_cbsd,
+                                                    lat80, lon80))
         
         # Calculate eHata loss and the ITM median loss at 80 km
-        plb = [0.]
-        ExtendedHata(elev80, f, max(h_cbsd,20.), h2, enviro_code, plb)        
-        ehata80 = plb[0]
+        ehata80 = propagation.ExtendedHata(elev80, f, max(h_cbsd,20.), h2,
+                                           enviro_code)
         dbloss_itm_med80, errnum_med, strmode_itm_med, dist_med, bearing_med, d_med, elev_med = \
-              itm_wf(lat_cbsd, lon_cbsd, h_cbsd, lat80, lon80, h2, f, 0.5, 0.5)
+              itm_wf(lat_cbsd, lon_cbsd, h_cbsd, lat80, lon80, h2, f, 0.5, 0.5,
+                     context)
 
         J = max(ehata80 - dbloss_itm_med80, 0)
         dbloss = dbloss_itm + J
@@ -11,30 +11,43 @@
 
 import math
 
-# Static function variables in C++ implemented via global variables in Python
-global wd1, xd1, afo, qk, aht, xht                        # Function adiff
-global ad, rr, etq, h0s                                   # Function ascat
-global wls                                                # Function alos
-global wlos, wscat, dmin, xae                             # Function lrprop
-global kdv                                                # Function avar
-global dexa, de, vmd, vs0, sgl, sgtm, sgtp, sgtd, tgtd    # Function avar
-global gm, gp, cv1, cv2, yv1, yv2, yv3, csm1, csm2, ysm1  # Function avar
-global ysm2, ysm3, csp1, csp2, ysp1, ysp2, ysp3, csd1, zd # Function avar
-global cfm1, cfm2, cfm3, cfp1, cfp2, cfp3                 # Function avar
-global ws, w1                                             # Function avar
-
-# Initialize the static function variables
-wd1 = xd1 = afo = qk = aht = xht = 0.
-ad = rr = etq = h0s = 0.
-wls = 0.
-wlos = wscat = False
-dmin = xae = 0.
-kdv = 0
-dexa = de = vmd = vs0 = sgl = sgtm = sgtp = sgtd = tgtd = 0.0
-gm = gp = cv1 = cv2 = yv1 = yv2 = yv3 = csm1 = csm2 = ysm1 = 0.0
-ysm2 = ysm3 = csp1 = csp2 = ysp1 = ysp2 = ysp3 = csd1 = zd = 0.0
-cfm1 = cfm2 = cfm3 = cfp1 = cfp2 = cfp3 = 0.0
-ws = w1 = False
+import numpy
+
+import terrain_stats
+
+class ItmState:
+
+    # Static function variables of the C++ code. The functions adiff, ascat,
+    # alos, lrprop and avar set these up in a first call and use them in later
+    # calls for the same path. Each model run creates its own ItmState and
+    # passes it along with PropType, so that runs in different threads do not
+    # share them. The state also names the terrain analysis backend used by
+    # qlrpfl, one of the keys of _TERRAIN_BACKENDS.
+
+    def __init__(self, terrain_backend='numpy'):
+        if terrain_backend not in _TERRAIN_BACKENDS:
+            raise ValueError('Unknown terrain backend: %s' % terrain_backend)
+        self.terrain_backend = terrain_backend
+        # Function adiff
+        self.wd1 = self.xd1 = self.afo = self.qk = self.aht = self.xht = 0.
+        # Function ascat
+        self.ad = self.rr = self.etq = self.h0s = 0.
+        # Function alos
+        self.wls = 0.
+        # Function lrprop
+        self.wlos = self.wscat = False
+        self.dmin = self.xae = 0.
+        # Function avar
+        self.kdv = 0
+        self.dexa = self.de = self.vmd = self.vs0 = self.sgl = 0.0
+        self.sgtm = self.sgtp = self.sgtd = self.tgtd = 0.0
+        self.gm = self.gp = self.cv1 = self.cv2 = self.yv1 = self.yv2 = 0.0
+        self.yv3 = self.csm1 = self.csm2 = self.ysm1 = self.ysm2 = 0.0
+        self.ysm3 = self.csp1 = self.csp2 = self.ysp1 = self.ysp2 = 0.0
+        self.ysp3 = self.csd1 = self.zd = 0.0
+        self.cfm1 = self.cfm2 = self.cfm3 = self.cfp1 = self.cfp2 = 0.0
+        self.cfp3 = 0.0
+        self.ws = self.w1 = False
 
 
 class PropType:
@@ -194,7 +207,7 @@ def ahd(td):
     return a[i] + b[i]*td + c[i]*math.log(td)
 
 
-def adiff(d, prop, propa):
+def adiff(d, prop, propa, state):
     """
     The function adiff finds the "diffraction attenuation" at the distance d. It
     uses a convex combination of smooth earth diffraction and double knife-
@@ -203,37 +216,34 @@ def adiff(d, prop, propa):
     (Section 10)
     """
 
-#   To implement C++ static function variables.
-#   Function must first be called with d = 0 to initialize these variables.
-    global wd1, xd1, afo, qk, aht, xht
     
     prop_zgnd = prop.zgndreal + prop.zgndimag * 1j
 
     if d == 0:
 
         q  = prop.hg[0]*prop.hg[1]
-        qk = prop.he[0]*prop.he[1] - q
+        state.qk = prop.he[0]*prop.he[1] - q
 	
         if prop.mdp < 0.0:
             q  += 10.0
 
-        wd1 = (1.0 + qk/q)**0.5
-        xd1 = propa.dla + propa.tha/prop.gme
+        state.wd1 = (1.0 + state.qk/q)**0.5
+        state.xd1 = propa.dla + propa.tha/prop.gme
         q   = (1.0 - 0.8*math.exp(-propa.dlsa/50e3))*prop.dh
         q  *= 0.78*math.exp(- (q/16.)**0.25)
-        afo = min(15.0, \
+        state.afo = min(15.0, \
                   2.171*math.log(1.0 + 4.77e-4*prop.hg[0]*prop.hg[1]*prop.wn*q))
-        qk  = 1.0/abs(prop_zgnd)
-        aht = 20.0
-        xht = 0.0
+        state.qk  = 1.0/abs(prop_zgnd)
+        state.aht = 20.0
+        state.xht = 0.0
 
         for j in range(2):
             a = (0.5*prop.dl[j]**2.0)/prop.he[j]
             wa = (a*prop.wn)**(1./3.)
-            pk = qk/wa
+            pk = state.qk/wa
             q = (1.607 - pk)*151.0*wa*prop.dl[j]/a
-            xht += q
-            aht += fht(q,pk)
+            state.xht += q
+            state.aht += fht(q,pk)
         adiffv = 0.0
 
     else:
@@ -245,18 +255,18 @@ def adiff(d, prop, propa):
                  + aknfe(q*prop.dl[1]/(ds+prop.dl[1]))
         a = ds/th
         wa = (a*prop.wn)**(1./3.)
-        pk = qk/wa
-        q = (1.607 - pk)*151.0*wa*th+xht
-        ar = 0.05751*q - 4.343*math.log(q) - aht
-        q = (wd1 + xd1/d) \
+        pk = state.qk/wa
+        q = (1.607 - pk)*151.0*wa*th+state.xht
+        ar = 0.05751*q - 4.343*math.log(q) - state.aht
+        q = (state.wd1 + state.xd1/d) \
             *min(((1.0 - 0.8*math.exp(-d/50e3))*prop.dh*prop.wn),6283.2)
         wd = 25.1/(25.1 + q**0.5)
-        adiffv = ar*wd+(1.0 - wd)*adiffv + afo
+        adiffv = ar*wd+(1.0 - wd)*adiffv + state.afo
     
     return adiffv
 
 
-def ascat(d, prop, propa):
+def ascat(d, prop, propa, state):
     """
     The function ascat finds the "scatter attenuation" at the distance d. It uses
     an approximation to the methods of NBS Tech Note 101 with checks for inadmissable
@@ -266,29 +276,26 @@ def ascat(d, prop, propa):
     (Section 22)
     """
     
-#   To implement C++ static function variables.
-#   Function must first be called with d = 0 to initialize.
-    global ad, rr, etq, h0s
 
     prop_zgnd = prop.zgndreal + prop.zgndimag*1j
 
     if d == 0.0:
         
-        ad = prop.dl[0] - prop.dl[1]
-        rr = prop.he[1]/prop.he[0]
+        state.ad = prop.dl[0] - prop.dl[1]
+        state.rr = prop.he[1]/prop.he[0]
 
-        if ad < 0.0:
-            ad = -ad
-            rr = 1.0/rr
+        if state.ad < 0.0:
+            state.ad = -state.ad
+            state.rr = 1.0/state.rr
 
-        etq = (5.67e-6*prop.ens - 2.32e-3)*prop.ens + 0.031
-        h0s = -15.0
+        state.etq = (5.67e-6*prop.ens - 2.32e-3)*prop.ens + 0.031
+        state.h0s = -15.0
         ascatv = 0.0
 
     else:
 
-        if h0s > 15.0:
-            h0 = h0s
+        if state.h0s > 15.0:
+            h0 = state.h0s
         else:
             th = prop.the[0] + prop.the[1] + d*prop.gme
             r2 = 2.0*prop.wn*th
@@ -299,12 +306,12 @@ def ascat(d, prop, propa):
                 # Early return
                 return 1001.0
 
-            ss = (d - ad)/(d + ad)
-            q = rr/ss
+            ss = (d - state.ad)/(d + state.ad)
+            q = state.rr/ss
             ss = max(0.1, ss)
             q = min(max(0.1, q), 10.0)
-            z0 = (d - ad)*(d + ad)*th*0.25/d
-            et=(etq*math.exp(-pow(min(1.7,z0/8.0e3),6.0))+1.0)*z0/1.7556e3
+            z0 = (d - state.ad)*(d + state.ad)*th*0.25/d
+            et=(state.etq*math.exp(-pow(min(1.7,z0/8.0e3),6.0))+1.0)*z0/1.7556e3
             ett = max(et, 1.0)
             h0 = (h0f(r1, ett) + h0f(r2, ett))*0.5
             h0 += min(h0, (1.38 - math.log(ett))*math.log(ss)*math.log(q)*0.49)
@@ -314,10 +321,10 @@ def ascat(d, prop, propa):
                 h0 =   et*h0+(1.0-et)*4.343* \
                      math.log(pow((1.0+1.4142/r1)*(1.0+1.4142/r2),2.0)*(r1+r2)/(r1+r2+2.8284))
 
-            if h0 > 15.0 and h0s >= 0.0:
-                h0 = h0s
+            if h0 > 15.0 and state.h0s >= 0.0:
+                h0 = state.h0s
 
-        h0s = h0
+        state.h0s = h0
         th = propa.tha+d*prop.gme
         ascatv =  ahd(th*d)+4.343*math.log(47.7*prop.wn*pow(th,4.0)) - 0.1 \
                 * (prop.ens-301.0)*math.exp(-th*d/40e3) + h0
@@ -386,7 +393,7 @@ def abq_alos(r):
     return r.real*r.real + r.imag*r.imag
 
 
-def alos(d, prop, propa):
+def alos(d, prop, propa, state):
     """
     The function alos finds the "line-of-sight" attenuation at the distance d. It
     uses a convex combination of plane earth fields and diffracted fields. A call
@@ -395,14 +402,11 @@ def alos(d, prop, propa):
     (Section 17)
     """
 
-#   To implement C++ static function variables.
-#   Function must first be called with d = 0 to initialize.
-    global wls
 
     prop_zgnd = prop.zgndreal + prop.zgndimag*1j
 
     if d == 0.0:
-        wls = 0.021/(0.021+prop.wn*prop.dh/max(10e3,propa.dlsa))
+        state.wls = 0.021/(0.021+prop.wn*prop.dh/max(10e3,propa.dlsa))
         alosv = 0.0
     else:
         q = (1.0-0.8*math.exp(-d/50.e3))*prop.dh
@@ -421,7 +425,8 @@ def alos(d, prop, propa):
         if q > 1.57:
             q = 3.14-2.4649/q
 
-        alosv = (-4.343*math.log(abq_alos((math.cos(q) - math.sin(q)*1j) + r)) - alosv) * wls \
+        alosv = (-4.343*math.log(abq_alos((math.cos(q) - math.sin(q)*1j) + r)) - alosv) \
+                * state.wls \
                 + alosv
 
     return alosv
@@ -477,7 +482,7 @@ def qlra(kst, klimx, mdvarx, prop, propv):
     return 0
 
 
-def lrprop(d, prop, propa):  # // PaulM_lrprop
+def lrprop(d, prop, propa, state):  # // PaulM_lrprop
     """
     The Longley Rice propagation program. This is the basic program it
     returns the reference attenuation aref.
@@ -487,8 +492,6 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
     AWC Notes
     """
 
-    global wlos, wscat
-    global dmin, xae
 
     prop_zgnd = prop.zgndreal + prop.zgndimag * 1j
 
@@ -499,8 +502,8 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
         propa.dlsa = propa.dls[0] + propa.dls[1]
         propa.dla = prop.dl[0] + prop.dl[1]
         propa.tha = max(prop.the[0]+prop.the[1], -propa.dla*prop.gme)
-        wlos = False
-        wscat = False
+        state.wlos = False
+        state.wscat = False
 
         if prop.wn < 0.838 or prop.wn > 210.0:
             prop.kwx = max(prop.kwx, 1)
@@ -525,15 +528,15 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
             if prop.hg[j] < 0.5 or prop.hg[j] > 3000.0:
                 prop.kwx=4
 
-        dmin = abs(prop.he[0] - prop.he[1])/200e-3
+        state.dmin = abs(prop.he[0] - prop.he[1])/200e-3
 
-        q = adiff(0.0, prop, propa)
+        q = adiff(0.0, prop, propa, state)
 
-        xae = pow(prop.wn*pow(prop.gme, 2), -(1.0/3.0))
-        d3 = max(propa.dlsa, 1.3787*xae + propa.dla)
-        d4 = d3 + 2.7574*xae
-        a3 = adiff(d3, prop, propa)
-        a4 = adiff(d4, prop, propa)
+        state.xae = pow(prop.wn*pow(prop.gme, 2), -(1.0/3.0))
+        d3 = max(propa.dlsa, 1.3787*state.xae + propa.dla)
+        d4 = d3 + 2.7574*state.xae
+        a3 = adiff(d3, prop, propa, state)
+        a4 = adiff(d4, prop, propa, state)
         propa.emd = (a4 - a3)/(d4 - d3)
         propa.aed = a3 - propa.emd*d3
 
@@ -544,7 +547,7 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
     if prop.dist > 0.0:
         if prop.dist > 1000e3:
             prop.kwx = max(prop.kwx,1)
-        if prop.dist < dmin:
+        if prop.dist < state.dmin:
             prop.kwx = max(prop.kwx,3)
         if prop.dist < 1e3 or prop.dist > 2000e3:
             prop.kwx = 4
@@ -552,8 +555,8 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
    
     if prop.dist < propa.dlsa:
 
-        if not wlos:
-            q = alos(0.0, prop, propa)
+        if not state.wlos:
+            q = alos(0.0, prop, propa, state)
             d2 = propa.dlsa
             a2 = propa.aed + d2*propa.emd
             d0 = 1.908*prop.wn*prop.he[0]*prop.he[1]
@@ -564,11 +567,11 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
             else:
                 d1 = max(-propa.aed/propa.emd, 0.25*propa.dla)
 
-            a1 = alos(d1, prop, propa)
+            a1 = alos(d1, prop, propa, state)
             wq = False
 
             if d0 < d1:
-                a0 = alos(d0, prop, propa)
+                a0 = alos(d0, prop, propa, state)
                 q = math.log(d2/d0)
                 propa.ak2 = max(0.0, ((d2 - d0)*(a1 - a0)-(d1 - d0)*(a2 - a0)) \
                                   / ((d2-d0)*math.log(d1/d0)-(d1-d0)*q))
@@ -592,23 +595,23 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
                     propa.ak1=propa.emd
 
             propa.ael = a2 - propa.ak1*d2 - propa.ak2*math.log(d2)
-            wlos = True
+            state.wlos = True
 
         if prop.dist > 0.0:
             prop.aref = propa.ael + propa.ak1*prop.dist \
                     + propa.ak2*math.log(prop.dist)
 
     if prop.dist <= 0.0 or prop.dist >= propa.dlsa:
-        if not wscat:
-            q = ascat(0.0, prop, propa)
+        if not state.wscat:
+            q = ascat(0.0, prop, propa, state)
             d5 = propa.dla + 200e3
             d6 = d5+200e3
-            a6 = ascat(d6, prop, propa)
-            a5 = ascat(d5, prop, propa)
+            a6 = ascat(d6, prop, propa, state)
+            a5 = ascat(d5, prop, propa, state)
 
             if a5 < 1000.0:
                 propa.ems = (a6 - a5)/200e3
-                propa.dx = max(propa.dlsa, max(propa.dla+0.3*xae \
+                propa.dx = max(propa.dlsa, max(propa.dla+0.3*state.xae \
                     *math.log(47.7*prop.wn), (a5-propa.aed-propa.ems*d5) \
                     /(propa.emd-propa.ems)))
                 propa.aes=(propa.emd-propa.ems)*propa.dx+propa.aed
@@ -617,7 +620,7 @@ def lrprop(d, prop, propa):  # // PaulM_lrprop
                 propa.aes = propa.aed
                 propa.dx = 10.e6
 
-            wscat = True
+            state.wscat = True
 
         if prop.dist > propa.dx:
             prop.aref = propa.aes + propa.ems*prop.dist
@@ -638,7 +641,7 @@ def curve(c1, c2, x1, x2, x3, de):
            / (1.0 + pow(de/x1, 2.0))
 
 
-def avar(zzt, zzl, zzc, prop, propv):
+def avar(zzt, zzl, zzc, prop, propv, state):
     """
     When in the area prediction mode, one needs a threefold quantile of
     attenuation which corresponds to the fraction q_T of time, the fraction
@@ -663,12 +666,6 @@ def avar(zzt, zzl, zzc, prop, propv):
     (Section 28)
     """
 
-    global kdv
-    global dexa, de, vmd, vs0, sgl, sgtm, sgtp, sgtd, tgtd
-    global gm, gp, cv1, cv2, yv1, yv2, yv3, csm1, csm2, ysm1
-    global ysm2, ysm3, csp1, csp2, ysp1, ysp2, ysp3, csd1, zd
-    global cfm1, cfm2, cfm3, cfp1, cfp2, cfp3
-    global ws, w1
 
     bv1 = [-9.67,-0.62,1.26,-9.21,-0.62,-0.39,3.15]
     bv2 = [12.7,9.19,15.5,9.05,9.19,2.86,857.9]
@@ -705,115 +702,118 @@ def avar(zzt, zzl, zzc, prop, propv):
                 propv.klim = 5
                 temp_klim = 4
                 prop.kwx = max(prop.kwx,2)
-            cv1 = bv1[temp_klim]
-            cv2 = bv2[temp_klim]
-            yv1 = xv1[temp_klim]
-            yv2 = xv2[temp_klim]
-            yv3 = xv3[temp_klim]
-            csm1 = bsm1[temp_klim]
-            csm2 = bsm2[temp_klim]
-            ysm1 = xsm1[temp_klim]
-            ysm2 = xsm2[temp_klim]
-            ysm3 = xsm3[temp_klim]
-            csp1 = bsp1[temp_klim]
-            csp2 = bsp2[temp_klim]
-            ysp1 = xsp1[temp_klim]
-            ysp2 = xsp2[temp_klim]
-            ysp3 = xsp3[temp_klim]
-            csd1 = bsd1[temp_klim]
-            zd = bzd1[temp_klim]
-            cfm1 = bfm1[temp_klim]
-            cfm2 = bfm2[temp_klim]
-            cfm3 = bfm3[temp_klim]
-            cfp1 = bfp1[temp_klim]
-            cfp2 = bfp2[temp_klim]
-            cfp3 = bfp3[temp_klim]
+            state.cv1 = bv1[temp_klim]
+            state.cv2 = bv2[temp_klim]
+            state.yv1 = xv1[temp_klim]
+            state.yv2 = xv2[temp_klim]
+            state.yv3 = xv3[temp_klim]
+            state.csm1 = bsm1[temp_klim]
+            state.csm2 = bsm2[temp_klim]
+            state.ysm1 = xsm1[temp_klim]
+            state.ysm2 = xsm2[temp_klim]
+            state.ysm3 = xsm3[temp_klim]
+            state.csp1 = bsp1[temp_klim]
+            state.csp2 = bsp2[temp_klim]
+            state.ysp1 = xsp1[temp_klim]
+            state.ysp2 = xsp2[temp_klim]
+            state.ysp3 = xsp3[temp_klim]
+            state.csd1 = bsd1[temp_klim]
+            state.zd = bzd1[temp_klim]
+            state.cfm1 = bfm1[temp_klim]
+            state.cfm2 = bfm2[temp_klim]
+            state.cfm3 = bfm3[temp_klim]
+            state.cfp1 = bfp1[temp_klim]
+            state.cfp2 = bfp2[temp_klim]
+            state.cfp3 = bfp3[temp_klim]
         
         if propv.lvar == 4 or propv.lvar not in [1, 2, 3, 4]:
-            kdv = propv.mdvar
-            ws = (kdv >= 20)
+            state.kdv = propv.mdvar
+            state.ws = (state.kdv >= 20)
 
-            if ws:
-                kdv -= 20
-            w1 = (kdv >= 10)
+            if state.ws:
+                state.kdv -= 20
+            state.w1 = (state.kdv >= 10)
 
-            if w1:
-                kdv -= 10
+            if state.w1:
+                state.kdv -= 10
 
-            if kdv < 0 or kdv > 3:
-                kdv = 0
+            if state.kdv < 0 or state.kdv > 3:
+                state.kdv = 0
                 prop.kwx = max(prop.kwx,2)
 
         if propv.lvar in [3, 4] or propv.lvar not in [1, 2, 3, 4]:
             q = math.log(0.133*prop.wn)
-            gm = cfm1 + cfm2/(pow(cfm3*q, 2.0) + 1.0)
-            gp = cfp1 + cfp2/(pow(cfp3*q, 2.0) + 1.0)
+            state.gm = state.cfm1 + state.cfm2/(pow(state.cfm3*q, 2.0) + 1.0)
+            state.gp = state.cfp1 + state.cfp2/(pow(state.cfp3*q, 2.0) + 1.0)
 
         if propv.lvar in [2, 3, 4] or propv.lvar not in [1, 2, 3, 4]:
-            dexa = (18.e6*prop.he[0])**0.5 + (18.e6*prop.he[1])**0.5 \
+            state.dexa = (18.e6*prop.he[0])**0.5 + (18.e6*prop.he[1])**0.5 \
                    + pow((575.7e12/prop.wn), (1./3.))
             
         if propv.lvar in [1, 2, 3, 4] or propv.lvar not in [1, 2, 3, 4]:
-            if prop.dist < dexa:
-                de = 130.e3*prop.dist/dexa
+            if prop.dist < state.dexa:
+                state.de = 130.e3*prop.dist/state.dexa
             else:
-                de = 130.e3+prop.dist-dexa
-
-        vmd = curve(cv1, cv2, yv1, yv2, yv3, de)
-        sgtm = curve(csm1,csm2,ysm1,ysm2,ysm3,de) * gm
-        sgtp = curve(csp1,csp2,ysp1,ysp2,ysp3,de) * gp
-        sgtd = sgtp*csd1
-        tgtd = (sgtp - sgtd)*zd
-
-        if w1:
-            sgl = 0.0
+                state.de = 130.e3+prop.dist-state.dexa
+
+        state.vmd = curve(state.cv1, state.cv2, state.yv1, state.yv2, state.yv3,
+                          state.de)
+        state.sgtm = curve(state.csm1, state.csm2, state.ysm1, state.ysm2,
+                           state.ysm3, state.de) * state.gm
+        state.sgtp = curve(state.csp1, state.csp2, state.ysp1, state.ysp2,
+                           state.ysp3, state.de) * state.gp
+        state.sgtd = state.sgtp*state.csd1
+        state.tgtd = (state.sgtp - state.sgtd)*state.zd
+
+        if state.w1:
+            state.sgl = 0.0
         else:
             q = (1.0 - 0.8*math.exp(-prop.dist/50.e3))*prop.dh*prop.wn
-            sgl = 10.0*q/(q + 13.0)
-        if ws:
-            vs0 = 0.0
+            state.sgl = 10.0*q/(q + 13.0)
+        if state.ws:
+            state.vs0 = 0.0
         else:
-            vs0 = pow(5.0 + 3.0*math.exp(-de/100.e3), 2.0)
+            state.vs0 = pow(5.0 + 3.0*math.exp(-state.de/100.e3), 2.0)
         propv.lvar=0
         
     zt = zzt
     zl = zzl
     zc = zzc
 
-    if kdv == 0:
+    if state.kdv == 0:
         zt = zc
         zl = zc
-    elif kdv == 1:
+    elif state.kdv == 1:
         zl = zc
-    elif kdv == 2:
+    elif state.kdv == 2:
         zl = zt
 
     if abs(zt) > 3.1 or abs(zl) > 3.1 or abs(zc) > 3.1:
         prop.kwx = max(prop.kwx, 1)
 
     if zt < 0.0:
-        sgt = sgtm
-    elif zt <= zd:
-        sgt = sgtp
+        sgt = state.sgtm
+    elif zt <= state.zd:
+        sgt = state.sgtp
     else:
-        sgt = sgtd + tgtd/zt
+        sgt = state.sgtd + state.tgtd/zt
         
-    vs = vs0 + pow(sgt*zt,2.0)/(rt + zc*zc) + pow(sgl*zl, 2.0)/(rl + zc*zc)
+    vs = state.vs0 + pow(sgt*zt,2.0)/(rt + zc*zc) + pow(state.sgl*zl, 2.0)/(rl + zc*zc)
 
-    if kdv == 0:
+    if state.kdv == 0:
         yr = 0.0
-        propv.sgc = (sgt*sgt + sgl*sgl + vs)**0.5
-    elif kdv == 1:
+        propv.sgc = (sgt*sgt + state.sgl*state.sgl + vs)**0.5
+    elif state.kdv == 1:
         yr = sgt*zt
-        propv.sgc = (sgl*sgl + vs)**0.5
-    elif kdv == 2:
-        yr = zt * (sgt*sgt + sgl*sgl)**0.5
+        propv.sgc = (state.sgl*state.sgl + vs)**0.5
+    elif state.kdv == 2:
+        yr = zt * (sgt*sgt + state.sgl*state.sgl)**0.5
         propv.sgc = vs**0.5
     else:
-        yr = sgt*zt + sgl*zl
+        yr = sgt*zt + state.sgl*zl
         propv.sgc = vs**0.5
 
-    avarv = prop.aref - vmd - yr - propv.sgc*zc
+    avarv = prop.aref - state.vmd - yr - propv.sgc*zc
     if avarv < 0.0:
         avarv = avarv*(29.0 - avarv)/(29.0 - 10.0*avarv)
 
@@ -860,6 +860,55 @@ def hzns(pfl, prop):
                     prop.dl[1] = sb
 
 
+def hzns_numpy(pfl, prop):
+    """
+    NumPy version of hzns. hzns raises the take-off angle to each profile
+    point that is above the line of sight, so the horizon is the first point
+    of largest elevation angle. The angles of all the points are found at once
+    and the largest is taken; the results match hzns to within rounding.
+    """
+
+    pfl = numpy.asarray(pfl, dtype=float)
+    np = int(pfl[0])
+    xi = pfl[1]
+    za = pfl[2] + prop.hg[0]
+    zb = pfl[np+2] + prop.hg[1]
+    qc = 0.5*prop.gme
+    q = qc*prop.dist
+    prop.the[1] = (zb-za)/prop.dist
+    prop.the[0] = prop.the[1] - q
+    prop.the[1] = -prop.the[1] - q
+    prop.dl[0] = prop.dist
+    prop.dl[1] = prop.dist
+
+    if np >= 2:
+        # The distances of the points 1...np-1 from each end, accumulated in
+        # the same order as in hzns.
+        steps = numpy.empty(np)
+        steps[0] = 0.0
+        steps[1:] = xi
+        sa = numpy.add.accumulate(steps)[1:]
+        steps[0] = prop.dist
+        sb = numpy.subtract.accumulate(steps)[1:]
+        z = pfl[3:np+2]
+
+        the = (z - za)/sa - qc*sa
+        above = the > prop.the[0]
+        if above.any():
+            i = the.argmax()
+            prop.the[0] = the[i]
+            prop.dl[0] = sa[i]
+
+            # The receiver horizon is only searched from the first point above
+            # the transmitter line of sight on.
+            first = above.argmax()
+            the = (z[first:] - zb)/sb[first:] - qc*sb[first:]
+            i = the.argmax()
+            if the[i] > prop.the[1]:
+                prop.the[1] = the[i]
+                prop.dl[1] = sb[first + i]
+
+
 def z1sq1 (z, x1, x2, z0, zn):
     """
     A linear least squares fit between x1, x2 to the function described by the
@@ -906,6 +955,42 @@ def z1sq1 (z, x1, x2, z0, zn):
     return z0, zn
 
 
+def z1sq1_numpy(z, x1, x2, z0, zn):
+    """
+    NumPy version of z1sq1, with the sums of the least squares fit taken over
+    the array at once.
+    """
+
+    xn = z[0]
+    xa = int(fortran_dim(x1/z[1], 0.0))
+    xb = xn - int(fortran_dim(xn, x2/z[1]))
+
+    if xb <= xa:
+        xa = fortran_dim(xa, 1.0)
+        xb = xn - fortran_dim(xn, xb+1.0)
+
+    ja = int(xa)
+    jb = int(xb)
+    n = jb - ja
+    xa = xb - xa
+    x = -0.5*xa
+    xb += x
+    a = 0.5*(z[ja+2] + z[jb+2])
+    b = 0.5*(z[ja+2] - z[jb+2])*x
+
+    if n >= 2:
+        interior = numpy.asarray(z[ja+3:jb+2], dtype=float)
+        a += interior.sum()
+        b += numpy.dot(interior, x + numpy.arange(1.0, n))
+
+    a /= xa
+    b = b*12.0/((xa*xa + 2.0)*xa)
+    z0 = a - b*xb
+    zn = a + b*(xn-xb)
+
+    return z0, zn
+
+
 def qtile(nn, a, ir):
     """
     This routine provides a quantile. It reorders the array a so that a(j),
@@ -972,6 +1057,17 @@ def qtile(nn, a, ir):
     return q
 
 
+def qtile_numpy(nn, a, ir):
+    """
+    NumPy version of qtile: returns the value a(i_r) would have if a(0...nn)
+    were sorted in descending order. Unlike qtile, a is not reordered.
+    """
+
+    k = min(max(0, ir), nn)
+    a = numpy.asarray(a[:nn+1], dtype=float)
+    return numpy.partition(a, nn-k)[nn-k]
+
+
 def qerf(z):
     """
     The standard normal complementary probability -- the function Q(x) =
@@ -1055,33 +1151,98 @@ def d1thx(pfl, x1, x2):
 
     return d1thxv
 
-def qlrpfl(pfl, klimx, mdvarx, prop, propa, propv):
+def d1thx_numpy(pfl, x1, x2):
+    """
+    NumPy version of d1thx. The profile is interpolated and detrended at all
+    the points at once, and both deciles are found with one partition.
+    """
+
+    pfl = numpy.asarray(pfl, dtype=float)
+    np = int(pfl[0])
+    xa = x1/pfl[1]
+    xb = x2/pfl[1]
+    d1thxv = 0.0
+
+    if xb - xa < 2.0:  # exit out
+        return d1thxv
+
+    ka = int(0.1*(xb - xa + 8.0))
+    ka = min(max(4, ka), 25)
+
+    n = 10*ka - 5
+    kb = n-ka + 1
+    sn = n-1
+
+    xb = (xb - xa)/sn
+    k = int(xa + 1.0)
+    xa -= float(k)
+
+    # The point j is xa + j*xb past the profile point k; d1thx steps k forward
+    # while the offset is positive, up to the last profile point.
+    x = xa + xb*numpy.arange(n)
+    steps = numpy.clip(numpy.ceil(x), 0, max(np - k, 0))
+    kk = (k + steps).astype(int)
+    x -= steps
+    s = numpy.empty(n + 2)
+    s[0] = sn
+    s[1] = 1.0
+    s[2:] = pfl[kk+2] + (pfl[kk+2] - pfl[kk+1])*x
+
+    xa, xb = z1sq1_numpy(s, 0.0, sn, xa, xb)
+    xb = (xb - xa)/sn
+    s = s[2:] - (xa + xb*numpy.arange(n))
+
+    # The ka-th and kb-th largest values, as found by qtile.
+    ranked = terrain_stats.RankedHeights(s, [ka-1, kb-1])
+    d1thxv = ranked[0] - ranked[1]
+    d1thxv /= 1.0 - 0.8*math.exp(-(x2 - x1)/50.0e3)
+
+    return d1thxv
+
+
+# Terrain analysis backends for qlrpfl: the functions used for hzns, d1thx
+# and z1sq1. The 'python' backend is the reference port of the FORTRAN loops;
+# the 'numpy' backend works on whole profiles at once and matches it to
+# within rounding. The backend of a run is given by its ItmState, and
+# itm_terrain_test.py checks that the backends agree.
+_TERRAIN_BACKENDS = {
+    'python': (hzns, d1thx, z1sq1),
+    'numpy': (hzns_numpy, d1thx_numpy, z1sq1_numpy),
+}
+
+
+def qlrpfl(pfl, klimx, mdvarx, prop, propa, propv, state):
     """
     This subroutine may be used to prepare for the point-to-point mode. Since the
     path is fixed, it has only one value of aref and therefore at the end of the
     routine there is a call to lrprop. To complete the process one needs to call avar
     for whatever quantiles are desired.
 
+    The terrain analysis functions are those of the backend named by
+    state.terrain_backend.
+
     (Section 43)
     """
 
+    find_horizons, find_deltah, fit_line = \
+        _TERRAIN_BACKENDS[state.terrain_backend]
     xl = []
 
     prop.dist = pfl[0] * pfl[1]
     np = int(pfl[0])
-    hzns(pfl, prop)
+    find_horizons(pfl, prop)
 
     for j in range(2):
         xl.append(min(15.0*prop.hg[j], 0.1*prop.dl[j]))
 
     xl[1] = prop.dist - xl[1]
-    prop.dh = d1thx(pfl, xl[0], xl[1])
+    prop.dh = find_deltah(pfl, xl[0], xl[1])
     
     if prop.dl[0] + prop.dl[1] > 1.5*prop.dist:
 
         za = 0 # Must initialize before calling z1sq1
         zb = 0 # Must initialize before calling z1sq1
-        za, zb = z1sq1(pfl, xl[0], xl[1], za, zb) # Revised call to z1sq1
+        za, zb = fit_line(pfl, xl[0], xl[1], za, zb) # Revised call to z1sq1
         prop.he[0] = prop.hg[0] + fortran_dim(pfl[2], za)
         prop.he[1] = prop.hg[1] + fortran_dim(pfl[np+2], zb)
 
@@ -1106,10 +1267,10 @@ def qlrpfl(pfl, klimx, mdvarx, prop, propa, propv):
     else:
         za = 0 # Must initialize before using in function call
         q = 0  # Must initialize before using in function call
-        za, q = z1sq1(pfl, xl[0], 0.9*prop.dl[0], za, q) # Revised call to z1sq1
+        za, q = fit_line(pfl, xl[0], 0.9*prop.dl[0], za, q) # Revised call to z1sq1
 
         zb = 0 # Must initialize before using in function call        
-        q, zb = z1sq1(pfl, prop.dist-0.9*prop.dl[1], xl[1], q, zb) # Revised call
+        q, zb = fit_line(pfl, prop.dist-0.9*prop.dl[1], xl[1], q, zb) # Revised call
 
         prop.he[0] = prop.hg[0] + fortran_dim(pfl[2], za)
         prop.he[1] = prop.hg[1] + fortran_dim(pfl[np+2], zb)
@@ -1125,7 +1286,7 @@ def qlrpfl(pfl, klimx, mdvarx, prop, propa, propv):
         propv.klim = klimx
         propv.lvar = 5
 
-    lrprop(0.0, prop, propa)
+    lrprop(0.0, prop, propa, state)
 
     return 0
 
@@ -1141,28 +1302,21 @@ def deg2rad(d):
 #//* Point-To-Point Mode Calculations                     *
 #//********************************************************
 
-def point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
-                   eno_ns_surfref, frq_mhz, radio_climate, pol, conf, rel,
-		   dbloss, strmode, errnum):
-    
-## pol: 0-Horizontal, 1-Vertical
-## radio_climate: 1-Equatorial, 2-Continental Subtropical, 3-Maritime Tropical,
-##                4-Desert, 5-Continental Temperate, 6-Maritime Temperate, Over Land,
-##                7-Maritime Temperate, Over Sea
-## conf, rel: .01 to .99
-## elev[]: [num points - 1], [delta dist(meters)], [height(meters) point 1], ..., [height(meters) point n]
-## errnum: 0- No Error.
-##         1- Warning: Some parameters are nearly out of range.
-##                     Results should be used with caution.
-##         2- Note: Default parameters have been substituted for impossible ones.
-##         3- Warning: A combination of parameters is out of range.
-##                     Results are probably invalid.
-##         Other-  Warning: Some parameters are out of range.
-##                          Results are probably invalid.
+def prepare_point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                           eno_ns_surfref, frq_mhz, radio_climate, pol,
+                           terrain_backend='numpy'):
+    """
+    Prepares the model for the point-to-point path given by elev: runs qlrps
+    and qlrpfl (and so lrprop) once, with the given terrain analysis backend.
+    Any number of quantiles can then be found for the path with avar.
+
+    Returns prop, propv, state, the free space loss fs and strmode.
+    """
 
     prop = PropType()
     propv = PropvType()
     propa = PropaType()
+    state = ItmState(terrain_backend)
     zsys = 0
 
     prop.hg[0] = tht_m
@@ -1171,8 +1325,6 @@ def point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
     prop.kwx = 0
     propv.lvar = 5
     prop.mdp = -1
-    zc = qerfi(conf)
-    zr = qerfi(rel)
     np = int(elev[0])
 
     eno = eno_ns_surfref
@@ -1189,7 +1341,7 @@ def point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
 
     propv.mdvar = 13  # WinnForum mod. ORIGINAL CODE HAS mdvar = 12 ***
     qlrps(frq_mhz, zsys, q, pol, eps_dielect, sgm_conductivity,prop)
-    qlrpfl(elev, propv.klim, propv.mdvar, prop, propa, propv)
+    qlrpfl(elev, propv.klim, propv.mdvar, prop, propa, propv, state)
     fs = 32.45 + 20.0 * math.log10(frq_mhz) + 20.0 * math.log10(prop.dist / 1000.0)
     q = prop.dist - propa.dla
 
@@ -1205,12 +1357,75 @@ def point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
         elif prop.dist > propa.dx:
             strmode += ", Troposcatter Dominant"
 
-    dbloss = avar(zr, 0.0, zc, prop, propv) + fs
+    return prop, propv, state, fs, strmode
+
+
+def point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                   eno_ns_surfref, frq_mhz, radio_climate, pol, conf, rel,
+		   dbloss, strmode, errnum, terrain_backend='numpy'):
+    
+## pol: 0-Horizontal, 1-Vertical
+## radio_climate: 1-Equatorial, 2-Continental Subtropical, 3-Maritime Tropical,
+##                4-Desert, 5-Continental Temperate, 6-Maritime Temperate, Over Land,
+##                7-Maritime Temperate, Over Sea
+## conf, rel: .01 to .99
+## rel may also be a list of reliabilities, in which case dbloss is the list of
+## the losses for each. The path is set up once for all of them.
+## terrain_backend: the terrain analysis backend, 'numpy' or 'python' (the
+##                  reference loops); see _TERRAIN_BACKENDS.
+## elev[]: [num points - 1], [delta dist(meters)], [height(meters) point 1], ..., [height(meters) point n]
+## errnum: 0- No Error.
+##         1- Warning: Some parameters are nearly out of range.
+##                     Results should be used with caution.
+##         2- Note: Default parameters have been substituted for impossible ones.
+##         3- Warning: A combination of parameters is out of range.
+##                     Results are probably invalid.
+##         Other-  Warning: Some parameters are out of range.
+##                          Results are probably invalid.
+
+    if hasattr(rel, '__iter__'):
+        dbloss, strmode, errnum = \
+            point_to_point_quantiles(elev, tht_m, rht_m, eps_dielect,
+                                     sgm_conductivity, eno_ns_surfref, frq_mhz,
+                                     radio_climate, pol, rel, [conf],
+                                     terrain_backend)
+        return [row[0] for row in dbloss], strmode, errnum
+
+    prop, propv, state, fs, strmode = \
+        prepare_point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                               eno_ns_surfref, frq_mhz, radio_climate, pol,
+                               terrain_backend)
+    dbloss = avar(qerfi(rel), 0.0, qerfi(conf), prop, propv, state) + fs
     errnum = prop.kwx
     
     return dbloss, strmode, errnum
 
 
+def point_to_point_quantiles(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                             eno_ns_surfref, frq_mhz, radio_climate, pol, rels,
+                             confs, terrain_backend='numpy'):
+    """
+    Finds the point-to-point loss for each reliability in rels and confidence
+    in confs, as point_to_point does for one pair. The path is prepared once,
+    and avar sets up its parameters on the first quantile and reuses them for
+    the others (it leaves propv.lvar at 0).
+
+    Returns dbloss, strmode, errnum, where dbloss[i][j] is the loss for rels[i]
+    and confs[j] and errnum covers all the quantiles.
+    """
+
+    prop, propv, state, fs, strmode = \
+        prepare_point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                               eno_ns_surfref, frq_mhz, radio_climate, pol,
+                               terrain_backend)
+    zcs = [qerfi(conf) for conf in confs]
+    dbloss = [[avar(qerfi(rel), 0.0, zc, prop, propv, state) + fs for zc in zcs]
+              for rel in rels]
+    errnum = prop.kwx
+
+    return dbloss, strmode, errnum
+
+
 def point_to_pointMDH(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
                       eno_ns_surfref, frq_mhz, radio_climate, pol, timepct,
                       locpct, confpct, dbloss, propmode, deltaH, errnum):
@@ -1240,6 +1455,7 @@ def point_to_pointMDH(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
     prop = PropType()
     propv = PropvType()
     propa = PropaType()
+    state = ItmState()
     zsys = 0
 
     propmode = -1  # mode is undefined
@@ -1268,7 +1484,7 @@ def point_to_pointMDH(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
 
     propv.mdvar = 12
     qlrps(frq_mhz, zsys, q, pol, eps_dielect, sgm_conductivity, prop)
-    qlrpfl(elev, propv.klim, propv.mdvar, prop,propa, propv)
+    qlrpfl(elev, propv.klim, propv.mdvar, prop,propa, propv, state)
     fs = 32.45 + 20.0 * math.log10(frq_mhz) + 20.0 * math.log10(prop.dist / 1000.0)
     deltaH = prop.dh
     q = prop.dist - propa.dla
@@ -1285,7 +1501,7 @@ def point_to_pointMDH(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
         elif prop.dist > propa.dx:
             propmode += 2 # Troposcatter Dominant
 
-    dbloss = avar(ztime, zloc, zconf, prop, propv) + fs  # avar(time,location,confidence)
+    dbloss = avar(ztime, zloc, zconf, prop, propv, state) + fs  # avar(time,location,confidence)
     errnum = prop.kwx
     
     return dbloss, propmode, deltaH, errnum
@@ -1314,6 +1530,7 @@ def point_to_pointDH (elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
     prop = PropType()
     propv = PropvType()
     propa = PropaType()
+    state = ItmState()
     zsys = 0
 
     prop.hg[0] = tht_m
@@ -1340,7 +1557,7 @@ def point_to_pointDH (elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
 
     propv.mdvar = 12
     qlrps(frq_mhz, zsys, q, pol, eps_dielect, sgm_conductivity, prop)
-    qlrpfl(elev, propv.klim, propv.mdvar, prop,propa, propv)
+    qlrpfl(elev, propv.klim, propv.mdvar, prop,propa, propv, state)
     fs = 32.45 + 20.0 * math.log10(frq_mhz) + 20.0 * math.log10(prop.dist / 1000.0)
     deltaH = prop.dh
     q = prop.dist - propa.dla
@@ -1357,7 +1574,7 @@ def point_to_pointDH (elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
         elif prop.dist > propa.dx:
             strmode += ", Troposcatter Dominant"
 
-    dbloss = avar(zr, 0.0, zc, prop, propv) + fs  # avar(time,location,confidence)
+    dbloss = avar(zr, 0.0, zc, prop, propv, state) + fs  # avar(time,location,confidence)
     errnum = prop.kwx
 
     return dbloss, deltaH, errnum, strmode # Original routine never returns strmode
@@ -1395,6 +1612,7 @@ def area(ModVar, deltaH, tht_m, rht_m, dist_km, TSiteCriteria, RSiteCriteria,
     prop = PropType()
     propv = PropvType()
     propa = PropaType()
+    state = ItmState()
 
     kst = [int(TSiteCriteria), int(RSiteCriteria)]
 
@@ -1422,11 +1640,11 @@ def area(ModVar, deltaH, tht_m, rht_m, dist_km, TSiteCriteria, RSiteCriteria,
     if propv.lvar < 1:
         propv.lvar = 1
     
-    lrprop(dist_km * 1000.0, prop, propa)
+    lrprop(dist_km * 1000.0, prop, propa, state)
 
     fs = 32.45 + 20.0 * math.log10(frq_mhz) + 20.0 * math.log10(prop.dist / 1000.0)
     
-    xlb = fs + avar(zt, zl, zc, prop, propv)
+    xlb = fs + avar(zt, zl, zc, prop, propv, state)
     dbloss = xlb
 
     if prop.kwx == 0:
@@ -1528,13 +1746,13 @@ if p2pTest:
     a_rel = [0.01, 0.1, 0.5, 0.9, 0.99]
     a_conf = [0.5, 0.9, 0.1]
 
-    for rel in a_rel:
-        for conf in a_conf:
-            dbloss, strmode, errnum = \
-                point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
-                eno_ns_surfref, frq_mhz, radio_climate, pol, conf, rel,
-                dbloss, strmode, errnum)
-            print rel, conf, dbloss, strmode, errnum
+    dbloss, strmode, errnum = \
+        point_to_point_quantiles(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+        eno_ns_surfref, frq_mhz, radio_climate, pol, a_rel, a_conf)
+
+    for i, rel in enumerate(a_rel):
+        for j, conf in enumerate(a_conf):
+            print rel, conf, dbloss[i][j], strmode, errnum
 
 if p2pMDHtest:
 
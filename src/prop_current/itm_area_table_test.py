@@ -0,0 +1,109 @@
+import unittest
+
+import numpy
+
+import itm
+import itm_area_table
+
+# The parameters of the tables after the grids, and of ITMAreadBLoss after
+# the distance.
+_RHT_M = 1.5
+_PARAMS = (3, 0, 0, 15, 0.005, 301, 3625., 5, 1, 0.5, 0.5, 0.5)
+
+
+def _Model(dist_km, delta_h, tht_m):
+    (ModVar, TSiteCriteria, RSiteCriteria, eps_dielect, sgm_conductivity,
+     eno_ns_surfref, frq_mhz, radio_climate, pol, pctTime, pctLoc,
+     pctConf) = _PARAMS
+    return itm.ITMAreadBLoss(ModVar, delta_h, tht_m, _RHT_M, dist_km,
+                             TSiteCriteria, RSiteCriteria, eps_dielect,
+                             sgm_conductivity, eno_ns_surfref, frq_mhz,
+                             radio_climate, pol, pctTime, pctLoc, pctConf)
+
+
+def _Table(distances_km, delta_hs, tx_heights):
+    return itm_area_table.AreaLossTable(distances_km, delta_hs, tx_heights,
+                                        _RHT_M, *_PARAMS)
+
+
+class TestAreaLossTable(unittest.TestCase):
+
+    def setUp(self):
+        # The 0.5 m transmitter height is out of range for ITM, so some nodes
+        # have error codes.
+        self.table = _Table([1., 5., 20., 80.], [0., 4., 25., 100.],
+                            [0.5, 10., 30., 100.])
+
+    def test_nodes(self):
+        table = self.table
+        for dist_km in table.distances_km:
+            for delta_h in table.delta_hs:
+                for tht_m in table.tx_heights:
+                    loss, errnum = _Model(dist_km, delta_h, tht_m)
+                    self.assertEquals(table.Loss(dist_km, delta_h, tht_m), loss)
+                    self.assertEquals(table.ErrNum(dist_km, delta_h, tht_m),
+                                      errnum)
+        self.assertTrue(numpy.any(table.errnums != 0))
+
+    def test_arrays(self):
+        dist_km = numpy.array([[2., 7.], [30., 79.]])
+        losses = self.table.Loss(dist_km, 10., 50.)
+        errnums = self.table.ErrNum(dist_km, 10., 50.)
+        self.assertEquals(losses.shape, (2, 2))
+        self.assertEquals(errnums.shape, (2, 2))
+        for i in range(2):
+            for j in range(2):
+                self.assertEquals(losses[i, j],
+                                  self.table.Loss(dist_km[i, j], 10., 50.))
+
+    def test_between_nodes(self):
+        # Halfway between two transmitter heights, and within a cell whose
+        # corners have error codes.
+        loss = self.table.Loss(20., 25., 20.)
+        self.assertAlmostEqual(loss, 0.5 * (_Model(20., 25., 10.)[0] +
+                                            _Model(20., 25., 30.)[0]))
+        corners = [_Model(d, h, t)[1] for d in (5., 20.) for h in (0., 4.)
+                   for t in (0.5, 10.)]
+        self.assertEquals(self.table.ErrNum(10., 2., 5.), max(corners))
+
+    def test_off_grid(self):
+        for point in ((0.5, 10., 30.), (81., 10., 30.), (10., -1., 30.),
+                      (10., 101., 30.), (10., 10., 0.4), (10., 10., 101.),
+                      (0., 10., 30.)):
+            self.assertRaises(ValueError, self.table.Loss, *point)
+            self.assertRaises(ValueError, self.table.ErrNum, *point)
+        self.assertRaises(ValueError, self.table.Loss, [10., 90.], 10., 30.)
+
+    def test_single_point_axes(self):
+        table = _Table([1., 10., 100.], [50.], [30.])
+        self.assertEquals(table.Loss(10., 50., 30.), _Model(10., 50., 30.)[0])
+        loss = table.Loss(numpy.sqrt(10.), 50., 30.)
+        # Linear in log(distance).
+        self.assertAlmostEqual(loss, 0.5 * (_Model(1., 50., 30.)[0] +
+                                            _Model(10., 50., 30.)[0]))
+        self.assertRaises(ValueError, table.Loss, 10., 51., 30.)
+
+        table = _Table([20.], [50.], [30.])
+        self.assertEquals(table.Loss(20., 50., 30.), _Model(20., 50., 30.)[0])
+        self.assertEquals(table.ErrNum(20., 50., 30.), _Model(20., 50., 30.)[1])
+        self.assertEquals(table.MeasureError(), 0.0)
+
+    def test_invalid_grids(self):
+        self.assertRaises(ValueError, _Table, [], [0.], [30.])
+        self.assertRaises(ValueError, _Table, [10., 5.], [0.], [30.])
+        self.assertRaises(ValueError, _Table, [0., 5.], [0.], [30.])
+        self.assertRaises(ValueError, _Table, [5.], [-1., 0.], [30.])
+
+    def test_measure_error(self):
+        table = _Table([5., 10., 20.], [0., 25., 100.], [10., 30.])
+        max_error = table.MeasureError()
+        self.assertEquals(table.max_error, max_error)
+        self.assertTrue(max_error > 0.0)
+        # The center of the first cell.
+        centers = (numpy.sqrt(50.), 2.5**2, 20.)
+        self.assertTrue(abs(table.Loss(*centers) - _Model(*centers)[0])
+                        <= max_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import csv
+import os
+import random
+import unittest
+
+import itm
+
+# The eHata test profiles, in the ITM profile format.
+_PROFILES_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                              '..', 'prop', 'ehata', 'test', 'elevations.csv')
+
+
+def _Profiles():
+    """
+    Returns the eHata test profiles and random profiles: random walks, the
+    same rounded to whole meters so that they have level runs and ties, and
+    short profiles.
+    """
+
+    profiles = []
+    with open(_PROFILES_FILE) as profiles_file:
+        for row in csv.reader(profiles_file):
+            profile = [float(r) for r in row]
+            profiles.append(profile[:int(profile[0]) + 3])
+
+    rand = random.Random(1)
+    for k in range(300):
+        np = rand.choice([2, 3, 5, 20, 150, 600, 1500])
+        xi = rand.choice([10., 30., 100., 500.])
+        step = rand.choice([0.5, 5., 30.])
+        elev = [rand.uniform(0, 500)]
+        for i in range(np):
+            elev.append(elev[-1] + rand.gauss(0, step))
+        if k % 2:
+            elev = [float(round(e)) for e in elev]
+        profiles.append([float(np), xi] + elev)
+    return profiles
+
+
+def _Prop(pfl, tht_m, rht_m):
+    prop = itm.PropType()
+    prop.hg = [tht_m, rht_m]
+    prop.dist = pfl[0] * pfl[1]
+    prop.gme = 157e-9
+    return prop
+
+
+class TestTerrainBackends(unittest.TestCase):
+
+    def assertClose(self, a, b):
+        self.assertAlmostEqual(a, b, delta=1e-9 * max(1.0, abs(a)))
+
+    def test_hzns(self):
+        for pfl in _Profiles():
+            for tht_m, rht_m in ((3., 1.5), (50., 10.), (300., 300.)):
+                expected = _Prop(pfl, tht_m, rht_m)
+                itm.hzns(pfl, expected)
+                prop = _Prop(pfl, tht_m, rht_m)
+                itm.hzns_numpy(pfl, prop)
+                for j in range(2):
+                    self.assertClose(prop.the[j], expected.the[j])
+                    self.assertClose(prop.dl[j], expected.dl[j])
+
+    def test_z1sq1(self):
+        rand = random.Random(2)
+        for pfl in _Profiles():
+            dist = pfl[0] * pfl[1]
+            ranges = [(0., dist), (45., dist - 22.5), (0.2 * dist, 0.3 * dist)]
+            ranges.append(sorted([rand.uniform(0, dist), rand.uniform(0, dist)]))
+            for x1, x2 in ranges:
+                if x2 <= x1:
+                    continue
+                expected = itm.z1sq1(pfl, x1, x2, 0., 0.)
+                z0, zn = itm.z1sq1_numpy(pfl, x1, x2, 0., 0.)
+                self.assertClose(z0, expected[0])
+                self.assertClose(zn, expected[1])
+
+    def test_d1thx(self):
+        for pfl in _Profiles():
+            dist = pfl[0] * pfl[1]
+            for x1, x2 in ((0., dist), (45., dist - 22.5), (0., 1.5 * pfl[1])):
+                self.assertClose(itm.d1thx_numpy(pfl, x1, x2),
+                                 itm.d1thx(pfl, x1, x2))
+
+    def test_qtile(self):
+        rand = random.Random(3)
+        for pfl in _Profiles()[::5]:
+            a = pfl[2:]
+            nn = len(a) - 1
+            for ir in [-1, 0, 1, nn // 2, nn - 1, nn, nn + 1,
+                       rand.randint(0, nn)]:
+                expected = itm.qtile(nn, list(a), ir)
+                self.assertEquals(itm.qtile_numpy(nn, a, ir), expected)
+                # Only a(0...nn) is used.
+                self.assertEquals(itm.qtile_numpy(nn - 1, a, ir),
+                                  itm.qtile(nn - 1, list(a), ir))
+
+    def test_point_to_point(self):
+        for k, pfl in enumerate(_Profiles()[::3]):
+            args = (pfl, 10. + k, 1.5 + k % 20, 15, 0.005, 314, 100. + 37. * k,
+                    5, k % 2, 0.5, 0.5, 0, '', 0)
+            dbloss, strmode, errnum = itm.point_to_point(
+                *args, terrain_backend='numpy')
+            expected = itm.point_to_point(*args, terrain_backend='python')
+            self.assertAlmostEqual(dbloss, expected[0], delta=1e-6)
+            self.assertEquals(strmode, expected[1])
+            self.assertEquals(errnum, expected[2])
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, itm.ItmState, 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
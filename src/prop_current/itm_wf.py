@@ -1,13 +1,15 @@
 from itm import *
 from terrain import *
 from geo import *
-from tropoclim import *
-from refractivity import *
+import geo_context
+import propagation
 
 def itm_wf(lat1, lon1, h1,
            lat2, lon2, h2,
            f = 3625.,
-           rel = 0.5):
+           rel = 0.5,
+           conf = 0.5,
+           context = None):
     """
     Implements the WinnForum-compliant ITM pt-to-pt propagation loss
     model.
@@ -16,10 +18,17 @@ def itm_wf(lat1, lon1, h1,
     lat1, lon1, h1      Lat/lon (deg) and height AGL (m) of point 1
     lat2, lon2, h2      Lat/lon (deg) and height AGL (m) of point 2
     f                   Frequency (MHz). Default is mid-point of band.
-    rel                 Reliability (for aggreg interf see R2-SGN-12)
+    rel                 Reliability (for aggreg interf see R2-SGN-12), or a
+                        list of reliabilities
+    conf                Confidence
+    context             GeoContext holding the climate and refractivity data
+                        and the terrain profile cache. Default is the
+                        process-wide context, so the data is loaded once for
+                        all calls.
    
     Returns the following values:
-    dbloss              Loss in dB (>0)
+    dbloss              Loss in dB (>0), or the list of losses for each
+                        reliability if rel is a list
     errnum              ITM error code (see below)
     strmode             String containing description of dominant prop mode
     dist                Distance between end points (km)
@@ -40,8 +49,10 @@ def itm_wf(lat1, lon1, h1,
     Andrew Clegg
     February 2017
     """
-    
-    conf = 0.5
+
+    if context is None:
+        context = geo_context.GetDefaultContext()
+
     dielec = 25.
     conduct = 0.02
     pol = 1
@@ -49,12 +60,15 @@ def itm_wf(lat1, lon1, h1,
     climate = -1
     
 #   Get the terrain profile, using Vincenty great circle route, and WF
-#   standard (bilinear interp; 1500 pts for all distances over 45 km)
-    elev = terrainProfile_vincenty(lat1=lat1, lon1=lon1,
-                                   lat2=lat2, lon2=lon2,
-                                   target_dx = 30.,
-                                   interp='bilinear',
-                                   winnf=True)
+#   standard (bilinear interp; 1500 pts for all distances over 45 km). The
+#   profile is cached, so repeated calls for the same path reuse it.
+    elev = context.profile_cache.Profile(
+        lat1, lon1, lat2, lon2, 'terrain_vincenty_30m_bilinear_winnf',
+        lambda: terrainProfile_vincenty(lat1=lat1, lon1=lon1,
+                                        lat2=lat2, lon2=lon2,
+                                        target_dx = 30.,
+                                        interp='bilinear',
+                                        winnf=True))
 
 #   Find the midpoint of the great circle path
     dist, bearing, backaz = dist_bear_vincenty(lat1, lon1, lat2, lon2)
@@ -62,19 +76,17 @@ def itm_wf(lat1, lon1, h1,
     
 #   Lookup the climate value at the path midpoint, if not explicitly provided
     if climate < 0:
-        readTropoClim('')
-        climate = tropoClim(latmid, lonmid)
+        climate = context.Climate().TropoClim(latmid, lonmid)
 
 #   Look up the refractivity at the path midpoint, if not explicitly provided
     if refract < 0:
-        readRefractivity('')
-        refract = refractivity(latmid, lonmid)
+        refract = context.Refractivity().Refractivity(latmid, lonmid)
 
-#   Call ITM prop loss.
+#   Call ITM prop loss, with the fastest available implementation.
     dbloss, strmode, errnum = \
-            point_to_point(elev, h1, h2, dielec, conduct,
-                           refract, f, climate, pol,
-                           conf, rel, 0., '', 0)
+            propagation.point_to_point(elev, h1, h2, dielec, conduct,
+                                       refract, f, climate, pol,
+                                       conf, rel)
 
 #   Create distance/terrain arrays for plotting if desired
     d = (elev[1]/1000.) * np.asarray(range(len(elev)-2))
@@ -0,0 +1,241 @@
+# A single entry point to the ITM and eHata propagation models.
+#
+# The models have several implementations: the pure-Python ports in this
+# directory, and the C++ extensions in src/prop, built in place with
+# 'python setup.py build_ext -i'. Each implementation is registered as a
+# backend of the model it implements, and when this module is imported the
+# fastest available backend of each model is selected, in the order of
+# _PREFERENCE. A backend that cannot be loaded, e.g. an extension that has not
+# been built, is skipped, so the pure-Python port is used as a fallback.
+#
+# Only backends computing the same model are registered. The eHata extension
+# in src/prop/itsehata is the original ITS model, without the WinnForum
+# changes of ehata_its_wf.py (e.g. its minimum effective base station height
+# is 30 m rather than 20 m), so it is not an eHata backend here.
+#
+# Other backends, e.g. a 'jit' compiled port, can be added with
+# RegisterBackend; propagation_test.py checks that all available ITM backends
+# agree within 0.01 dB. The backends are loaded when this module is imported
+# or when they are registered, under a lock, and never lazily from a model
+# call, so threads can share this module once it is imported.
+#
+# Example use:
+#   dbloss, strmode, errnum = propagation.point_to_point(
+#       elev, 30., 1.5, 25., 0.02, 301., 3625., 5, 1, 0.5, 0.5)
+#   propagation.SetBackend('itm', 'pure')
+
+import imp
+import os
+import sys
+import threading
+
+# The models, and the backends in order of preference.
+MODELS = ('itm', 'ehata')
+_PREFERENCE = ('cext', 'jit', 'pure')
+
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+_ITM_EXT_DIR = os.path.join(_SRC_DIR, 'prop', 'itm')
+
+
+def _LoadExtension(name, path):
+    """
+    Loads the C extension module name built in the directory path. The
+    extensions have the same names as the Python ports, so the Python module
+    in sys.modules, if any, is kept in place. Raises ImportError if the
+    extension has not been built.
+    """
+
+    ext_file, pathname, description = imp.find_module(name, [path])
+    if ext_file is not None:
+        ext_file.close()
+    if description[2] != imp.C_EXTENSION:
+        raise ImportError('The %s extension is not built in %s' % (name, path))
+
+    # The extension would otherwise add its functions to the module already
+    # in sys.modules under its name. The import lock keeps other threads from
+    # importing the name while it is swapped out.
+    imp.acquire_lock()
+    try:
+        module = sys.modules.pop(name, None)
+        try:
+            return imp.load_dynamic(name, pathname)
+        finally:
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    finally:
+        imp.release_lock()
+
+
+def _LoadPureItm():
+    import itm
+
+    def PointToPoint(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                     eno_ns_surfref, frq_mhz, radio_climate, pol, conf, rel):
+        return itm.point_to_point(elev, tht_m, rht_m, eps_dielect,
+                                  sgm_conductivity, eno_ns_surfref, frq_mhz,
+                                  radio_climate, pol, conf, rel, 0., '', 0)
+    return PointToPoint
+
+
+def _LoadCextItm():
+    itm_ext = _LoadExtension('itm', _ITM_EXT_DIR)
+
+    def PointToPoint(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                     eno_ns_surfref, frq_mhz, radio_climate, pol, conf, rel):
+        if hasattr(rel, '__iter__'):
+            dbloss, errnum, strmode = itm_ext.point_to_point_quantiles(
+                elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                eno_ns_surfref, frq_mhz, int(radio_climate), int(pol), rel,
+                [conf])
+            return dbloss[:, 0].tolist(), strmode, errnum
+        dbloss, errnum, strmode = itm_ext.point_to_point(
+            elev, tht_m, rht_m, eps_dielect, sgm_conductivity, eno_ns_surfref,
+            frq_mhz, int(radio_climate), int(pol), conf, rel)
+        return dbloss, strmode, errnum
+    return PointToPoint
+
+
+def _LoadPureEhata():
+    import ehata_its_wf
+
+    def ExtendedHata(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code):
+        plb = [0.]
+        ehata_its_wf.ExtendedHata(pfl, f__mhz, h_b__meter, h_m__meter,
+                                  enviro_code, plb)
+        return plb[0]
+    return ExtendedHata
+
+
+# The loaders of the backends of each model. A loader returns the model
+# function of the backend, or raises ImportError if it is not available.
+_BACKENDS = {
+    'itm': {'pure': _LoadPureItm, 'cext': _LoadCextItm},
+    'ehata': {'pure': _LoadPureEhata},
+}
+
+# The model functions of the available backends, by (model, backend).
+_loaded = {}
+
+# The selected backend of each model.
+_selected = {}
+
+# Guards _BACKENDS, _loaded and _selected.
+_lock = threading.Lock()
+
+
+def _Load(model, name):
+    """
+    Loads the backend name of model into _loaded, if it is available. Called
+    with _lock held.
+    """
+
+    _loaded.pop((model, name), None)
+    try:
+        _loaded[(model, name)] = _BACKENDS[model][name]()
+    except ImportError:
+        pass
+
+
+def _Available(model):
+    names = [name for (m, name) in _loaded if m == model]
+    return sorted(names, key=lambda name: (_PREFERENCE.index(name)
+                                           if name in _PREFERENCE
+                                           else len(_PREFERENCE), name))
+
+
+def _Function(model, backend):
+    with _lock:
+        if backend is None:
+            backend = _selected[model]
+        function = _loaded.get((model, backend))
+    if function is None:
+        raise ValueError('Unavailable %s backend %s' % (model, backend))
+    return function
+
+
+def RegisterBackend(model, name, loader):
+    """
+    Registers loader as the backend name of model ('itm' or 'ehata') and
+    loads it. The loader returns a function with the signature of
+    point_to_point or ExtendedHata below, or raises ImportError if the
+    backend is not available. If the new backend is available and preferred
+    over the selected one, it is selected.
+    """
+
+    if model not in _BACKENDS:
+        raise ValueError('Unknown propagation model %s' % model)
+    with _lock:
+        _BACKENDS[model][name] = loader
+        _Load(model, name)
+        _selected[model] = _Available(model)[0]
+
+
+def AvailableBackends(model):
+    """
+    Returns the names of the backends of model that are loaded, in order of
+    preference.
+    """
+
+    if model not in _BACKENDS:
+        raise ValueError('Unknown propagation model %s' % model)
+    with _lock:
+        return _Available(model)
+
+
+def SetBackend(model, name):
+    """
+    Selects the backend name for model. Raises ValueError if it is not an
+    available backend of model.
+    """
+
+    if model not in _BACKENDS:
+        raise ValueError('Unknown propagation model %s' % model)
+    with _lock:
+        if (model, name) not in _loaded:
+            raise ValueError('Unavailable %s backend %s' % (model, name))
+        _selected[model] = name
+
+
+def GetBackend(model):
+    """
+    Returns the name of the selected backend of model.
+    """
+
+    if model not in _BACKENDS:
+        raise ValueError('Unknown propagation model %s' % model)
+    with _lock:
+        return _selected[model]
+
+
+def point_to_point(elev, tht_m, rht_m, eps_dielect, sgm_conductivity,
+                   eno_ns_surfref, frq_mhz, radio_climate, pol, conf, rel,
+                   backend=None):
+    """
+    The ITM point-to-point model, as itm.point_to_point: returns dbloss,
+    strmode, errnum, and dbloss is the list of losses for each reliability if
+    rel is a list. Uses the selected ITM backend unless another is given.
+    """
+
+    return _Function('itm', backend)(elev, tht_m, rht_m, eps_dielect,
+                                     sgm_conductivity, eno_ns_surfref, frq_mhz,
+                                     radio_climate, pol, conf, rel)
+
+
+def ExtendedHata(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code,
+                 backend=None):
+    """
+    The eHata model, as ehata_its_wf.ExtendedHata, returning the path loss
+    (dB). Uses the selected eHata backend unless another is given.
+    """
+
+    return _Function('ehata', backend)(pfl, f__mhz, h_b__meter, h_m__meter,
+                                       enviro_code)
+
+
+with _lock:
+    for _model in MODELS:
+        for _name in _BACKENDS[_model]:
+            _Load(_model, _name)
+        _selected[_model] = _Available(_model)[0]
@@ -0,0 +1,104 @@
+import csv
+import os
+import sys
+import unittest
+
+import propagation
+
+# The eHata test profiles, in the ITM profile format.
+_PROFILES_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                              '..', 'prop', 'ehata', 'test', 'elevations.csv')
+
+
+def _Profiles():
+    profiles = []
+    with open(_PROFILES_FILE) as profiles_file:
+        for row in csv.reader(profiles_file):
+            profile = [float(r) for r in row]
+            profiles.append(profile[:int(profile[0]) + 3])
+    return profiles
+
+
+class TestPropagation(unittest.TestCase):
+
+    def test_selects_preferred_backend(self):
+        for model in propagation.MODELS:
+            available = propagation.AvailableBackends(model)
+            self.assertTrue('pure' in available)
+            self.assertEquals(propagation.GetBackend(model), available[0])
+
+    def test_set_backend(self):
+        backend = propagation.GetBackend('itm')
+        propagation.SetBackend('itm', 'pure')
+        self.assertEquals(propagation.GetBackend('itm'), 'pure')
+        propagation.SetBackend('itm', backend)
+        self.assertRaises(ValueError, propagation.SetBackend, 'itm', 'unknown')
+        self.assertRaises(ValueError, propagation.GetBackend, 'unknown')
+
+    def test_register_backend(self):
+        def Unavailable():
+            raise ImportError('not built')
+        backend = propagation.GetBackend('itm')
+        propagation.RegisterBackend('itm', 'jit', Unavailable)
+        try:
+            self.assertFalse('jit' in propagation.AvailableBackends('itm'))
+            self.assertEquals(propagation.GetBackend('itm'), backend)
+            self.assertRaises(ValueError, propagation.point_to_point,
+                              *(_Profiles()[0], 30., 1.5, 25., 0.02, 301.,
+                                3625., 5, 1, 0.5, 0.5), backend='jit')
+        finally:
+            del propagation._BACKENDS['itm']['jit']
+
+    def test_register_available_backend(self):
+        calls = []
+        def LoadFixed():
+            def ExtendedHata(pfl, f__mhz, h_b__meter, h_m__meter, enviro_code):
+                calls.append(f__mhz)
+                return 100.
+            return ExtendedHata
+        propagation.RegisterBackend('ehata', 'jit', LoadFixed)
+        try:
+            self.assertEquals(propagation.AvailableBackends('ehata'),
+                              ['jit', 'pure'])
+            self.assertEquals(propagation.GetBackend('ehata'), 'jit')
+            self.assertEquals(propagation.ExtendedHata(
+                _Profiles()[0], 3625., 50., 1.5, 22), 100.)
+            self.assertEquals(calls, [3625.])
+        finally:
+            del propagation._BACKENDS['ehata']['jit']
+            del propagation._loaded[('ehata', 'jit')]
+            propagation.SetBackend('ehata', 'pure')
+
+    def test_extension_keeps_python_module(self):
+        propagation.AvailableBackends('itm')
+        self.assertTrue(hasattr(sys.modules['itm'], 'ItmState'))
+
+    def test_itm_backends_agree(self):
+        backends = propagation.AvailableBackends('itm')
+        if len(backends) < 2:
+            self.skipTest('Only the %s ITM backend is available' % backends[0])
+        for profile in _Profiles()[::5]:
+            for tht_m in (3., 50.):
+                args = (profile, tht_m, 1.5, 25., 0.02, 301., 3625., 5, 1, 0.5)
+                expected = propagation.point_to_point(*args + (0.5,),
+                                                      backend='pure')
+                expected_rels = propagation.point_to_point(
+                    *args + ([0.1, 0.5, 0.9],), backend='pure')
+                for backend in backends:
+                    dbloss, strmode, errnum = propagation.point_to_point(
+                        *args + (0.5,), backend=backend)
+                    self.assertAlmostEqual(dbloss, expected[0], delta=0.01)
+                    self.assertEquals(strmode, expected[1])
+                    self.assertEquals(errnum, expected[2])
+
+                    dblosses = propagation.point_to_point(
+                        *args + ([0.1, 0.5, 0.9],), backend=backend)[0]
+                    self.assertEquals(len(dblosses), 3)
+                    for dbloss, expected_dbloss in zip(dblosses,
+                                                       expected_rels[0]):
+                        self.assertAlmostEqual(dbloss, expected_dbloss,
+                                               delta=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
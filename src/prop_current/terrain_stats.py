@@ -0,0 +1,53 @@
+# Terrain height statistics shared by the ITM and eHata ports.
+#
+# Both models describe the roughness of a path by an interdecile range of its
+# terrain heights: eHata's deltaH is the difference between the 10% and 90%
+# exceedance heights of the terrain near the mobile, and ITM's d1thx takes the
+# same difference over a detrended, resampled profile. The reference ports
+# find each quantile with a separate sort or selection of the heights; here
+# all the quantiles of a path come from one numpy.partition.
+#
+# Example use:
+#   quantiles = terrain_stats.FindTerrainQuantiles(pfl[2:])
+#   deltah = quantiles.deltah
+
+import numpy
+
+
+def RankedHeights(heights, ranks):
+    """
+    Returns the heights of the given ranks, where rank 0 is the highest, as
+    the ITM qtile and eHata FindQuantile routines select them. Ranks outside
+    the heights are clamped to the lowest and highest heights. All the ranks
+    are found with one partition of the heights.
+    """
+
+    heights = numpy.asarray(heights, dtype=float)
+    last = len(heights) - 1
+    positions = [last - min(max(rank, 0), last) for rank in ranks]
+    return numpy.partition(heights, sorted(set(positions)))[positions]
+
+
+class TerrainQuantiles:
+
+    # The 10%, 50% and 90% exceedance heights of a set of terrain heights,
+    # and their interdecile range deltah.
+
+    def __init__(self, h10=0.0, h50=0.0, h90=0.0):
+        self.h10 = h10
+        self.h50 = h50
+        self.h90 = h90
+        self.deltah = h10 - h90
+
+
+def FindTerrainQuantiles(heights):
+    """
+    Returns the TerrainQuantiles of the heights: the heights of rank
+    int(f*n - 1) for f of 0.1, 0.5 and 0.9 of the n heights, as in the eHata
+    terrain statistics.
+    """
+
+    n = len(heights)
+    h10, h50, h90 = RankedHeights(
+        heights, [int(0.1*n - 1), int(0.5*n - 1), int(0.9*n - 1)])
+    return TerrainQuantiles(h10, h50, h90)
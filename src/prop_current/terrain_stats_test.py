@@ -0,0 +1,162 @@
+import csv
+import math
+import os
+import random
+import unittest
+
+import numpy
+
+import ehata_its_wf
+import itm
+import terrain_stats
+
+# The eHata test profiles, in the ITM profile format.
+_PROFILES_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                              '..', 'prop', 'ehata', 'test', 'elevations.csv')
+
+
+def _OldFindQuantile(npts, a, ir):
+    """
+    The FindQuantile of the eHata port before terrain_stats. It was called
+    with float ranks, which NumPy before 1.12 truncated and current NumPy
+    rejects, so the rank is truncated here.
+    """
+
+    return numpy.sort(numpy.asarray(a))[::-1][int(ir)]
+
+
+def _OldTerrainStatistics(pfl):
+    """
+    Returns the (pfl10, pfl50, pfl90, deltah) of the ComputeTerrainStatistics
+    of the eHata port before terrain_stats.
+    """
+
+    np = int(pfl[0])
+    xi = pfl[1] * 0.001
+    d__km = np * xi
+    if d__km < 10.0:
+        i_end = np + 2
+    else:
+        i_end = 2 + int(10.0 / xi)
+    pfl_segment = list(pfl[2:i_end + 1])
+
+    npts = len(pfl_segment)
+    pfl10 = _OldFindQuantile(npts, pfl_segment, 0.1 * npts - 1)
+    pfl50 = _OldFindQuantile(npts, pfl_segment, 0.5 * npts - 1)
+    pfl90 = _OldFindQuantile(npts, pfl_segment, 0.9 * npts - 1)
+    deltah = pfl10 - pfl90
+    if d__km < 10.0:
+        factor = ((1.0 - 0.8 * math.exp(-0.2)) /
+                  (1.0 - 0.8 * math.exp(-0.02 * d__km)))
+        return (pfl10 * factor, pfl50 * factor, pfl90 * factor,
+                deltah * factor)
+    return pfl10, pfl50, pfl90, deltah
+
+
+def _Heights(rand, n):
+    """
+    Returns n random heights, rounded to a few levels in some draws so that
+    there are many ties.
+    """
+
+    heights = [rand.uniform(-50, 500) for i in range(n)]
+    if rand.random() < 0.5:
+        heights = [float(round(h / 25.)) * 25. for h in heights]
+    return heights
+
+
+class TestRankedHeights(unittest.TestCase):
+
+    def test_matches_old_find_quantile(self):
+        rand = random.Random(1)
+        for n in list(range(1, 30)) + [99, 100, 101, 401]:
+            heights = _Heights(rand, n)
+            ranks = list(range(n))
+            rand.shuffle(ranks)
+            ranked = terrain_stats.RankedHeights(heights, ranks)
+            for rank, height in zip(ranks, ranked):
+                self.assertEquals(height, _OldFindQuantile(n, heights, rank))
+
+    def test_clamped_ranks(self):
+        rand = random.Random(2)
+        for n in (1, 2, 7, 50):
+            heights = _Heights(rand, n)
+            ranks = [-5, -1, 0, n - 1, n, n + 3]
+            self.assertEquals(
+                list(terrain_stats.RankedHeights(heights, ranks)),
+                [max(heights)] * 3 + [min(heights)] * 3)
+            # The ITM qtile clamps its rank the same way.
+            for rank in ranks:
+                self.assertEquals(
+                    terrain_stats.RankedHeights(heights, [rank])[0],
+                    itm.qtile(n - 1, list(heights), rank))
+
+    def test_ties(self):
+        heights = [3., 7., 7., 1., 7., 3., 3., 3.]
+        self.assertEquals(
+            list(terrain_stats.RankedHeights(heights, range(8))),
+            [7., 7., 7., 3., 3., 3., 3., 1.])
+        # Repeated ranks, in any order.
+        self.assertEquals(
+            list(terrain_stats.RankedHeights(heights, [5, 1, 5, 7, 1])),
+            [3., 7., 3., 1., 7.])
+        self.assertEquals(
+            list(terrain_stats.RankedHeights([4.] * 5, [0, 2, 4])),
+            [4., 4., 4.])
+
+    def test_input_unchanged(self):
+        heights = [5., 1., 4., 2., 3.]
+        array = numpy.array(heights)
+        terrain_stats.RankedHeights(heights, [1, 3])
+        terrain_stats.RankedHeights(array, [1, 3])
+        self.assertEquals(list(array), heights)
+
+
+class TestFindQuantile(unittest.TestCase):
+
+    def test_float_ranks(self):
+        # ComputeTerrainStatistics used to pass float ranks such as
+        # 0.1*npts - 1, which made every pure-Python ExtendedHata call raise.
+        rand = random.Random(3)
+        for npts in range(1, 60):
+            heights = _Heights(rand, npts)
+            for f in (0.1, 0.5, 0.9):
+                ir = f * npts - 1
+                self.assertEquals(
+                    ehata_its_wf.FindQuantile(npts, heights, ir),
+                    _OldFindQuantile(npts, heights, ir))
+        self.assertEquals(
+            ehata_its_wf.FindQuantile(4, [1., 4., 3., 2.], 1.9), 3.)
+
+
+class TestFindTerrainQuantiles(unittest.TestCase):
+
+    def test_matches_old_find_quantile(self):
+        rand = random.Random(4)
+        for n in list(range(1, 40)) + [400, 401]:
+            heights = _Heights(rand, n)
+            quantiles = terrain_stats.FindTerrainQuantiles(heights)
+            self.assertEquals(quantiles.h10,
+                              _OldFindQuantile(n, heights, 0.1 * n - 1))
+            self.assertEquals(quantiles.h50,
+                              _OldFindQuantile(n, heights, 0.5 * n - 1))
+            self.assertEquals(quantiles.h90,
+                              _OldFindQuantile(n, heights, 0.9 * n - 1))
+            self.assertEquals(quantiles.deltah, quantiles.h10 - quantiles.h90)
+
+    def test_compute_terrain_statistics(self):
+        with open(_PROFILES_FILE) as profiles_file:
+            for row in csv.reader(profiles_file):
+                pfl = [float(r) for r in row]
+                pfl = pfl[:int(pfl[0]) + 3]
+                interValues = ehata_its_wf.InterValues()
+                ehata_its_wf.ComputeTerrainStatistics(pfl, interValues)
+                self.assertEquals((interValues.pfl10__meter,
+                                   interValues.pfl50__meter,
+                                   interValues.pfl90__meter,
+                                   interValues.deltah__meter),
+                                  _OldTerrainStatistics(pfl))
+
+
+if __name__ == '__main__':
+    unittest.main()